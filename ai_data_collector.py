@@ -1,32 +1,189 @@
-import json
-import os
 import datetime
+import threading
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
+from storage import storage, StorageBackend
+from history_archive import history_archive
+
+FEATURE_COLUMNS = [
+    'rsi', 'macd_diff', 'sma_ratio', 'volume_ratio', 
+    'volatility', 'momentum', 'sentiment_score',
+    'hour_of_day', 'day_of_week', 'confidence_score'
+]
+
+class TrainingBuffer:
+    """
+    Buffer colunar dos sinais com resultado, usado para montar o DataFrame de treino
+
+    Os valores ficam em um único array float64 (colunas x capacidade) que dobra
+    de tamanho quando enche. frame() devolve um DataFrame que aponta para esse
+    array, sem copiar nem reconstruir a partir de dicionários.
+    """
+
+    def __init__(self, columns: List[str] = FEATURE_COLUMNS, initial_capacity: int = 256):
+        self.columns = list(columns) + ['target']
+        self._values = np.empty((len(self.columns), initial_capacity), dtype=np.float64)
+        self._rows: Dict[str, int] = {}
+        self.size = 0
+
+    def _grow(self):
+        grown = np.empty((len(self.columns), self._values.shape[1] * 2), dtype=np.float64)
+        grown[:, :self.size] = self._values[:, :self.size]
+        self._values = grown
+
+    def upsert(self, signal_id: str, record: Dict):
+        """Grava (ou sobrescreve) a linha de um sinal com resultado"""
+        row = self._rows.get(signal_id)
+        if row is None:
+            if self.size == self._values.shape[1]:
+                self._grow()
+            row = self.size
+            self._rows[signal_id] = row
+            self.size += 1
+
+        for col, name in enumerate(self.columns[:-1]):
+            value = record.get(name)
+            self._values[col, row] = np.nan if value is None else float(value)
+        self._values[-1, row] = 1.0 if record['result'] == 'success' else 0.0
+
+    def drop(self, signal_ids: List[str]):
+        """Remove linhas (sinais arquivados) compactando o buffer"""
+        removed = {self._rows.pop(signal_id) for signal_id in signal_ids if signal_id in self._rows}
+        if not removed:
+            return
+        keep = [row for row in range(self.size) if row not in removed]
+        self._values[:, :len(keep)] = self._values[:, keep]
+        position = {old: new for new, old in enumerate(keep)}
+        self._rows = {signal_id: position[row] for signal_id, row in self._rows.items()}
+        self.size = len(keep)
+
+    def frame(self) -> pd.DataFrame:
+        """DataFrame (view) com as features e o target (1.0 sucesso, 0.0 falha)"""
+        return pd.DataFrame(self._values[:, :self.size].T, columns=self.columns, copy=False)
+
+    def __len__(self):
+        return self.size
 
 class AIDataCollector:
     """
     Coleta e armazena dados para treinamento do modelo de IA
     """
     
-    def __init__(self, data_file="ai_training_data.json"):
-        self.data_file = data_file
+    def __init__(self, storage_backend: Optional[StorageBackend] = None):
+        self.storage = storage_backend or storage
+        # Gravado pelo scanner, pelo monitor rápido (TradeMonitor) e pelos callbacks do dispatcher
+        self._lock = threading.RLock()
         self.data = self.load_data()
+        
+        # Índice por ID, contadores e buffer de treino mantidos incrementalmente
+        # (sinais já arquivados entram só nos contadores)
+        archived = history_archive.counts("signals")
+        self._index = {item['signal_id']: item for item in self.data}
+        self.training_buffer = TrainingBuffer()
+        self.archived_signals = archived['rows']
+        self.completed_signals = archived['rows']
+        self.successful_signals = archived['successful']
+        for item in self.data:
+            if item['result'] is not None:
+                self._register_result(item)
     
     def load_data(self) -> List[Dict]:
-        """Carrega dados existentes ou cria arquivo novo"""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r') as f:
-                    return json.load(f)
-            except:
-                return []
-        return []
-    
-    def save_data(self):
-        """Salva dados no arquivo"""
-        with open(self.data_file, 'w') as f:
-            json.dump(self.data, f, indent=2)
+        """Carrega dados existentes do backend de armazenamento"""
+        try:
+            return self.storage.load_training()
+        except Exception as e:
+            print(f"[AI_DATA] Erro ao carregar dados: {e}")
+            return []
+    
+    def save_data(self, records: Optional[List[Dict]] = None):
+        """Salva os registros informados (ou todos) no backend de armazenamento"""
+        with self._lock:
+            self.storage.upsert_training(self.data if records is None else records)
+    
+    def _register_result(self, item: Dict, previous_result: Optional[str] = None):
+        """Atualiza contadores e buffer de treino para um sinal com resultado"""
+        if previous_result is None:
+            self.completed_signals += 1
+        elif previous_result == 'success':
+            self.successful_signals -= 1
+        if item['result'] == 'success':
+            self.successful_signals += 1
+        self.training_buffer.upsert(item['signal_id'], item)
+    
+    def evict_archived(self, signal_ids: List[str]):
+        """Remove do armazenamento quente os registros já arquivados"""
+        with self._lock:
+            removed = set(signal_ids)
+            self.data = [item for item in self.data if item['signal_id'] not in removed]
+            for signal_id in removed:
+                self._index.pop(signal_id, None)
+            self.training_buffer.drop(signal_ids)
+            self.archived_signals += len(removed)
+            self.storage.delete_training(signal_ids)
+    
+    def snapshot(self, labeled_only: bool = False) -> List[Dict]:
+        """Cópia dos registros do armazenamento quente (só os com resultado, se pedido)"""
+        with self._lock:
+            return [dict(item) for item in self.data if not labeled_only or item['result'] is not None]
+    
+    def get_signal(self, signal_id: str) -> Optional[Dict]:
+        """Registro de treino ainda no armazenamento quente (None se arquivado)"""
+        with self._lock:
+            item = self._index.get(signal_id)
+            return dict(item) if item is not None else None
+    
+    def reload_symbols(self, symbols: List[str]):
+        """
+        Carrega do backend os registros dos símbolos (shard assumido de outra
+        réplica), com e sem resultado, e soma o arquivo deles aos contadores
+        """
+        with self._lock:
+            symbols = set(symbols)
+            for item in self.load_data():
+                if item['symbol'] in symbols and item['signal_id'] not in self._index:
+                    self.data.append(item)
+                    self._index[item['signal_id']] = item
+                    if item['result'] is not None:
+                        self._register_result(item)
+            self._add_archived(history_archive.counts("signals", symbols))
+    
+    def forget_symbols(self, symbols: List[str]):
+        """Tira da memória e dos contadores os registros dos símbolos (shard liberado)"""
+        with self._lock:
+            symbols = set(symbols)
+            self._drop_symbols(symbols)
+            self._add_archived(history_archive.counts("signals", symbols), sign=-1)
+    
+    def retain_symbols(self, symbols: List[str]):
+        """
+        Mantém só os registros dos símbolos (shard da réplica, na partida): os
+        contadores e o retreino passam a contar só eles, inclusive no arquivo
+        """
+        with self._lock:
+            symbols = set(symbols)
+            self._drop_symbols({item['symbol'] for item in self.data} - symbols)
+            self._add_archived(history_archive.counts("signals"), sign=-1)
+            self._add_archived(history_archive.counts("signals", symbols))
+    
+    def _drop_symbols(self, symbols: Set[str]):
+        """Esquece os registros dos símbolos, sem apagar do backend"""
+        dropped = [item for item in self.data if item['symbol'] in symbols]
+        if not dropped:
+            return
+        self.data = [item for item in self.data if item['symbol'] not in symbols]
+        for item in dropped:
+            self._index.pop(item['signal_id'], None)
+            if item['result'] is not None:
+                self.completed_signals -= 1
+                self.successful_signals -= item['result'] == 'success'
+        self.training_buffer.drop([item['signal_id'] for item in dropped])
+    
+    def _add_archived(self, archived: Dict, sign: int = 1):
+        """Soma (ou subtrai, sign=-1) contagens do arquivo histórico aos contadores"""
+        self.archived_signals += sign * archived['rows']
+        self.completed_signals += sign * archived['rows']
+        self.successful_signals += sign * archived['successful']
     
     def add_signal_data(self, signal: Dict, market_features: Dict, sentiment_score: float = 0.0):
         """
@@ -67,8 +224,10 @@ class AIDataCollector:
             'days_to_result': None
         }
         
-        self.data.append(features)
-        self.save_data()
+        with self._lock:
+            self.data.append(features)
+            self._index[features['signal_id']] = features
+            self.save_data([features])
         print(f"[AI_DATA] Dados do sinal {signal['symbol']} adicionados para treinamento")
     
     def update_signal_result(self, signal_id: str, result: str, days_to_result: int):
@@ -80,55 +239,58 @@ class AIDataCollector:
             result: 'success' ou 'failure'
             days_to_result: Quantos dias levou para ter resultado
         """
-        for item in self.data:
-            if item['signal_id'] == signal_id:
-                item['result'] = result
-                item['result_updated_at'] = datetime.datetime.now().isoformat()
-                item['days_to_result'] = days_to_result
-                self.save_data()
-                print(f"[AI_DATA] Resultado do sinal {signal_id} atualizado: {result}")
-                return True
-        return False
+        with self._lock:
+            item = self._index.get(signal_id)
+            if item is None:
+                return False
+        
+            previous_result = item['result']
+            item['result'] = result
+            item['result_updated_at'] = datetime.datetime.now().isoformat()
+            item['days_to_result'] = days_to_result
+            self._register_result(item, previous_result)
+            self.save_data([item])
+            print(f"[AI_DATA] Resultado do sinal {signal_id} atualizado: {result}")
+            return True
     
     def get_training_data(self) -> pd.DataFrame:
         """
         Retorna dados prontos para treinamento (apenas sinais com resultado)
-        """
-        # Filtra apenas sinais com resultado definido
-        completed_signals = [item for item in self.data if item['result'] is not None]
         
-        if not completed_signals:
-            return pd.DataFrame()
-        
-        df = pd.DataFrame(completed_signals)
+        Sinais recentes vêm de uma cópia do buffer colunar (o monitor rápido
+        grava resultados em outra thread enquanto o modelo treina); o histórico
+        arquivado vem do cache do arquivo, relido só quando alguma partição muda.
+        """
+        with self._lock:
+            recent = self.training_buffer.frame().copy()
+            archived = self.archived_signals
         
-        # Converte resultado para binário
-        df['target'] = (df['result'] == 'success').astype(int)
+        if archived:
+            frames = [history_archive.training_frame(FEATURE_COLUMNS), recent]
+            frames = [f for f in frames if len(f)]
+            return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
         
-        # Remove colunas não necessárias para treinamento
-        feature_columns = [
-            'rsi', 'macd_diff', 'sma_ratio', 'volume_ratio', 
-            'volatility', 'momentum', 'sentiment_score',
-            'hour_of_day', 'day_of_week', 'confidence_score'
-        ]
+        if len(recent) == 0:
+            return pd.DataFrame()
         
-        return df[feature_columns + ['target']]
+        return recent
     
     def get_statistics(self) -> Dict:
-        """Retorna estatísticas dos dados coletados"""
-        total_signals = len(self.data)
-        completed_signals = len([item for item in self.data if item['result'] is not None])
-        successful_signals = len([item for item in self.data if item['result'] == 'success'])
+        """Retorna estatísticas dos dados coletados (contadores incrementais)"""
+        with self._lock:
+            total_signals = len(self.data) + self.archived_signals
+            completed_signals = self.completed_signals
+            successful_signals = self.successful_signals
         
-        success_rate = (successful_signals / completed_signals * 100) if completed_signals > 0 else 0
+            success_rate = (successful_signals / completed_signals * 100) if completed_signals > 0 else 0
         
-        return {
-            'total_signals': total_signals,
-            'completed_signals': completed_signals,
-            'pending_signals': total_signals - completed_signals,
-            'successful_signals': successful_signals,
-            'success_rate': round(success_rate, 2)
-        }
+            return {
+                'total_signals': total_signals,
+                'completed_signals': completed_signals,
+                'pending_signals': total_signals - completed_signals,
+                'successful_signals': successful_signals,
+                'success_rate': round(success_rate, 2)
+            }
 
 # Instância global
 ai_data_collector = AIDataCollector()
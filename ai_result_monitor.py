@@ -1,34 +1,62 @@
-import json
-import os
-from datetime import datetime, timedelta
-from typing import Dict, List
-from price_fetcher import fetch_all_data
+import threading
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from price_fetcher import get_ohlc
 from ai_data_collector import ai_data_collector
 from ai_predictor import ai_predictor
+from storage import storage, StorageBackend
+from monitor_store import MonitorStore
+from history_archive import history_archive
+from outcome_engine import outcome_engine, to_local
 
 class AIResultMonitor:
     """
     Monitora os resultados dos sinais para feedback do sistema de IA
     """
     
-    def __init__(self, monitoring_file="ai_monitoring.json"):
-        self.monitoring_file = monitoring_file
-        self.monitoring_data = self.load_monitoring_data()
+    def __init__(self, storage_backend: Optional[StorageBackend] = None):
+        self.storage = storage_backend or storage
+        # Entradas novas chegam pela thread do dispatcher de notificações
+        self._lock = threading.RLock()
+        self.store = MonitorStore(
+            self.load_monitoring_data(), archived=history_archive.counts("outcomes")
+        )
+    
+    @property
+    def monitoring_data(self) -> List[Dict]:
+        """Lista com todas as entradas monitoradas (compatibilidade)"""
+        return list(self.store)
     
     def load_monitoring_data(self) -> List[Dict]:
         """Carrega dados de monitoramento"""
-        if os.path.exists(self.monitoring_file):
-            try:
-                with open(self.monitoring_file, 'r') as f:
-                    return json.load(f)
-            except:
-                return []
-        return []
-    
-    def save_monitoring_data(self):
-        """Salva dados de monitoramento"""
-        with open(self.monitoring_file, 'w') as f:
-            json.dump(self.monitoring_data, f, indent=2)
+        try:
+            return self.storage.load_monitoring()
+        except Exception as e:
+            print(f"[AI_MONITOR] Erro ao carregar monitoramento: {e}")
+            return []
+    
+    def save_monitoring_data(self, entries: Optional[List[Dict]] = None):
+        """Salva as entradas informadas (ou todas) no backend de armazenamento"""
+        with self._lock:
+            entries = list(self.store) if entries is None else self._fenced(entries)
+            self.storage.upsert_monitoring(entries)
+    
+    def completed_entries(self) -> List[Dict]:
+        """Entradas concluídas ainda no armazenamento quente"""
+        with self._lock:
+            return self.store.completed_entries()
+    
+    def entries_snapshot(self) -> List[Dict]:
+        """Cópia das entradas do armazenamento quente (consultas da API)"""
+        with self._lock:
+            return [dict(entry) for entry in self.store]
+    
+    def evict_archived(self, signal_ids: List[str]):
+        """Remove do armazenamento quente as entradas já arquivadas"""
+        with self._lock:
+            self.store.evict(signal_ids)
+            self.storage.delete_monitoring(signal_ids)
     
     def add_signal_for_monitoring(self, signal: Dict):
         """
@@ -46,88 +74,203 @@ class AIResultMonitor:
             'completion_date': None,
             'days_to_result': None,
             'max_price_reached': None,
-            'min_price_reached': None
+            'min_price_reached': None,
+            'strategy': signal.get('strategy')
         }
         
-        self.monitoring_data.append(monitoring_entry)
-        self.save_monitoring_data()
+        with self._lock:
+            self.store.add(monitoring_entry)
+            self.save_monitoring_data([monitoring_entry])
         print(f"[AI_MONITOR] Sinal {signal['symbol']} adicionado para monitoramento")
     
-    def check_signal_results(self):
+    def reload_symbols(self, symbols: List[str]):
+        """
+        Carrega do backend as entradas dos símbolos (shard assumido de outra
+        réplica), ativas e concluídas, e soma o arquivo deles aos contadores
+        """
+        symbols = set(symbols)
+        fresh = [entry for entry in self.load_monitoring_data() if entry['symbol'] in symbols]
+        with self._lock:
+            self._drop_symbols(symbols)
+            for entry in fresh:
+                self.store.add(entry)
+            self.store.add_archived(history_archive.counts("outcomes", symbols))
+    
+    def forget_symbols(self, symbols: List[str]):
+        """Tira da memória e dos contadores os sinais dos símbolos (shard liberado)"""
+        symbols = set(symbols)
+        with self._lock:
+            self._drop_symbols(symbols)
+            self.store.add_archived(history_archive.counts("outcomes", symbols), sign=-1)
+    
+    def retain_symbols(self, symbols: List[str]):
+        """
+        Mantém só os sinais dos símbolos (shard da réplica, na partida): os
+        contadores passam a contar só eles, inclusive no arquivo
+        """
+        symbols = set(symbols)
+        with self._lock:
+            self._drop_symbols({entry['symbol'] for entry in self.store} - symbols)
+            self.store.add_archived(history_archive.counts("outcomes"), sign=-1)
+            self.store.add_archived(history_archive.counts("outcomes", symbols))
+    
+    def _drop_symbols(self, symbols: Set[str]):
+        """Esquece as entradas dos símbolos, sem gravar (chamar com self._lock)"""
+        for entry in self.store.symbol_entries(symbols):
+            self.store.discard(entry['signal_id'])
+    
+    def _fenced(self, entries: List[Dict]) -> List[Dict]:
+        """Só entradas ainda na memória: as de símbolos liberados não são gravadas"""
+        return [entry for entry in entries if self.store.entries.get(entry['signal_id']) is entry]
+    
+    def active_symbols(self) -> List[str]:
+        """Símbolos com sinais em monitoramento"""
+        with self._lock:
+            return self.store.active_symbols()
+    
+    def _apply_prices(self, signals: List[Dict], prices: Dict[str, float]) -> List[Dict]:
+        """
+        Atualiza máximas/mínimas e conclui os sinais que atingiram alvo ou stop
+        
+        A comparação com os níveis é feita de uma vez para todos os sinais.
+        Chamar com self._lock adquirido.
+        
+        Returns:
+            List[Dict]: entradas alteradas (para gravar)
+        """
+        # Um sinal pode ter sido concluído por outra thread desde que a lista foi montada
+        signals = [s for s in signals if s['status'] == 'monitoring' and s['symbol'] in prices]
+        if not signals:
+            return []
+        
+        price = np.array([prices[s['symbol']] for s in signals], dtype=np.float64)
+        target = np.array([s['target_price'] for s in signals], dtype=np.float64)
+        stop = np.array([s['stop_loss'] for s in signals], dtype=np.float64)
+        previous_max = np.array([np.nan if s['max_price_reached'] is None else s['max_price_reached']
+                                 for s in signals], dtype=np.float64)
+        previous_min = np.array([np.nan if s['min_price_reached'] is None else s['min_price_reached']
+                                 for s in signals], dtype=np.float64)
+        
+        # fmax/fmin ignoram o NaN do primeiro preço observado
+        new_max = np.fmax(previous_max, price)
+        new_min = np.fmin(previous_min, price)
+        success = price >= target
+        failure = ~success & (price <= stop)
+        changed = success | failure | (new_max != previous_max) | (new_min != previous_min)
+        
+        now = datetime.now()
+        updated = []
+        for i in np.flatnonzero(changed):
+            signal = signals[i]
+            symbol = signal['symbol']
+            signal['max_price_reached'] = float(new_max[i])
+            signal['min_price_reached'] = float(new_min[i])
+            updated.append(signal)
+            if not (success[i] or failure[i]):
+                continue
+            
+            if success[i]:
+                result = 'success'
+                print(f"[AI_MONITOR] ✅ {symbol} atingiu ALVO! Preço: {price[i]}")
+            else:
+                result = 'failure'
+                print(f"[AI_MONITOR] ❌ {symbol} atingiu STOP! Preço: {price[i]}")
+            
+            # Calcula dias até resultado
+            created_date = datetime.fromisoformat(signal['created_at'])
+            days_to_result = (now - created_date).days
+            self.store.complete(signal['signal_id'], result, max(1, days_to_result))  # Mínimo 1 dia
+            
+            # Atualiza dados de treinamento
+            ai_data_collector.update_signal_result(signal['signal_id'], result, signal['days_to_result'])
+            print(f"[AI_MONITOR] Resultado do sinal {symbol} registrado: {result}")
+        return updated
+    
+    def _apply_path(self, signals: List[Dict], candles: Dict) -> List[Dict]:
+        """
+        Rotula os sinais pelo caminho de candles desde a criação (outcome_engine):
+        primeira passagem por alvo/stop nas máximas e mínimas, não só no último close
+        
+        Chamar com self._lock adquirido.
+        
+        Returns:
+            List[Dict]: entradas alteradas (para gravar)
+        """
+        signals = [s for s in signals if s['status'] == 'monitoring' and s['symbol'] in candles]
+        updated = []
+        for signal, outcome in zip(signals, outcome_engine.evaluate(signals, candles)):
+            if np.isnan(outcome["path_max"]):
+                continue
+            symbol = signal['symbol']
+            previous_max, previous_min = signal['max_price_reached'], signal['min_price_reached']
+            signal['max_price_reached'] = max(outcome["path_max"], previous_max if previous_max is not None else outcome["path_max"])
+            signal['min_price_reached'] = min(outcome["path_min"], previous_min if previous_min is not None else outcome["path_min"])
+            updated.append(signal)
+            
+            # Expiração sem passagem continua com o heap de expiração (pop_expired)
+            if outcome["hit_at"] is None:
+                continue
+            result = outcome["result"]
+            if result == 'success':
+                print(f"[AI_MONITOR] ✅ {symbol} atingiu ALVO em {outcome['hit_at']}! Máxima: {outcome['path_max']}")
+            else:
+                print(f"[AI_MONITOR] ❌ {symbol} atingiu STOP em {outcome['hit_at']}! Mínima: {outcome['path_min']}")
+            
+            days_to_result = outcome_engine.days_to_result(signal, outcome)
+            self.store.complete(signal['signal_id'], result, days_to_result,
+                                completion_date=to_local(outcome["hit_at"]).isoformat())
+            ai_data_collector.update_signal_result(signal['signal_id'], result, days_to_result)
+            print(f"[AI_MONITOR] Resultado do sinal {symbol} registrado: {result}")
+        return updated
+    
+    def check_prices(self, prices: Dict[str, float]) -> List[Dict]:
+        """
+        Aplica cotações atuais aos sinais ativos (loop rápido do TradeMonitor)
+        
+        Grava só as entradas alteradas; expiração e retreino ficam no ciclo.
+        
+        Returns:
+            List[Dict]: sinais concluídos
+        """
+        with self._lock:
+            active = [e for symbol in prices for e in self.store.active_for_symbol(symbol)]
+            updated = self._apply_prices(active, prices)
+            if updated:
+                self.save_monitoring_data(updated)
+        return [entry for entry in updated if entry['status'] == 'completed']
+    
+    def check_signal_results(self, symbols: Optional[Set[str]] = None):
         """
         Verifica resultados dos sinais em monitoramento
+        
+        Args:
+            symbols: restringe a verificação a esses símbolos (shard da réplica)
         """
         print("[AI_MONITOR] Verificando resultados dos sinais...")
         
-        # Filtra sinais ainda em monitoramento
-        active_signals = [s for s in self.monitoring_data if s['status'] == 'monitoring']
+        # Sinais ainda em monitoramento (índice por símbolo, sem varrer o histórico)
+        with self._lock:
+            # Agrupa por símbolo para otimizar chamadas à API
+            symbols_to_check = [
+                s for s in self.store.active_symbols() if symbols is None or s in symbols
+            ]
+            active_signals = [e for s in symbols_to_check for e in self.store.active_for_symbol(s)]
         
         if not active_signals:
             print("[AI_MONITOR] Nenhum sinal ativo para monitorar")
             return
         
-        # Agrupa por símbolo para otimizar chamadas à API
-        symbols_to_check = list(set([s['symbol'] for s in active_signals]))
-        
         try:
-            # Busca dados atuais do mercado
-            current_market_data = fetch_all_data(symbols_to_check)
+            # Candles OHLC de 30 min dos últimos 2 dias (máximas/mínimas reais): o
+            # caminho anterior já foi avaliado nos ciclos passados e fica nos
+            # extremos acumulados (max/min_price_reached)
+            candles = get_ohlc(symbols_to_check)
             
-            for signal in active_signals:
-                symbol = signal['symbol']
-                
-                if symbol not in current_market_data or current_market_data[symbol].empty:
-                    continue
+            with self._lock:
+                self._apply_path(active_signals, candles)
                 
-                current_price = current_market_data[symbol]['close'].iloc[-1]
-                entry_price = signal['entry_price']
-                target_price = signal['target_price']
-                stop_loss = signal['stop_loss']
-                
-                # Atualiza preços máximo e mínimo alcançados
-                if signal['max_price_reached'] is None:
-                    signal['max_price_reached'] = current_price
-                    signal['min_price_reached'] = current_price
-                else:
-                    signal['max_price_reached'] = max(signal['max_price_reached'], current_price)
-                    signal['min_price_reached'] = min(signal['min_price_reached'], current_price)
-                
-                # Verifica se atingiu alvo ou stop
-                result = None
-                
-                if current_price >= target_price:
-                    result = 'success'
-                    print(f"[AI_MONITOR] ✅ {symbol} atingiu ALVO! Preço: {current_price}")
-                elif current_price <= stop_loss:
-                    result = 'failure'
-                    print(f"[AI_MONITOR] ❌ {symbol} atingiu STOP! Preço: {current_price}")
-                
-                # Se há resultado, atualiza o sinal
-                if result:
-                    signal['status'] = 'completed'
-                    signal['result'] = result
-                    signal['completion_date'] = datetime.now().isoformat()
-                    
-                    # Calcula dias até resultado
-                    created_date = datetime.fromisoformat(signal['created_at'])
-                    days_to_result = (datetime.now() - created_date).days
-                    signal['days_to_result'] = max(1, days_to_result)  # Mínimo 1 dia
-                    
-                    # Atualiza dados de treinamento
-                    ai_data_collector.update_signal_result(
-                        signal['signal_id'], 
-                        result, 
-                        signal['days_to_result']
-                    )
-                    
-                    print(f"[AI_MONITOR] Resultado do sinal {symbol} registrado: {result}")
-            
-            # Verifica sinais muito antigos (mais de 7 dias) e marca como expirados
-            cutoff_date = datetime.now() - timedelta(days=7)
-            
-            for signal in active_signals:
-                created_date = datetime.fromisoformat(signal['created_at'])
-                if created_date < cutoff_date and signal['status'] == 'monitoring':
+                # Sinais com mais de 7 dias saem do heap de expiração e são encerrados
+                for signal in self.store.pop_expired(symbols=symbols):
                     # Determina resultado baseado no melhor preço alcançado
                     entry_price = signal['entry_price']
                     target_price = signal['target_price']
@@ -135,22 +278,19 @@ class AIResultMonitor:
                     
                     # Se chegou perto do alvo (80% do caminho), considera sucesso parcial
                     target_distance = target_price - entry_price
-                    achieved_distance = max_reached - entry_price
+                    achieved_distance = (max_reached - entry_price) if max_reached is not None else 0
                     
                     if achieved_distance >= (target_distance * 0.8):
                         result = 'success'
                     else:
                         result = 'failure'
                     
-                    signal['status'] = 'completed'
-                    signal['result'] = result
-                    signal['completion_date'] = datetime.now().isoformat()
-                    signal['days_to_result'] = 7
+                    self.store.complete(signal['signal_id'], result, 7)
                     
                     ai_data_collector.update_signal_result(signal['signal_id'], result, 7)
                     print(f"[AI_MONITOR] Sinal expirado {signal['symbol']}: {result}")
-            
-            self.save_monitoring_data()
+                
+                self.save_monitoring_data(active_signals)
             
             # Verifica se deve retreinar o modelo
             if ai_predictor.should_retrain():
@@ -161,21 +301,8 @@ class AIResultMonitor:
             print(f"[AI_MONITOR] Erro ao verificar resultados: {e}")
     
     def get_monitoring_statistics(self) -> Dict:
-        """Retorna estatísticas de monitoramento"""
-        total_monitored = len(self.monitoring_data)
-        active_monitoring = len([s for s in self.monitoring_data if s['status'] == 'monitoring'])
-        completed = len([s for s in self.monitoring_data if s['status'] == 'completed'])
-        successful = len([s for s in self.monitoring_data if s['result'] == 'success'])
-        
-        success_rate = (successful / completed * 100) if completed > 0 else 0
-        
-        return {
-            'total_monitored': total_monitored,
-            'active_monitoring': active_monitoring,
-            'completed': completed,
-            'successful': successful,
-            'success_rate': round(success_rate, 2)
-        }
+        """Retorna estatísticas de monitoramento (contadores incrementais)"""
+        return self.store.statistics()
 
 # Instância global
 ai_result_monitor = AIResultMonitor()
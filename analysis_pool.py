@@ -0,0 +1,213 @@
+"""
+Análise em paralelo: indicadores + modelo ML em um pool de processos
+
+O scanner entrega os dados brutos de todos os símbolos de uma vez. Eles são
+copiados para um único bloco de memória compartilhada (uma linha por coluna,
+símbolos concatenados) e cada worker recebe só os offsets do seu lote, sem
+serializar DataFrames. Nos workers:
+
+1. calcula os indicadores (technical_indicators);
+2. calcula a pontuação técnica;
+3. roda o modelo ML só para quem passou no filtro técnico.
+
+Cada worker carrega o modelo ML uma vez (na inicialização) e o recarrega se o
+arquivo mudar. Os resultados voltam para o processo principal, onde o
+StagedEvaluator faz sentimento, IA e a decisão final — a IA depende do
+sentimento e dos dados coletados no processo principal.
+"""
+
+import contextlib
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from technical_indicators import calculate_indicators, technical_score
+from metrics import metrics
+
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+
+INDICATOR_SECONDS = metrics.histogram("scanner_indicators_seconds", "Tempo de calculate_indicators por símbolo")
+PREDICTION_SECONDS = metrics.histogram("scanner_prediction_seconds", "Tempo de predição por símbolo", ["model"])
+
+# Estado de cada worker (um processo = um carregamento de modelo)
+_worker_state = {}
+
+def _model_mtime(path: str) -> Optional[float]:
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+def _init_worker():
+    """Importa módulos e carrega o modelo ML uma vez por processo"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        from ml_model_loader import ml_model
+    _worker_state["ml_mtime"] = _model_mtime(ml_model.model_path)
+
+def _analyze_frame(df: pd.DataFrame, weights: Dict, min_score: float, ml_model) -> Dict:
+    # Tempos medidos no worker voltam no resultado (métricas ficam no processo principal)
+    start = time.perf_counter()
+    df_with_indicators = calculate_indicators(df)
+    result = {"df": df_with_indicators, "timings": {"indicators": time.perf_counter() - start}}
+    if not df_with_indicators.empty:
+        score = technical_score(df_with_indicators.iloc[-1], weights)
+        result["confidence_score"] = score
+        if score >= min_score:
+            start = time.perf_counter()
+            probability, recommendation, details = ml_model.predict_signal_quality(df_with_indicators)
+            result["ml_prediction"] = (probability, recommendation)
+            if "features" in details:
+                result["ml_features"] = details["features"]
+            result["timings"]["ml"] = time.perf_counter() - start
+    return result
+
+def _record_timings(result: Dict) -> Dict:
+    timings = result.pop("timings", {})
+    if "indicators" in timings:
+        INDICATOR_SECONDS.observe(timings["indicators"])
+    if "ml" in timings:
+        PREDICTION_SECONDS.observe(timings["ml"], model="ml")
+    return result
+
+def _worker_ml_model():
+    """Modelo ML do worker, recarregado se o arquivo mudou desde a última tarefa"""
+    from ml_model_loader import ml_model
+
+    mtime = _model_mtime(ml_model.model_path)
+    if mtime != _worker_state.get("ml_mtime"):
+        with contextlib.redirect_stdout(io.StringIO()):
+            ml_model.load_model()
+        _worker_state["ml_mtime"] = mtime
+    return ml_model
+
+def _analyze_single(df: pd.DataFrame, weights: Dict, min_score: float) -> Dict:
+    """Worker: analisa um único símbolo (modo pipeline)"""
+    ml_model = _worker_ml_model()
+    with contextlib.redirect_stdout(io.StringIO()):
+        return _analyze_frame(df, weights, min_score, ml_model)
+
+def _analyze_chunk(shm_name: str, shape: Tuple[int, int], columns: List[str],
+                   tasks: List[Tuple[str, int, int]], weights: Dict, min_score: float) -> Dict[str, Dict]:
+    """Worker: analisa os símbolos do lote lendo a memória compartilhada"""
+    ml_model = _worker_ml_model()
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    block = None
+    try:
+        block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        results = {}
+        for symbol, start, end in tasks:
+            data = {col: block[i, start:end].copy() for i, col in enumerate(columns)}
+            df = pd.DataFrame(data)
+            df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s")
+            with contextlib.redirect_stdout(io.StringIO()):
+                results[symbol] = _analyze_frame(df, weights, min_score, ml_model)
+        return results
+    finally:
+        block = None  # libera o buffer antes de fechar o bloco
+        shm.close()
+
+class AnalysisExecutor:
+    """
+    Distribui a análise dos símbolos entre processos (ANALYSIS_WORKERS)
+    """
+
+    def __init__(self, workers: int = ANALYSIS_WORKERS, chunks_per_worker: int = 2):
+        self.workers = workers
+        self.chunks_per_worker = chunks_per_worker
+        self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: o processo principal tem threads (Flask, dispatcher, cache)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def analyze_one(self, df: pd.DataFrame, weights: Dict, min_score: float) -> Dict:
+        """
+        Analisa um símbolo assim que os dados chegam (modo pipeline)
+
+        O DataFrame de 3 dias é pequeno, então vai serializado para o worker;
+        a memória compartilhada compensa no lote inteiro (analyze).
+        """
+        if self.workers <= 1:
+            from ml_model_loader import ml_model
+            return _record_timings(_analyze_frame(df, weights, min_score, ml_model))
+        return _record_timings(self._get_pool().submit(_analyze_single, df, weights, min_score).result())
+
+    @staticmethod
+    def _columns(frames: Dict[str, pd.DataFrame]) -> List[str]:
+        """timestamp + colunas numéricas presentes em todos os símbolos"""
+        common = None
+        for df in frames.values():
+            numeric = [c for c in df.columns if c != "timestamp" and pd.api.types.is_numeric_dtype(df[c])]
+            common = numeric if common is None else [c for c in common if c in numeric]
+        return ["timestamp"] + (common or [])
+
+    def analyze(self, market_data: Dict[str, pd.DataFrame], weights: Dict, min_score: float) -> Dict[str, Dict]:
+        """
+        Args:
+            weights: pesos da pontuação técnica ({"sma", "volume", "macd", "rsi"})
+            min_score: pontuação mínima para rodar o modelo ML
+
+        Returns:
+            {symbol: {"df": DataFrame com indicadores, "confidence_score": int,
+                      "ml_prediction": (probabilidade, recomendação),
+                      "ml_features": {feature: valor} (entrada do modelo, para o rastro da decisão)}}
+        """
+        frames = {s: df for s, df in market_data.items() if df is not None and not df.empty}
+        if not frames:
+            return {}
+        if self.workers <= 1:
+            from ml_model_loader import ml_model
+            return {s: _record_timings(_analyze_frame(df, weights, min_score, ml_model)) for s, df in frames.items()}
+
+        columns = self._columns(frames)
+        total_rows = sum(len(df) for df in frames.values())
+        shape = (len(columns), total_rows)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, shape[0] * shape[1] * 8))
+        block = None
+        try:
+            block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+            tasks, offset = [], 0
+            for symbol, df in frames.items():
+                end = offset + len(df)
+                if "timestamp" in df.columns:
+                    block[0, offset:end] = pd.to_datetime(df["timestamp"]).astype("datetime64[ns]").astype("int64").to_numpy() / 1e9
+                else:
+                    block[0, offset:end] = np.arange(len(df)) * 3600.0
+                for i, col in enumerate(columns[1:], start=1):
+                    block[i, offset:end] = df[col].to_numpy(dtype=np.float64)
+                tasks.append((symbol, offset, end))
+                offset = end
+
+            n_chunks = min(len(tasks), self.workers * self.chunks_per_worker)
+            chunks = [tasks[i::n_chunks] for i in range(n_chunks)]
+            pool = self._get_pool()
+            futures = [
+                pool.submit(_analyze_chunk, shm.name, shape, columns, chunk, weights, min_score)
+                for chunk in chunks
+            ]
+            results = {}
+            for future in futures:
+                results.update(future.result())
+            return {symbol: _record_timings(result) for symbol, result in results.items()}
+        finally:
+            block = None  # libera o buffer antes de fechar o bloco
+            shm.close()
+            shm.unlink()
+
+
+# Instância global
+analysis_executor = AnalysisExecutor()
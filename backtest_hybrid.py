@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Backtest vetorizado da estratégia híbrida sobre séries históricas de candles
+
+Reproduz, para todas as velas de uma vez, as etapas da decisão do
+signal_generator_hybrid que dependem só dos candles:
+
+- filtro técnico: condições (close > sma_50, volume > volume_sma_20,
+  macd_diff > 0, rsi < 70) calculadas uma vez e pontuadas com os PESO_*;
+- modelo ML: features de todas as velas (MLModelLoader.prepare_features_batch)
+  e uma única chamada de predict_proba por símbolo;
+- IA: heurística do AIPredictor sem modelo treinado (pontuação técnica / 100
+  > 0.7); o modelo treinado usa a hora do relógio como feature e não tem como
+  ser reproduzido no histórico;
+- sentimento: sem histórico de notícias, neutro (0.0, sempre acima de
+  SENTIMENTO_MINIMO);
+- desfecho: primeira passagem por alvo (+ALVO_PERCENTUAL) ou stop
+  (-STOP_PERCENTUAL) nas máximas/mínimas dos candles seguintes até o prazo do
+  outcome_engine (EXPIRY_DAYS), com as mesmas regras: alvo e stop no mesmo
+  candle vale o stop; sem passagem até o prazo, sucesso se a máxima chegou a
+  80% do caminho até o alvo.
+
+Entrada no fechamento da vela do sinal; o caminho começa na vela seguinte.
+Como no scanner, um símbolo com trade aberto não gera sinal novo até a saída.
+Indicadores com média exponencial (RSI, MACD) são calculados sobre a série
+inteira, não sobre a janela de 3 dias que o scanner busca, então os valores
+das primeiras velas de cada janela ao vivo podem diferir um pouco.
+
+A primeira passagem de cada nível de alvo/stop é calculada para todas as velas
+(janelas deslizantes de `horizon` candles, em blocos) e guardada: trocar os
+parâmetros da decisão (run) só refaz a parte barata. O sweep_hybrid usa isso
+para varrer milhares de combinações de parâmetros.
+
+Uso:
+
+    python backtest_hybrid.py [--csv BTCUSDT=historical_data_BTC_USDT_1h.csv ...] [--trades trades.csv]
+"""
+
+import sys
+import time
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+import signal_generator_hybrid as sgh
+from ml_model_loader import ml_model, RECOMMENDATION_THRESHOLDS
+from outcome_engine import EXPIRY_DAYS, PARTIAL_TARGET_RATIO
+from technical_indicators import calculate_indicators
+
+# Heurística do AIPredictor sem modelo: SEND se confidence_score / 100 > 0.7
+IA_HEURISTICA_LIMIAR = 0.7
+
+# Linhas por bloco no cálculo da primeira passagem (bloco x horizonte na memória)
+PASSAGE_CHUNK = 8192
+
+# Códigos de desfecho por vela
+OPEN, TARGET, STOP, EXPIRED = 0, 1, 2, 3
+
+CONDITIONS = ("sma", "volume", "macd", "rsi")
+
+def default_params() -> Dict:
+    """
+    Parâmetros atuais da estratégia (signal_generator_hybrid + ml_model_loader)
+
+    O corte de BUY fica de fora: com a heurística da IA (só SEND ou SKIP), BUY e
+    WEAK_BUY levam à mesma decisão, então só strong_buy e weak_buy importam.
+    """
+    cutoffs = dict((name, cutoff) for cutoff, name in RECOMMENDATION_THRESHOLDS)
+    return dict(
+        sgh.technical_weights(),
+        min_score=sgh.PONTUACAO_MINIMA_PARA_SINAL,
+        strong_buy=cutoffs["STRONG_BUY"], weak_buy=cutoffs["WEAK_BUY"],
+        target=sgh.ALVO_PERCENTUAL, stop=sgh.STOP_PERCENTUAL,
+    )
+
+def passage_key(level: float, upward: bool) -> tuple:
+    """Chave do cache de primeira passagem (nível arredondado para evitar ruído de float)"""
+    return (round(float(level), 10), upward)
+
+def load_candles(csv_files: Dict[str, str]) -> Dict[str, pd.DataFrame]:
+    """{symbol: DataFrame} a partir de CSVs com timestamp, close, volume e (opcional) high/low"""
+    candles = {}
+    for symbol, path in csv_files.items():
+        df = pd.read_csv(path)
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        candles[symbol] = df.sort_values("timestamp").reset_index(drop=True)
+    return candles
+
+def first_passage(close: np.ndarray, extreme: np.ndarray, horizon: int, level: float,
+                  upward: bool, chunk: int = PASSAGE_CHUNK) -> np.ndarray:
+    """
+    Candle (1..horizon depois da entrada) da primeira passagem por close * (1 ± level)
+
+    Args:
+        close: preço de entrada de cada vela
+        extreme: máximas (upward=True) ou mínimas da mesma série
+        horizon: candles do caminho de cada entrada
+
+    Returns:
+        int16 por vela; 0 = sem passagem no caminho
+    """
+    n = len(close)
+    fill = -np.inf if upward else np.inf
+    # windows[i] = extreme[i + 1 : i + 1 + horizon] (completado com `fill` no fim da série)
+    padded = np.concatenate([extreme[1:], np.full(horizon, fill)])
+    windows = sliding_window_view(padded, horizon)
+    offsets = np.zeros(n, dtype=np.int16)
+    for start in range(0, n, chunk):
+        end = min(n, start + chunk)
+        if upward:
+            hits = windows[start:end] >= (close[start:end] * (1 + level))[:, None]
+        else:
+            hits = windows[start:end] <= (close[start:end] * (1 - level))[:, None]
+        offsets[start:end] = np.where(hits.any(axis=1), hits.argmax(axis=1) + 1, 0)
+    return offsets
+
+class HybridBacktest:
+    """
+    Indicadores, probabilidades do ML e caminhos de preço calculados uma vez
+    para todas as velas; run(params) aplica a camada de decisão e os desfechos
+    """
+
+    def __init__(self, candles: Dict[str, pd.DataFrame], expiry_days: int = EXPIRY_DAYS):
+        self.expiry_days = expiry_days
+        self.timings: Dict[str, float] = {}
+        self.symbols: List[str] = []
+        self.ml_loaded = ml_model.is_loaded
+        self._passages: Dict[tuple, np.ndarray] = {}
+        self._last_outcomes = None
+        self._prepare(candles)
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], symbols: List[str], bounds: List[int],
+                    ml_loaded: bool, passages: Optional[Dict[tuple, np.ndarray]] = None) -> "HybridBacktest":
+        """Backtest sobre arrays já preparados (ex.: memória compartilhada nos workers do sweep)"""
+        backtest = cls.__new__(cls)
+        backtest.expiry_days = EXPIRY_DAYS
+        backtest.timings = {}
+        backtest.symbols = list(symbols)
+        backtest.bounds = list(bounds)
+        backtest.arrays = arrays
+        backtest.horizon = int(arrays["horizon"].max()) if len(arrays["horizon"]) else 0
+        backtest.raw_bars = backtest.bounds[-1]
+        backtest.ml_loaded = ml_loaded
+        backtest._passages = dict(passages or {})
+        backtest._last_outcomes = None
+        return backtest
+
+    def _prepare(self, candles: Dict[str, pd.DataFrame]):
+        start = time.perf_counter()
+        frames = {}
+        for symbol, df in candles.items():
+            indicators = calculate_indicators(df)
+            if not indicators.empty:
+                frames[symbol] = indicators.reset_index(drop=True)
+        self.symbols = list(frames)
+        self.raw_bars = sum(len(df) for df in candles.values())
+        self.timings["indicators"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        probabilities = [ml_model.predict_probabilities(df) for df in frames.values()]
+        self.timings["ml"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        columns = {name: [] for name in ("timestamp", "close", "high", "low", "path_max", "expiry_return",
+                                         "full_horizon", "horizon", "sma", "volume", "macd", "rsi")}
+        bounds = [0]
+        self.horizon = 0
+        for df in frames.values():
+            close = df["close"].to_numpy(dtype=np.float64)
+            high = df["high" if "high" in df.columns else "close"].to_numpy(dtype=np.float64)
+            low = df["low" if "low" in df.columns else "close"].to_numpy(dtype=np.float64)
+            horizon = self._horizon(df["timestamp"])
+            self.horizon = max(self.horizon, horizon)
+            n = len(df)
+            # Máxima do caminho [i+1, i+horizon] e retorno no fim do prazo
+            path_max = pd.Series(high).rolling(horizon, min_periods=1).max().shift(-horizon).to_numpy()
+            expiry_close = np.concatenate([close[horizon:], np.full(min(horizon, n), np.nan)])[:n]
+            columns["timestamp"].append(df["timestamp"].to_numpy(dtype="datetime64[ns]"))
+            columns["close"].append(close)
+            columns["high"].append(high)
+            columns["low"].append(low)
+            columns["path_max"].append(path_max / close)
+            columns["expiry_return"].append(expiry_close / close - 1)
+            columns["full_horizon"].append(np.arange(n) + horizon < n)
+            columns["horizon"].append(np.full(n, horizon, dtype=np.int64))
+            columns["sma"].append((df["close"] > df["sma_50"]).to_numpy())
+            columns["volume"].append((df["volume"] > df["volume_sma_20"]).to_numpy())
+            columns["macd"].append((df["macd_diff"] > 0).to_numpy())
+            columns["rsi"].append((df["rsi"] < 70).to_numpy())
+            bounds.append(bounds[-1] + n)
+        self.arrays = {name: np.concatenate(values) if values else np.array([]) for name, values in columns.items()}
+        self.arrays["ml_probability"] = np.concatenate(probabilities) if probabilities else np.array([])
+        self.bounds = bounds
+        self.timings["paths"] = time.perf_counter() - start
+
+    def _horizon(self, timestamps: pd.Series) -> int:
+        """Candles no prazo do desfecho, pela frequência mediana da série"""
+        step = pd.Series(timestamps).diff().median()
+        if pd.isna(step) or step <= pd.Timedelta(0):
+            step = pd.Timedelta(hours=1)
+        return max(1, int(pd.Timedelta(days=self.expiry_days) / step))
+
+    @property
+    def bars(self) -> int:
+        return self.bounds[-1]
+
+    def passage(self, level: float, upward: bool) -> np.ndarray:
+        """Primeira passagem de todas as velas para um nível (calculada uma vez por nível)"""
+        key = passage_key(level, upward)
+        if key not in self._passages:
+            extreme = self.arrays["high" if upward else "low"]
+            close = self.arrays["close"]
+            parts = []
+            for start, end in zip(self.bounds[:-1], self.bounds[1:]):
+                horizon = int(self.arrays["horizon"][start])
+                parts.append(first_passage(close[start:end], extreme[start:end], horizon, level, upward))
+            self._passages[key] = np.concatenate(parts) if parts else np.array([], dtype=np.int16)
+        return self._passages[key]
+
+    def signals(self, params: Dict) -> np.ndarray:
+        """Máscara das velas em que a decisão híbrida enviaria sinal"""
+        a = self.arrays
+        score = sum(a[name] * params[name] for name in CONDITIONS)
+        technical = score >= params["min_score"]
+        ai_send = score / 100.0 > IA_HEURISTICA_LIMIAR
+        if not self.ml_loaded:
+            # Fallback do sistema híbrido: só a IA decide
+            return technical & ai_send
+        p = a["ml_probability"]
+        strong = p >= params["strong_buy"]
+        buy_or_weak = (p >= params["weak_buy"]) & ~strong
+        # STRONG_BUY envia mesmo com a IA em SKIP; BUY e WEAK_BUY precisam da IA (SEND na
+        # heurística), por isso o corte de BUY não muda a decisão
+        return technical & (strong | (buy_or_weak & ai_send))
+
+    def outcomes(self, params: Dict):
+        """
+        Desfecho, candles até a saída, retorno e sucesso de uma entrada em cada vela
+
+        Guarda o último par alvo/stop: parâmetros ordenados por alvo/stop só
+        recalculam os desfechos quando o par muda.
+        """
+        key = (params["target"], params["stop"])
+        if self._last_outcomes is None or self._last_outcomes[0] != key:
+            self._last_outcomes = (key, self._outcomes(params))
+        return self._last_outcomes[1]
+
+    def _outcomes(self, params: Dict):
+        up = self.passage(params["target"], upward=True)
+        down = self.passage(params["stop"], upward=False)
+        hit_stop = (down > 0) & ((up == 0) | (down <= up))
+        hit_target = (up > 0) & ~hit_stop
+        expired = ~hit_stop & ~hit_target & self.arrays["full_horizon"]
+        code = np.select([hit_target, hit_stop, expired], [TARGET, STOP, EXPIRED], OPEN)
+        held = np.where(hit_stop, down, np.where(hit_target, up, self.arrays["horizon"])).astype(np.int64)
+        returns = np.select([hit_target, hit_stop, expired],
+                            [params["target"], -params["stop"], self.arrays["expiry_return"]], np.nan)
+        partial = self.arrays["path_max"] - 1 >= params["target"] * PARTIAL_TARGET_RATIO
+        success = hit_target | (expired & partial)
+        return code, held, returns, success
+
+    def select_trades(self, signal_mask: np.ndarray, code: np.ndarray, held: np.ndarray) -> np.ndarray:
+        """Índices das entradas com no máximo um trade aberto por símbolo"""
+        taken = []
+        for start, end in zip(self.bounds[:-1], self.bounds[1:]):
+            candidates = start + np.flatnonzero(signal_mask[start:end])
+            if not len(candidates):
+                continue
+            # Próximo candidato depois da saída de cada um (vetorizado); o encadeamento
+            # é sequencial, mas só anda por listas de inteiros
+            following = np.searchsorted(candidates, candidates + held[candidates], side="right").tolist()
+            still_open = (code[candidates] == OPEN).tolist()
+            chain, pos = [], 0
+            while pos < len(following):
+                chain.append(pos)
+                if still_open[pos]:
+                    break  # continua aberto até o fim da série
+                pos = following[pos]
+            taken.append(candidates[chain])
+        return np.concatenate(taken) if taken else np.array([], dtype=np.int64)
+
+    def run(self, params: Optional[Dict] = None) -> Dict:
+        """
+        Aplica a decisão e os desfechos com `params` (padrão: default_params())
+
+        Returns:
+            dict com summary (métricas agregadas), per_symbol e trades (índices)
+        """
+        params = dict(default_params(), **(params or {}))
+        signal_mask = self.signals(params)
+        code, held, returns, success = self.outcomes(params)
+        trades = self.select_trades(signal_mask, code, held)
+        symbol_ids = np.searchsorted(self.bounds, trades, side="right") - 1
+        summary = summarize(code[trades], returns[trades], success[trades], held[trades],
+                            self.arrays["timestamp"][trades])
+        summary["signals"] = int(signal_mask.sum())
+        per_symbol = {
+            symbol: summarize(code[trades[symbol_ids == k]], returns[trades[symbol_ids == k]],
+                              success[trades[symbol_ids == k]], held[trades[symbol_ids == k]],
+                              self.arrays["timestamp"][trades[symbol_ids == k]])
+            for k, symbol in enumerate(self.symbols)
+        }
+        return {"params": params, "summary": summary, "per_symbol": per_symbol,
+                "trades": trades, "code": code, "returns": returns, "success": success, "held": held}
+
+    def evaluate(self, params: Dict) -> Dict:
+        """Só as métricas agregadas de `params` completo (caminho rápido do sweep)"""
+        signal_mask = self.signals(params)
+        code, held, returns, success = self.outcomes(params)
+        trades = self.select_trades(signal_mask, code, held)
+        summary = summarize(code[trades], returns[trades], success[trades], held[trades],
+                            self.arrays["timestamp"][trades])
+        summary["signals"] = int(signal_mask.sum())
+        return summary
+
+    def trades_frame(self, result: Dict) -> pd.DataFrame:
+        """Trades de um run() como DataFrame (uma linha por entrada)"""
+        trades = result["trades"]
+        names = {OPEN: "open", TARGET: "target", STOP: "stop", EXPIRED: "expired"}
+        symbol_ids = np.searchsorted(self.bounds, trades, side="right") - 1
+        return pd.DataFrame({
+            "symbol": [self.symbols[k] for k in symbol_ids],
+            "entry_time": self.arrays["timestamp"][trades],
+            "entry_price": self.arrays["close"][trades],
+            "ml_probability": self.arrays["ml_probability"][trades],
+            "outcome": [names[c] for c in result["code"][trades]],
+            "success": result["success"][trades],
+            "candles_held": result["held"][trades],
+            "return_pct": result["returns"][trades] * 100,
+        })
+
+def summarize(code: np.ndarray, returns: np.ndarray, success: np.ndarray, held: np.ndarray,
+              entry_times: np.ndarray) -> Dict:
+    """Métricas de um conjunto de trades (os em aberto não entram no PnL)"""
+    closed = code != OPEN
+    r = returns[closed]
+    order = np.argsort(entry_times[closed], kind="stable")
+    equity = np.cumprod(1 + r[order])
+    drawdown = 1 - equity / np.maximum.accumulate(equity) if len(equity) else np.array([0.0])
+    gains, losses = r[r > 0].sum(), -r[r < 0].sum()
+    return {
+        "trades": int(closed.sum()),
+        "open": int((~closed).sum()),
+        "targets": int((code == TARGET).sum()),
+        "stops": int((code == STOP).sum()),
+        "expired": int((code == EXPIRED).sum()),
+        "hit_rate": round(float(success[closed].mean()) * 100, 2) if closed.any() else 0.0,
+        "pnl_pct": round(float(r.sum()) * 100, 2),
+        "compounded_pct": round(float(equity[-1] - 1) * 100, 2) if len(equity) else 0.0,
+        "avg_return_pct": round(float(r.mean()) * 100, 3) if len(r) else 0.0,
+        "profit_factor": round(float(gains / losses), 3) if losses > 0 else (float("inf") if gains > 0 else 0.0),
+        "max_drawdown_pct": round(float(drawdown.max()) * 100, 2),
+        "avg_candles_held": round(float(held[closed].mean()), 1) if closed.any() else 0.0,
+    }
+
+def _main(argv: List[str]):
+    csv_files = dict(arg.split("=", 1) for arg in argv if "=" in arg and not arg.startswith("--trades"))
+    csv_files = csv_files or {"BTCUSDT": "historical_data_BTC_USDT_1h.csv"}
+    trades_path = argv[argv.index("--trades") + 1] if "--trades" in argv else None
+
+    total_start = time.perf_counter()
+    backtest = HybridBacktest(load_candles(csv_files))
+    start = time.perf_counter()
+    result = backtest.run()
+    backtest.timings["decision+outcomes"] = time.perf_counter() - start
+    elapsed = time.perf_counter() - total_start
+
+    params = result["params"]
+    print(f"[BACKTEST] 📈 {len(backtest.symbols)} símbolos | {backtest.bars} velas | prazo {backtest.horizon} candles | "
+          f"alvo +{params['target']:.1%} / stop -{params['stop']:.1%} | ML {'carregado' if ml_model.is_loaded else 'ausente'}")
+    for symbol, s in result["per_symbol"].items():
+        print(f"   {symbol:12s} {s['trades']:5d} trades | acerto {s['hit_rate']:5.1f}% | PnL {s['pnl_pct']:8.2f}% "
+              f"(composto {s['compounded_pct']:8.2f}%) | PF {s['profit_factor']} | DD {s['max_drawdown_pct']:.1f}%")
+    s = result["summary"]
+    print(f"[BACKTEST] 🎯 Total: {s['signals']} velas com sinal -> {s['trades']} trades ({s['open']} em aberto) | "
+          f"alvo {s['targets']} / stop {s['stops']} / prazo {s['expired']} | acerto {s['hit_rate']:.1f}% | "
+          f"PnL {s['pnl_pct']:.2f}% | composto {s['compounded_pct']:.2f}%")
+    phases = " | ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in backtest.timings.items())
+    print(f"[BACKTEST] ⏱️ {elapsed:.2f}s ({backtest.raw_bars / elapsed:,.0f} velas/s) | {phases}")
+
+    if trades_path:
+        backtest.trades_frame(result).to_csv(trades_path, index=False)
+        print(f"[BACKTEST] 💾 Trades salvos em {trades_path}")
+
+
+if __name__ == "__main__":
+    _main(sys.argv[1:])
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark da análise em paralelo (analysis_pool) com universos crescentes
+
+Cada "símbolo" é uma janela diferente de historical_data_BTC_USDT_1h.csv com o
+mesmo tamanho que o price_fetcher entrega (3 dias em velas de 1h). Compara a
+análise serial com o AnalysisExecutor e confere que os resultados são iguais.
+"""
+
+import contextlib
+import io
+import os
+import time
+import pandas as pd
+from analysis_pool import AnalysisExecutor
+from signal_generator_hybrid import technical_weights, PONTUACAO_MINIMA_PARA_SINAL
+
+WINDOW = 72  # 3 dias de velas de 1h
+UNIVERSES = [25, 100, 400]
+
+def load_universe(size):
+    raw = pd.read_csv("historical_data_BTC_USDT_1h.csv")
+    raw["timestamp"] = pd.to_datetime(raw["timestamp"])
+    raw = raw[["timestamp", "close", "volume"]]
+    step = max(1, (len(raw) - WINDOW) // size)
+    return {
+        f"SYM{i:04d}": raw.iloc[i * step:i * step + WINDOW].reset_index(drop=True)
+        for i in range(size)
+    }
+
+def run(executor, universe):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = executor.analyze(universe, technical_weights(), PONTUACAO_MINIMA_PARA_SINAL)
+    return time.perf_counter() - start, results
+
+def main():
+    workers = max(2, (os.cpu_count() or 2) - 1)
+    serial = AnalysisExecutor(workers=1)
+    parallel = AnalysisExecutor(workers=workers)
+    print(f"🖥️ {os.cpu_count()} CPUs | pool com {workers} processos")
+
+    # Aquece o pool (criação dos processos + carga do modelo) fora da medição
+    run(parallel, load_universe(workers))
+
+    for size in UNIVERSES:
+        universe = load_universe(size)
+        serial_time, expected = run(serial, universe)
+        parallel_time, results = run(parallel, universe)
+        same = all(
+            results[s]["df"].reset_index(drop=True)[["close", "sma_50", "rsi", "macd_diff"]].round(8).equals(
+                expected[s]["df"].reset_index(drop=True)[["close", "sma_50", "rsi", "macd_diff"]].round(8))
+            and results[s].get("ml_prediction") == expected[s].get("ml_prediction")
+            for s in universe
+        )
+        print(f"\n📊 {size} símbolos:")
+        print(f"   🐢 Serial: {serial_time * 1000:.0f}ms | 🚀 Pool: {parallel_time * 1000:.0f}ms | "
+              f"speedup {serial_time / parallel_time:.1f}x | resultados iguais: {same}")
+
+    parallel.shutdown()
+
+if __name__ == "__main__":
+    main()
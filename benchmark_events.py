@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Teste de carga do stream /events (SSE) com centenas de assinantes
+
+Sobe o app Flask de main.py em um servidor local (threads), conecta SUBSCRIBERS
+clientes em /events e publica EVENTS eventos no event_bus, como o scanner faz.
+Cada cliente mede a latência entre a publicação (published_at) e a chegada.
+
+Um cliente extra conecta e nunca lê: quando os buffers do socket e a fila dele
+enchem, o barramento o desconecta sem atrasar os demais.
+"""
+
+import contextlib
+import io
+import json
+import logging
+import socket
+import threading
+import time
+import numpy as np
+from werkzeug.serving import make_server
+
+SUBSCRIBERS = 300
+EVENTS = 40
+EVENT_INTERVAL = 0.05
+# Corpo grande nos eventos da rajada, para encher rápido os buffers do cliente lento
+BURST_EVENTS = 3000
+BURST_PADDING = 4096
+
+def open_stream(port, rcvbuf=None):
+    sock = socket.create_connection(("127.0.0.1", port))
+    if rcvbuf:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    sock.sendall(b"GET /events?types=signal HTTP/1.1\r\nHost: localhost\r\nAccept: text/event-stream\r\n\r\n")
+    return sock
+
+def reader(sock, latencies, expected, done):
+    """Lê eventos SSE até receber `expected` sinais"""
+    received = 0
+    with sock.makefile("rb") as stream:
+        for line in stream:
+            if not line.startswith(b"data: "):
+                continue
+            payload = json.loads(line[6:])
+            latencies.append(time.time() - payload["published_at"])
+            received += 1
+            if received >= expected:
+                break
+    done.append(received)
+    sock.close()
+
+def main():
+    with contextlib.redirect_stdout(io.StringIO()):
+        from main import app
+        from event_bus import event_bus
+    logging.getLogger("werkzeug").disabled = True
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    latencies, done = [], []
+    sockets = [open_stream(server.port) for _ in range(SUBSCRIBERS)]
+    threads = [threading.Thread(target=reader, args=(sock, latencies, EVENTS, done), daemon=True)
+               for sock in sockets]
+    for thread in threads:
+        thread.start()
+    deadline = time.time() + 30
+    while event_bus.statistics()["subscribers"] < SUBSCRIBERS and time.time() < deadline:
+        time.sleep(0.05)
+    print(f"📡 {event_bus.statistics()['subscribers']} assinantes conectados")
+
+    start = time.perf_counter()
+    for i in range(EVENTS):
+        event_bus.publish("signal", {"symbol": f"SYM{i:03d}", "seq": i})
+        time.sleep(EVENT_INTERVAL)
+    for thread in threads:
+        thread.join(timeout=30)
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    print(f"   Entregues: {len(latencies):,}/{SUBSCRIBERS * EVENTS:,} em {elapsed:.1f}s | "
+          f"clientes completos {sum(1 for r in done if r == EVENTS)}/{SUBSCRIBERS}")
+    print(f"   Latência publicação → cliente: p50 {np.percentile(latencies, 50):.1f}ms | "
+          f"p99 {np.percentile(latencies, 99):.1f}ms | máx {latencies.max():.1f}ms")
+
+    # Cliente lento: conecta e nunca lê
+    slow = open_stream(server.port, rcvbuf=4096)
+    fast_latencies, fast_done = [], []
+    fast = open_stream(server.port)
+    fast_thread = threading.Thread(target=reader, args=(fast, fast_latencies, BURST_EVENTS, fast_done), daemon=True)
+    fast_thread.start()
+    time.sleep(0.5)
+    before = event_bus.statistics()["dropped_subscribers"]
+    padding = "x" * BURST_PADDING
+    burst_start = time.perf_counter()
+    for i in range(BURST_EVENTS):
+        event_bus.publish("signal", {"seq": i, "padding": padding})
+        if i % 100 == 0:
+            time.sleep(0.01)
+    publish_seconds = time.perf_counter() - burst_start
+    fast_thread.join(timeout=60)
+    stats = event_bus.statistics()
+    print(f"\n   Rajada de {BURST_EVENTS} eventos de {BURST_PADDING // 1024}KB publicada em {publish_seconds:.2f}s")
+    print(f"   Cliente lento desconectado: {stats['dropped_subscribers'] > before} | "
+          f"cliente rápido recebeu {fast_done[0] if fast_done else 0}/{BURST_EVENTS}")
+    slow.close()
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
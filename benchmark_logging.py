@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Custo do logging no laço do scan: detalhado vs silencioso
+
+Roda o scan em lote (scanner_hybrid._scan_batch) sobre SYMBOLS janelas de
+historical_data_BTC_USDT_1h.csv, com a busca simulada (sem rede e sem o
+intervalo entre requisições). Indicadores, ML, decisão em etapas e
+enfileiramento das notificações rodam de verdade.
+
+Cada modo roda em um subprocesso (LOG_LEVEL/LOG_ASYNC são lidos na importação),
+em um diretório temporário (armazenamento JSON e outbox descartáveis), com o
+stdout ligado a um pipe lido pelo processo pai, como em produção. Além do
+ciclo inteiro, mede o custo de uma mensagem por símbolo na thread do scan:
+
+- print síncrono: LOG_LEVEL=DEBUG, LOG_ASYNC=false (equivale aos prints antigos);
+- detalhado: LOG_LEVEL=DEBUG com escrita assíncrona;
+- silencioso: LOG_LEVEL=INFO (padrão), mensagens por símbolo descartadas.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SYMBOLS = 150
+WINDOW = 120
+CYCLES = 4
+MESSAGES = 20_000
+
+MODES = [
+    ("print síncrono", {"LOG_LEVEL": "DEBUG", "LOG_ASYNC": "false"}),
+    ("detalhado (assíncrono)", {"LOG_LEVEL": "DEBUG", "LOG_ASYNC": "true"}),
+    ("silencioso", {"LOG_LEVEL": "INFO", "LOG_ASYNC": "true"}),
+]
+
+def child(repo):
+    import numpy as np
+    import pandas as pd
+    import scanner_hybrid
+    from structured_log import log_buffer
+
+    raw = pd.read_csv(os.path.join(repo, "historical_data_BTC_USDT_1h.csv"))
+    raw["timestamp"] = pd.to_datetime(raw["timestamp"])
+    step = (len(raw) - WINDOW) // SYMBOLS
+    universe = {
+        f"SYM{i:04d}USDT": raw.iloc[i * step:i * step + WINDOW].reset_index(drop=True)
+        for i in range(SYMBOLS)
+    }
+    rng = np.random.default_rng(3)
+    sentiment = {symbol: float(rng.uniform(-1, 1)) for symbol in universe}
+
+    def fake_fetch_all(symbols):
+        # Mesmas mensagens por símbolo de price_fetcher.fetch_all_data, sem rede
+        for symbol in symbols:
+            scanner_hybrid.log.debug("🔁 Buscando dados de %s...", symbol, extra={"symbol": symbol})
+            scanner_hybrid.log.debug("✅ Dados de %s recebidos com sucesso.", symbol, extra={"symbol": symbol})
+        return {symbol: universe[symbol] for symbol in symbols}
+
+    scanner_hybrid.fetch_all_data = fake_fetch_all
+    scanner_hybrid.get_sentiment_scores = lambda symbols: {s: sentiment[s] for s in symbols}
+
+    timings = []
+    for cycle in range(CYCLES + 1):
+        scanner_hybrid.hybrid_evaluator.begin_cycle()
+        start = time.perf_counter()
+        scanner_hybrid._scan_batch(list(universe))
+        if cycle:  # o primeiro ciclo aquece o pool de processos
+            timings.append(time.perf_counter() - start)
+    scanner_hybrid.analysis_executor.shutdown()
+    records = log_buffer.statistics()["total"]
+
+    start = time.perf_counter()
+    for i in range(MESSAGES):
+        symbol = f"SYM{i % SYMBOLS:04d}USDT"
+        scanner_hybrid.log.debug("🧠 Sentimento para %s: %.2f", symbol, sentiment[symbol], extra={"symbol": symbol})
+    per_message = (time.perf_counter() - start) / MESSAGES
+    sys.stderr.write(json.dumps({"timings": timings, "records": records, "per_message": per_message}) + "\n")
+
+def run_mode(env):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        repo = os.path.dirname(os.path.abspath(__file__))
+        child_env = dict(os.environ, **env, PYTHONPATH=repo, STORAGE_BACKEND="json", PYTHONWARNINGS="ignore")
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", repo],
+            cwd=tmp_dir, env=child_env, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        result = json.loads(proc.stderr.decode().strip().splitlines()[-1])
+        result["stdout_kb"] = len(proc.stdout) / 1024
+        return result
+
+def main():
+    print(f"📏 Scan em lote de {SYMBOLS} símbolos, {CYCLES} ciclos por modo")
+    for label, env in MODES:
+        result = run_mode(env)
+        per_cycle = statistics.median(result["timings"])
+        print(f"   {label:24s} ciclo {per_cycle * 1000:7.0f} ms | "
+              f"{result['records'] / (CYCLES + 1):4.0f} registros/ciclo | "
+              f"{result['per_message'] * 1e6:5.1f} µs/mensagem | stdout {result['stdout_kb']:5.0f} KB")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--child":
+        sys.path.insert(0, sys.argv[2])
+        child(sys.argv[2])
+    else:
+        main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark do monitoramento de resultados com 50 mil sinais históricos
+Compara a varredura da lista (implementação antiga) com o MonitorStore indexado
+"""
+
+import random
+import time
+from datetime import datetime, timedelta
+from monitor_store import MonitorStore
+
+HISTORICAL_SIGNALS = 50_000
+ACTIVE_SIGNALS = 200
+CYCLES = 20
+SYMBOLS = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT", "ADAUSDT", "DOTUSDT", "LINKUSDT"]
+
+def build_entries():
+    """Gera sinais concluídos antigos e alguns sinais ativos recentes"""
+    now = datetime.now()
+    entries = []
+    for i in range(HISTORICAL_SIGNALS + ACTIVE_SIGNALS):
+        active = i >= HISTORICAL_SIGNALS
+        created = now - timedelta(hours=random.randint(1, 100)) if active \
+            else now - timedelta(days=random.randint(8, 700))
+        entries.append({
+            'signal_id': f"sig-{i}",
+            'symbol': random.choice(SYMBOLS),
+            'entry_price': 100.0,
+            'target_price': 104.0,
+            'stop_loss': 98.0,
+            'created_at': created.strftime("%Y-%m-%d %H:%M:%S"),
+            'status': 'monitoring' if active else 'completed',
+            'result': None if active else random.choice(['success', 'failure']),
+            'completion_date': None,
+            'days_to_result': None,
+            'max_price_reached': 101.0,
+            'min_price_reached': 99.0
+        })
+    return entries
+
+def legacy_cycle(monitoring_data):
+    """Trabalho por ciclo da implementação baseada em lista"""
+    active_signals = [s for s in monitoring_data if s['status'] == 'monitoring']
+    symbols = list(set([s['symbol'] for s in active_signals]))
+    cutoff_date = datetime.now() - timedelta(days=7)
+    expired = [s for s in active_signals if datetime.fromisoformat(s['created_at']) < cutoff_date]
+    stats = {
+        'total_monitored': len(monitoring_data),
+        'active_monitoring': len([s for s in monitoring_data if s['status'] == 'monitoring']),
+        'completed': len([s for s in monitoring_data if s['status'] == 'completed']),
+        'successful': len([s for s in monitoring_data if s['result'] == 'success'])
+    }
+    return symbols, expired, stats
+
+def store_cycle(store):
+    """Trabalho por ciclo com o MonitorStore"""
+    active_signals = store.active_entries()
+    symbols = store.active_symbols()
+    expired = store.pop_expired()
+    stats = store.statistics()
+    return symbols, expired, stats, active_signals
+
+def measure(func, *args):
+    start = time.perf_counter()
+    for _ in range(CYCLES):
+        func(*args)
+    return (time.perf_counter() - start) / CYCLES * 1000
+
+def main():
+    random.seed(42)
+    entries = build_entries()
+
+    start = time.perf_counter()
+    store = MonitorStore(entries)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    legacy_ms = measure(legacy_cycle, entries)
+    store_ms = measure(store_cycle, store)
+
+    assert store.statistics()['total_monitored'] == len(entries)
+    assert store.statistics()['active_monitoring'] == ACTIVE_SIGNALS
+
+    print(f"📊 Sinais: {HISTORICAL_SIGNALS} históricos + {ACTIVE_SIGNALS} ativos")
+    print(f"   🏗️ Construção do índice (uma vez na inicialização): {build_ms:.1f} ms")
+    print(f"   🐢 Lista (antigo): {legacy_ms:.3f} ms/ciclo")
+    print(f"   🚀 MonitorStore:   {store_ms:.3f} ms/ciclo")
+    print(f"   ⚡ Ganho: {legacy_ms / store_ms:.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Teste de vazão das notificações contra o Telegram fake local
+
+Cada sinal vai para todos os destinos (fan-out). Compara o envio bloqueante
+(um POST por destino dentro do loop do scanner) com o NotificationDispatcher +
+FanoutEngine (renderização única, pool de conexões, rate limit por destino).
+"""
+
+import os
+import tempfile
+import time
+import notifier
+from fake_telegram_server import start_fake_server
+from fanout import FanoutEngine, TelegramDestination
+from notification_dispatcher import NotificationDispatcher
+
+MESSAGES = 10
+CHATS = [f"@canal_{i:02d}" for i in range(12)]
+LATENCY = 0.15  # segundos por requisição no servidor fake
+
+def run_blocking(url):
+    """Implementação antiga: o loop espera cada POST terminar"""
+    server_url = notifier.TELEGRAM_API_BASE
+    notifier.TELEGRAM_API_BASE = url
+    start = time.perf_counter()
+    ok = 0
+    for i in range(MESSAGES):
+        for chat_id in CHATS:
+            ok += notifier.deliver_telegram_message(chat_id, f"sinal {i}")[0]
+    elapsed = time.perf_counter() - start
+    notifier.TELEGRAM_API_BASE = server_url
+    return elapsed, ok
+
+def run_fanout(url):
+    """Dispatcher: o loop só enfileira; a entrega acontece em segundo plano
+
+    O ritmo por destino fica um pouco abaixo do limite do servidor (0.9 msg/s),
+    como deve ser configurado em produção.
+    """
+    server_url = notifier.TELEGRAM_API_BASE
+    notifier.TELEGRAM_API_BASE = url
+    engine = FanoutEngine([
+        TelegramDestination(chat_id, chat_id, rate_per_sec=0.9, burst=1) for chat_id in CHATS
+    ])
+    outbox = os.path.join(tempfile.mkdtemp(), "outbox.json")
+    delivered = []
+    dispatcher = NotificationDispatcher(engine, outbox_file=outbox, workers=16)
+    dispatcher.register_callback("delivered", delivered.append)
+    dispatcher.start()
+
+    start = time.perf_counter()
+    for i in range(MESSAGES):
+        dispatcher.submit(f"sinal {i}", callback="delivered", context={"n": i})
+    enqueue_time = time.perf_counter() - start
+    dispatcher.flush(timeout=120)
+    total_time = time.perf_counter() - start
+    dispatcher.stop()
+    notifier.TELEGRAM_API_BASE = server_url
+    return enqueue_time, total_time, len(delivered), dispatcher.statistics()
+
+def main():
+    deliveries = MESSAGES * len(CHATS)
+    print(f"📨 {MESSAGES} sinais x {len(CHATS)} destinos = {deliveries} entregas | "
+          f"latência {LATENCY}s | limite 1 msg/s por chat")
+
+    server, state, url = start_fake_server(latency=LATENCY, per_chat_limit=1, window=1.0)
+    blocked, ok = run_blocking(url)
+    print("\n🐢 Envio bloqueante:")
+    print(f"   ⏱️ Scanner bloqueado: {blocked:.2f}s | entregues: {ok}/{deliveries} | 429: {state.throttled}")
+    server.shutdown()
+
+    server, state, url = start_fake_server(latency=LATENCY, per_chat_limit=1, window=1.0)
+    blocked, total, callbacks, stats = run_fanout(url)
+    latencies = list(stats["delivery_latency"].values())
+    worst_p99 = max(l["p99_ms"] for l in latencies) if latencies else 0
+    print("\n🚀 NotificationDispatcher + FanoutEngine:")
+    print(f"   ⏱️ Scanner bloqueado: {blocked * 1000:.1f}ms | entrega total: {total:.2f}s")
+    print(f"   ✅ Entregues: {stats['sent']}/{deliveries} | callbacks: {callbacks}/{MESSAGES} | "
+          f"429: {state.throttled} | retries: {stats['retries']}")
+    print(f"   📈 Vazão: {stats['sent'] / total:.1f} entregas/s | pior p99 por destino: {worst_p99:.0f}ms")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
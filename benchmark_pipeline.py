@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark do scan em lote vs pipeline assíncrono (scan_pipeline)
+
+A busca é simulada: cada símbolo é uma janela de historical_data_BTC_USDT_1h.csv
+entregue após FETCH_LATENCY segundos, respeitando FETCH_INTERVAL entre inícios
+de requisição (como o rate limit da CoinGecko). Indicadores e ML rodam de verdade
+(AnalysisExecutor); a predição aplica o filtro técnico e a notificação só coleta
+os sinais, para não tocar no banco nem no Telegram.
+
+Mede o tempo até o primeiro sinal, o tempo total do ciclo e a profundidade das
+filas entre as etapas.
+"""
+
+import contextlib
+import io
+import time
+import pandas as pd
+from analysis_pool import AnalysisExecutor
+from scan_pipeline import PipelineStage, ScanPipeline
+from signal_generator_hybrid import technical_weights, PONTUACAO_MINIMA_PARA_SINAL
+
+WINDOW = 72  # 3 dias de velas de 1h
+SYMBOLS = 40
+FETCH_LATENCY = 0.3
+FETCH_INTERVAL = 0.2
+
+def load_universe(size):
+    raw = pd.read_csv("historical_data_BTC_USDT_1h.csv")
+    raw["timestamp"] = pd.to_datetime(raw["timestamp"])
+    raw = raw[["timestamp", "close", "volume"]]
+    step = max(1, (len(raw) - WINDOW) // size)
+    return {
+        f"SYM{i:04d}": raw.iloc[i * step:i * step + WINDOW].reset_index(drop=True)
+        for i in range(size)
+    }
+
+def fake_fetch(universe, symbol):
+    time.sleep(FETCH_LATENCY)
+    return universe[symbol]
+
+def run_batch(executor, universe):
+    start = time.perf_counter()
+    first_signal = None
+    signals = []
+
+    market_data = {}
+    for i, symbol in enumerate(universe):
+        if i:
+            time.sleep(FETCH_INTERVAL)
+        market_data[symbol] = fake_fetch(universe, symbol)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        analysis = executor.analyze(market_data, technical_weights(), PONTUACAO_MINIMA_PARA_SINAL)
+    for symbol, result in analysis.items():
+        if result.get("confidence_score", 0) >= PONTUACAO_MINIMA_PARA_SINAL:
+            signals.append(symbol)
+            if first_signal is None:
+                first_signal = time.perf_counter() - start
+    return time.perf_counter() - start, first_signal, signals, None
+
+def run_pipeline(executor, universe, fetch_concurrency=2, queue_size=8):
+    signals = []
+
+    def fetch(symbol):
+        return symbol, fake_fetch(universe, symbol)
+
+    def analyze(item):
+        symbol, df = item
+        with contextlib.redirect_stdout(io.StringIO()):
+            return symbol, executor.analyze_one(df, technical_weights(), PONTUACAO_MINIMA_PARA_SINAL)
+
+    def predict(item):
+        symbol, result = item
+        return symbol if result.get("confidence_score", 0) >= PONTUACAO_MINIMA_PARA_SINAL else None
+
+    def notify(symbol):
+        signals.append(symbol)
+        return symbol
+
+    pipeline = ScanPipeline([
+        PipelineStage("fetch", fetch, concurrency=fetch_concurrency, min_interval=FETCH_INTERVAL),
+        PipelineStage("indicators", analyze, concurrency=max(1, executor.workers)),
+        PipelineStage("predict", predict),
+        PipelineStage("notify", notify),
+    ], queue_size=queue_size)
+    metrics = pipeline.run(list(universe))
+    return metrics["total_seconds"], metrics["time_to_first_output"], signals, metrics["stages"]
+
+def report(label, total, first, signals, stages):
+    first_text = f"{first:.2f}s" if first is not None else "—"
+    print(f"   {label}: primeiro sinal {first_text} | ciclo {total:.2f}s | {len(signals)} sinais")
+    for name, stats in (stages or {}).items():
+        print(f"      🚰 {name}: fila máx {stats['queue_max_depth']} | média {stats['queue_avg_depth']:.1f} | "
+              f"ocupado {stats['busy_seconds']:.2f}s | descartados {stats['dropped']}")
+
+def main():
+    universe = load_universe(SYMBOLS)
+    executor = AnalysisExecutor()
+    print(f"📊 {SYMBOLS} símbolos | busca {FETCH_LATENCY}s + {FETCH_INTERVAL}s entre requisições | "
+          f"{executor.workers} processos de análise")
+
+    # Aquece o pool (criação dos processos + carga do modelo) fora da medição
+    with contextlib.redirect_stdout(io.StringIO()):
+        executor.analyze(dict(list(universe.items())[:2]), technical_weights(), PONTUACAO_MINIMA_PARA_SINAL)
+        executor.analyze_one(next(iter(universe.values())), technical_weights(), PONTUACAO_MINIMA_PARA_SINAL)
+
+    batch = run_batch(executor, universe)
+    report("🐢 Lote", *batch)
+    pipeline = run_pipeline(executor, universe)
+    report("🚀 Pipeline", *pipeline)
+    print(f"\n   Mesmos sinais: {sorted(batch[2]) == sorted(pipeline[2])}")
+
+    executor.shutdown()
+
+if __name__ == "__main__":
+    main()
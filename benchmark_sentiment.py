@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Teste de vazão da etapa de sentimento contra a NewsAPI fake local
+
+Compara a implementação antiga (uma busca por símbolo, em série, e um TextBlob
+por artigo) com o NewsSentimentFetcher (buscas concorrentes, deduplicação de
+artigos e pontuação em lote), conferindo que os scores são os mesmos.
+"""
+
+import time
+import requests
+from textblob import TextBlob
+from fake_news_server import start_fake_server
+from news_sentiment import NewsSentimentFetcher
+from scanner_hybrid import SYMBOLS, symbol_map
+
+LATENCY = 0.3  # segundos por requisição no servidor fake
+
+def serial_scores(url):
+    """Implementação antiga: busca e pontua símbolo por símbolo"""
+    scores = {}
+    for symbol in SYMBOLS:
+        params = {"q": symbol_map.get(symbol, symbol), "language": "en", "sortBy": "publishedAt",
+                  "pageSize": 5, "apiKey": "fake"}
+        resp = requests.get(url, params=params, timeout=10)
+        resp.raise_for_status()
+        articles = resp.json().get("articles") or []
+        sentiment_sum = 0
+        for article in articles:
+            text = (article.get("title") or "") + " " + (article.get("description") or "")
+            sentiment_sum += TextBlob(text).sentiment.polarity
+        scores[symbol] = sentiment_sum / len(articles) if articles else 0
+    return scores
+
+def main():
+    server, state, url = start_fake_server(latency=LATENCY)
+    print(f"📰 {len(SYMBOLS)} símbolos | latência {LATENCY}s por busca")
+
+    start = time.perf_counter()
+    expected = serial_scores(url)
+    serial_time = time.perf_counter() - start
+    print(f"\n🐢 Serial: {serial_time:.2f}s")
+
+    fetcher = NewsSentimentFetcher("fake", symbol_map, api_url=url, workers=len(SYMBOLS))
+    start = time.perf_counter()
+    scores = fetcher(SYMBOLS)
+    first_time = time.perf_counter() - start
+    start = time.perf_counter()
+    fetcher(SYMBOLS)
+    second_time = time.perf_counter() - start
+
+    max_diff = max(abs(scores[s] - expected[s]) for s in SYMBOLS)
+    stats = fetcher.stats
+    print("\n🚀 NewsSentimentFetcher:")
+    print(f"   ⏱️ Primeiro ciclo: {first_time:.2f}s | próximo ciclo (artigos memorizados): {second_time:.2f}s")
+    print(f"   📰 Artigos: {stats['articles']} | únicos: {stats['unique_articles']} | pontuados: {stats['scored']}")
+    print(f"   🎯 Diferença máxima de score vs serial: {max_diff:.2e}")
+    print(f"   📈 Speedup: {serial_time / first_time:.1f}x")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark da API de histórico de sinais (signal_history) com 120 mil sinais
+
+Gera um arquivo histórico sintético (24 partições mensais de outcomes) em um
+diretório temporário, mais algumas centenas de sinais quentes, e compara com a
+abordagem antiga (ler tudo e filtrar):
+
+- primeira página, página com filtros e percurso de 20 páginas pelo cursor;
+- estatísticas por símbolo;
+- busca por ID.
+
+Também confere que as páginas batem com o resultado da varredura completa e
+mede o pico de memória de cada consulta (tracemalloc).
+"""
+
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+import pandas as pd
+from history_archive import HistoryArchive
+from signal_history import SignalHistory, _until_bound
+
+SIGNALS = 120_000
+HOT = 500
+SYMBOLS = [f"SYM{i:03d}USDT" for i in range(80)]
+STRATEGIES = ["ML Primary (BUY) + IA (SEND)", "ML Override (STRONG_BUY)", "IA Decision (SEND)", "IA Fallback (SEND)"]
+
+def make_entry(rng, created_at, completed=True):
+    entry = 100 * rng.random() + 1
+    return {
+        "signal_id": f"{rng.getrandbits(128):032x}",
+        "symbol": rng.choice(SYMBOLS),
+        "entry_price": entry, "target_price": entry * 1.04, "stop_loss": entry * 0.98,
+        "created_at": created_at.strftime("%Y-%m-%d %H:%M:%S"),
+        "status": "completed" if completed else "monitoring",
+        "result": rng.choice(["success", "failure"]) if completed else None,
+        "completion_date": (created_at + timedelta(days=2)).isoformat() if completed else None,
+        "days_to_result": rng.randint(1, 7) if completed else None,
+        "max_price_reached": entry * 1.05, "min_price_reached": entry * 0.97,
+        "strategy": rng.choice(STRATEGIES)
+    }
+
+def build(tmp_dir):
+    rng = random.Random(7)
+    start = datetime(2024, 11, 1)
+    span = (datetime(2026, 11, 1) - start).total_seconds()
+    entries = [make_entry(rng, start + timedelta(seconds=rng.random() * span)) for _ in range(SIGNALS)]
+    archive = HistoryArchive(tmp_dir)
+    archive.append("outcomes", entries)
+    now = datetime(2026, 11, 1)
+    hot = [make_entry(rng, now + timedelta(minutes=i), completed=i % 3 == 0) for i in range(HOT)]
+    return archive, hot
+
+def naive_query(archive, hot, symbol=None, result=None, until=None, limit=50, after=None):
+    """Como antes: tudo em memória, filtro e ordenação a cada requisição"""
+    df = pd.concat([archive.read("outcomes"), pd.DataFrame(hot)], ignore_index=True)
+    df["result"] = df["result"].fillna("")
+    if symbol:
+        df = df[df["symbol"] == symbol]
+    if result:
+        df = df[df["result"] == result]
+    if until:
+        df = df[df["created_at"] <= until]
+    if after:
+        df = df[(df["created_at"] < after[0]) | ((df["created_at"] == after[0]) & (df["signal_id"] < after[1]))]
+    return df.sort_values(["created_at", "signal_id"], ascending=False).head(limit)["signal_id"].tolist()
+
+def measure(label, func, repeat=5):
+    func()  # aquece caches/índices fora da medição
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        value = func()
+    elapsed = (time.perf_counter() - start) / repeat
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"   {label}: {elapsed * 1000:8.1f} ms | pico {peak / 1e6:6.1f} MB")
+    return value
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"📦 Gerando {SIGNALS:,} sinais arquivados + {HOT} quentes...")
+        archive, hot = build(tmp_dir)
+        history = SignalHistory(lambda: [dict(e) for e in hot], archive=archive)
+        symbol = SYMBOLS[3]
+        until = _until_bound("2025-06-15")
+        probe = archive.read("outcomes", ["signal_id"]).iloc[1234]["signal_id"]
+
+        print("\n🐢 Varredura completa:")
+        measure("primeira página", lambda: naive_query(archive, hot), repeat=2)
+        measure("filtro símbolo+resultado+data", lambda: naive_query(archive, hot, symbol, "success", until), repeat=2)
+        measure("busca por ID", lambda: archive.read("outcomes").loc[lambda df: df["signal_id"] == probe], repeat=2)
+
+        print("\n🚀 signal_history:")
+        first = measure("primeira página", lambda: history.query())
+        filtered = measure("filtro símbolo+resultado+data",
+                           lambda: history.query(symbol=symbol, result="success", until="2025-06-15"))
+        measure("busca por ID", lambda: history.get(probe))
+        stats = measure("estatísticas por símbolo", lambda: history.statistics())
+
+        def walk(pages=20):
+            cursor, ids = None, []
+            for _ in range(pages):
+                page = history.query(cursor=cursor, limit=100)
+                ids += [s["signal_id"] for s in page["signals"]]
+                cursor = page["next_cursor"]
+            return ids
+        walked = measure("20 páginas de 100 pelo cursor", walk, repeat=1)
+
+        ok_first = [s["signal_id"] for s in first["signals"]] == naive_query(archive, hot)
+        ok_filtered = [s["signal_id"] for s in filtered["signals"]] == naive_query(archive, hot, symbol, "success", until)
+        ok_walk = walked == naive_query(archive, hot, limit=2000)
+        print(f"\n   Páginas iguais à varredura: {ok_first and ok_filtered and ok_walk} | "
+              f"total {stats['total']:,} | taxa de acerto {stats['win_rate']}% | {len(stats['by_symbol'])} símbolos")
+        print(f"   Índice: {history.index_statistics()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Teste de carga de GET /status: snapshot reconstruído por requisição vs em memória
+
+Sobe o app Flask de main.py em um servidor local (threads) e dispara requisições
+de CLIENTS threads durante DURATION segundos em três cenários:
+
+1. sem cache (STATUS_CACHE=false): cada requisição monta e serializa o status;
+2. com cache: corpo e ETag prontos, reconstruídos no máximo uma vez por TTL;
+3. com cache + If-None-Match: clientes que já têm o ETag recebem 304 sem corpo.
+
+Em paralelo roda um laço CPU-bound no lugar do scanner; o número de voltas
+mostra quanto do GIL as requisições tiraram do scan.
+"""
+
+import contextlib
+import http.client
+import io
+import threading
+import time
+from werkzeug.serving import make_server
+
+CLIENTS = 8
+DURATION = 5.0
+
+def fake_scanner(stop, counter):
+    """Trabalho puro em Python, como indicadores e pontuação do scan"""
+    while not stop.is_set():
+        sum(i * i for i in range(2000))
+        counter[0] += 1
+
+def client(port, stop, counts, errors, use_etag):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    etag = None
+    done = 0
+    while not stop.is_set():
+        headers = {"If-None-Match": etag} if use_etag and etag else {}
+        try:
+            conn.request("GET", "/status", headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status not in (200, 304):
+                errors.append(response.status)
+            etag = response.getheader("ETag", etag)
+            done += 1
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    counts.append(done)
+    conn.close()
+
+def run_scenario(app, snapshots, enabled, use_etag):
+    snapshots.enabled = enabled
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    stop = threading.Event()
+    counts, errors, scanner_loops = [], [], [0]
+    scanner = threading.Thread(target=fake_scanner, args=(stop, scanner_loops))
+    clients = [
+        threading.Thread(target=client, args=(server.port, stop, counts, errors, use_etag))
+        for _ in range(CLIENTS)
+    ]
+    start = time.perf_counter()
+    scanner.start()
+    for thread in clients:
+        thread.start()
+    time.sleep(DURATION)
+    stop.set()
+    for thread in clients + [scanner]:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    return sum(counts) / elapsed, scanner_loops[0] / elapsed, len(errors)
+
+def main():
+    # Importa o app sem poluir a saída com os logs de inicialização dos módulos
+    with contextlib.redirect_stdout(io.StringIO()):
+        from main import app
+        from status_snapshot import status_snapshots
+    app.logger.disabled = True
+    import logging
+    logging.getLogger("werkzeug").disabled = True
+
+    print(f"📊 GET /status | {CLIENTS} clientes | {DURATION:.0f}s por cenário | TTL {status_snapshots.ttl}s")
+    scenarios = [
+        ("🐢 Sem cache", False, False),
+        ("🚀 Snapshot", True, False),
+        ("⚡ Snapshot + ETag", True, True),
+    ]
+    baseline = None
+    for label, enabled, use_etag in scenarios:
+        rps, loops, errors = run_scenario(app, status_snapshots, enabled, use_etag)
+        baseline = baseline or rps
+        print(f"   {label}: {rps:,.0f} req/s ({rps / baseline:.1f}x) | scanner {loops:,.0f} voltas/s | erros {errors}")
+    stats = status_snapshots.statistics()
+    print(f"\n   Snapshots: {stats['builds']} construções | {stats['hits']} hits | "
+          f"{stats['coalesced']} agrupadas | {stats['not_modified']} respostas 304")
+
+if __name__ == "__main__":
+    main()
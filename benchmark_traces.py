@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Custo do rastro da decisão (decision_trace)
+
+- custo por span: abrir/fechar SPANS spans aninhados com uma anotação;
+- custo por candidato: avaliação em etapas (hybrid_evaluator) de janelas de
+  historical_data_BTC_USDT_1h.csv com o rastro ligado e desligado, alternados,
+  com as predições do ML já calculadas (como vêm do analysis_pool), sem
+  sentimento e sem gravar sinais (coletor de dados da IA desligado);
+- exportação: tempo para gravar o buffer em JSONL.gz.
+"""
+
+import contextlib
+import io
+import logging
+import tempfile
+import time
+import pandas as pd
+from decision_trace import DecisionTracer
+from technical_indicators import calculate_indicators
+
+SPANS = 100_000
+CANDIDATES = 300
+WINDOW = 120
+REPEAT = 5
+
+def per_span_cost(tracer):
+    trace = tracer.start_trace("BTCUSDT")
+    start = time.perf_counter_ns()
+    for i in range(SPANS // 2):
+        with trace.span("ml"):
+            with trace.span("ia_model") as span:
+                span.attrs["probability"] = 0.5
+        trace.root.children.clear()  # mantém a árvore pequena; mede só a gravação
+    return (time.perf_counter_ns() - start) / SPANS / 1000
+
+def main():
+    with contextlib.redirect_stdout(io.StringIO()):
+        import signal_generator_hybrid as sgh
+    sgh.ai_data_collector.add_signal_data = lambda *args, **kwargs: None
+    logging.getLogger("scanner").setLevel(logging.WARNING)
+
+    raw = pd.read_csv("historical_data_BTC_USDT_1h.csv")
+    step = (len(raw) - WINDOW) // CANDIDATES
+    frames = {
+        f"SYM{i:04d}USDT": calculate_indicators(raw.iloc[i * step:i * step + WINDOW].reset_index(drop=True))
+        for i in range(CANDIDATES)
+    }
+    ml_predictions, ml_features = {}, {}
+    for symbol, df in frames.items():
+        probability, recommendation, details = sgh.ml_model.predict_signal_quality(df)
+        ml_predictions[symbol] = (probability, recommendation)
+        ml_features[symbol] = details.get("features")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tracer = DecisionTracer(enabled=True, directory=tmp_dir, buffer_size=CANDIDATES * REPEAT)
+        print(f"🧵 Span: {per_span_cost(tracer):.2f} µs (abrir + fechar + anotar)")
+
+        sgh.hybrid_evaluator.tracer = tracer
+        elapsed = {"desligado": [], "ligado": []}
+        for i in range(REPEAT + 1):
+            for label in elapsed:
+                tracer.enabled = label == "ligado"
+                sgh.hybrid_evaluator.begin_cycle()
+                start = time.perf_counter()
+                signals = sgh.generate_hybrid_signals(frames, None, ml_predictions, ml_features)
+                if i:  # a primeira rodada aquece caches
+                    elapsed[label].append(time.perf_counter() - start)
+        results = {label: min(values) / CANDIDATES * 1e6 for label, values in elapsed.items()}
+        for label, value in results.items():
+            print(f"   Avaliação com rastro {label}: {value:7.1f} µs/candidato | {len(signals)} sinais")
+        print(f"   Custo do rastro: {results['ligado'] - results['desligado']:.1f} µs/candidato")
+
+        summary = tracer.summary()
+        print("\n   Etapas (por candidato): " + " | ".join(f"{name} p95 {s['p95_us']} µs" for name, s in summary["stages"].items()))
+        print(f"   Desfechos: {summary['outcomes']}")
+        start = time.perf_counter()
+        exported = tracer.export()
+        print(f"   Exportação: {exported} rastros em {(time.perf_counter() - start) * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Profiler dos ciclos de scan, ligado sob demanda
+
+Desligado (padrão) não custa nada além de checar um contador: cycle() e span()
+devolvem um contexto vazio. Ligado por PROFILE_CYCLES=N (próximos N scans a
+partir do início) ou por POST /profile (main.py), cada ciclo capturado gera um
+diretório em PROFILE_DIR com:
+
+- cycle.pstats: cProfile da thread do ciclo (abrir com pstats ou snakeviz);
+- stacks.collapsed: pilhas amostradas (thread do ciclo + threads do pipeline)
+  no formato do flamegraph.pl / speedscope;
+- spans.json: duração de cada fase, por símbolo quando aplicável;
+- allocations.txt: maiores alocações do tracemalloc e pico de memória;
+- summary.json: resumo (fases, funções mais caras, memória) servido pela API.
+
+Só os últimos PROFILE_KEEP ciclos capturados são mantidos em disco.
+"""
+
+import cProfile
+import contextlib
+import itertools
+import json
+import os
+import pstats
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+from structured_log import get_logger
+
+PROFILE_CYCLES = int(os.getenv("PROFILE_CYCLES", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "10"))
+PROFILE_TRACEMALLOC = os.getenv("PROFILE_TRACEMALLOC", "true").lower() == "true"
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "25"))
+
+ARTIFACTS = ("summary.json", "cycle.pstats", "stacks.collapsed", "spans.json", "allocations.txt")
+
+log = get_logger(__name__)
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+class StackSampler:
+    """
+    Amostra as pilhas da thread do ciclo e das threads do pipeline
+
+    O cProfile só enxerga a thread onde foi ligado; as etapas do pipeline rodam
+    em threads do asyncio.to_thread (prefixo "asyncio"), cobertas pela amostragem.
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cycle-profiler-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, "")
+                if ident != self.thread_id and not name.startswith("asyncio"):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(name.replace(";", ","))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+class _Capture:
+    """Estado de um ciclo em captura"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.spans: List[Dict] = []
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident())
+        self.owns_tracemalloc = False
+
+class CycleProfiler:
+    """
+    Captura cProfile, spans por fase/símbolo e alocações dos próximos N ciclos
+    """
+
+    def __init__(self, cycles: int = PROFILE_CYCLES, directory: str = PROFILE_DIR, keep: int = PROFILE_KEEP):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._remaining = cycles
+        self._capture: Optional[_Capture] = None
+        self._sequence = itertools.count(1)
+
+    def request(self, cycles: int = 1) -> int:
+        """Liga a captura para os próximos `cycles` ciclos (0 cancela)"""
+        with self._lock:
+            self._remaining = max(0, cycles)
+            return self._remaining
+
+    @property
+    def active(self) -> bool:
+        return self._capture is not None
+
+    def cycle(self, name: str = "scan"):
+        """Contexto de um ciclo; captura só se houver ciclos pedidos"""
+        if not self._remaining:
+            return _NULL_CONTEXT
+        return self._capture_cycle(name)
+
+    def span(self, phase: str, symbol: Optional[str] = None):
+        """Mede uma fase do ciclo em captura (por símbolo quando informado)"""
+        if self._capture is None:
+            return _NULL_CONTEXT
+        return self._record_span(phase, symbol)
+
+    @contextlib.contextmanager
+    def _record_span(self, phase: str, symbol: Optional[str]):
+        capture = self._capture
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            if capture is not None:
+                # list.append é atômico: spans das threads do pipeline não precisam de lock
+                capture.spans.append({
+                    "phase": phase, "symbol": symbol, "thread": threading.current_thread().name,
+                    "start": round(start - capture.start, 6), "seconds": round(end - start, 6)
+                })
+
+    @contextlib.contextmanager
+    def _capture_cycle(self, name: str):
+        with self._lock:
+            if not self._remaining or self._capture is not None:
+                capture = None
+            else:
+                self._remaining -= 1
+                capture = self._capture = _Capture(name)
+        if capture is None:
+            yield
+            return
+
+        if PROFILE_TRACEMALLOC and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            capture.owns_tracemalloc = True
+        capture.sampler.start()
+        capture.profile.enable()
+        try:
+            yield
+        finally:
+            capture.profile.disable()
+            capture.sampler.stop()
+            wall_seconds = time.perf_counter() - capture.start
+            snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+            peak = tracemalloc.get_traced_memory()[1] if snapshot is not None else None
+            if capture.owns_tracemalloc:
+                tracemalloc.stop()
+            self._capture = None
+            try:
+                path = self._write(capture, wall_seconds, snapshot, peak)
+                log.info(f"🔬 Perfil do ciclo {name} salvo em {path} ({wall_seconds:.1f}s)")
+            except Exception as e:
+                log.error(f"🔬 Erro ao salvar perfil do ciclo {name}: {e}")
+
+    def _write(self, capture: _Capture, wall_seconds: float, snapshot, peak: Optional[int]) -> str:
+        capture_id = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(capture.started_at))}-{capture.name}-{next(self._sequence)}"
+        path = os.path.join(self.directory, capture_id)
+        os.makedirs(path, exist_ok=True)
+
+        capture.profile.dump_stats(os.path.join(path, "cycle.pstats"))
+        with open(os.path.join(path, "stacks.collapsed"), "w") as f:
+            f.write(capture.sampler.collapsed())
+        with open(os.path.join(path, "spans.json"), "w") as f:
+            json.dump(capture.spans, f)
+
+        allocations = []
+        if snapshot is not None:
+            snapshot = snapshot.filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ])
+            for stat in snapshot.statistics("lineno")[:PROFILE_TOP]:
+                frame = stat.traceback[0]
+                allocations.append({"location": f"{frame.filename}:{frame.lineno}",
+                                    "kb": round(stat.size / 1024, 1), "count": stat.count})
+            with open(os.path.join(path, "allocations.txt"), "w") as f:
+                f.write(f"Pico: {peak / 1e6:.1f} MB\n")
+                f.writelines(f"{a['kb']:10.1f} KB {a['count']:8d} blocos  {a['location']}\n" for a in allocations)
+
+        phases = defaultdict(lambda: {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+        for span in capture.spans:
+            phase = phases[span["phase"]]
+            phase["count"] += 1
+            phase["total_seconds"] += span["seconds"]
+            phase["max_seconds"] = max(phase["max_seconds"], span["seconds"])
+
+        summary = {
+            "id": capture_id,
+            "cycle": capture.name,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(capture.started_at)),
+            "wall_seconds": round(wall_seconds, 3),
+            "phases": {name: dict(p, total_seconds=round(p["total_seconds"], 4), max_seconds=round(p["max_seconds"], 4))
+                       for name, p in sorted(phases.items(), key=lambda item: -item[1]["total_seconds"])},
+            "slowest_spans": sorted(capture.spans, key=lambda s: -s["seconds"])[:10],
+            "top_functions": self._top_functions(capture.profile),
+            "samples": capture.sampler.samples,
+            "memory": {"peak_mb": round(peak / 1e6, 2), "top": allocations[:10]} if peak is not None else None,
+            "files": [name for name in ARTIFACTS if os.path.exists(os.path.join(path, name))],
+        }
+        with open(os.path.join(path, "summary.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+        self._prune()
+        return path
+
+    @staticmethod
+    def _top_functions(profile: cProfile.Profile) -> List[Dict]:
+        stats = pstats.Stats(profile).stats
+        ranked = sorted(stats.items(), key=lambda item: -item[1][3])[:PROFILE_TOP]
+        return [
+            {"function": f"{func} ({os.path.basename(filename)}:{line})", "calls": nc,
+             "own_seconds": round(tt, 4), "cumulative_seconds": round(ct, 4)}
+            for (filename, line, func), (cc, nc, tt, ct, callers) in ranked
+        ]
+
+    def _captures(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory)
+                      if os.path.isfile(os.path.join(self.directory, name, "summary.json")))
+
+    def _prune(self):
+        for name in self._captures()[:-self.keep] if self.keep > 0 else []:
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def summaries(self) -> List[Dict]:
+        """Resumos das capturas em disco, da mais recente para a mais antiga"""
+        summaries = []
+        for name in reversed(self._captures()):
+            try:
+                with open(os.path.join(self.directory, name, "summary.json")) as f:
+                    summaries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return summaries
+
+    def artifact_path(self, capture_id: str, filename: str) -> Optional[str]:
+        """Caminho de um artefato de captura (None se não existir ou se o nome for inválido)"""
+        if filename not in ARTIFACTS or capture_id not in self._captures():
+            return None
+        path = os.path.join(self.directory, capture_id, filename)
+        return path if os.path.isfile(path) else None
+
+    def statistics(self) -> Dict:
+        with self._lock:
+            return {"remaining_cycles": self._remaining, "capturing": self.active,
+                    "directory": os.path.abspath(self.directory)}
+
+
+# Instância global
+cycle_profiler = CycleProfiler()
@@ -0,0 +1,284 @@
+"""
+Rastro da decisão híbrida por símbolo e ciclo
+
+Cada candidato avaliado pelo StagedEvaluator ganha um DecisionTrace: uma árvore
+de spans (decisão → técnico → ML → sentimento → IA → lógica híbrida) com tempos
+e valores intermediários (indicadores, features, probabilidades, ramo escolhido).
+
+Os rastros concluídos ficam em um buffer limitado em memória (GET /traces) e
+uma thread exporta os novos a cada DECISION_TRACE_EXPORT_INTERVAL segundos em
+JSONL comprimido (um arquivo .jsonl.gz por dia em DECISION_TRACE_DIR).
+
+Gravar um span custa alguns microssegundos (perf_counter_ns e um objeto com
+__slots__); a serialização fica para a exportação e para a API. Com
+DECISION_TRACE=false o avaliador usa NULL_TRACE, que não grava nada.
+"""
+
+import gzip
+import itertools
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+from structured_log import get_logger
+
+DECISION_TRACE = os.getenv("DECISION_TRACE", "true").lower() == "true"
+DECISION_TRACE_BUFFER = int(os.getenv("DECISION_TRACE_BUFFER", "5000"))
+DECISION_TRACE_EXPORT_INTERVAL = float(os.getenv("DECISION_TRACE_EXPORT_INTERVAL", "300"))
+DECISION_TRACE_DIR = os.getenv("DECISION_TRACE_DIR", "decision_traces")
+
+log = get_logger(__name__)
+
+class Span:
+    """Trecho cronometrado de uma decisão; também é o contexto que o mede"""
+
+    __slots__ = ("name", "start_ns", "end_ns", "attrs", "children", "_trace")
+
+    def __init__(self, trace: "DecisionTrace", name: str, attrs: Dict):
+        self.name = name
+        self.attrs = attrs
+        self.children: List["Span"] = []
+        self.start_ns = 0
+        self.end_ns = 0
+        self._trace = trace
+
+    def __enter__(self) -> "Span":
+        trace = self._trace
+        trace._stack[-1].children.append(self)
+        trace._stack.append(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.perf_counter_ns()
+        if exc_type is not None:
+            self.attrs["error"] = str(exc)
+        self._trace._stack.pop()
+        return False
+
+    def to_dict(self, origin_ns: int) -> Dict:
+        entry = {
+            "name": self.name,
+            "start_us": (self.start_ns - origin_ns) // 1000,
+            "duration_us": (self.end_ns - self.start_ns) // 1000,
+        }
+        if self.attrs:
+            entry["attrs"] = self.attrs
+        if self.children:
+            entry["children"] = [child.to_dict(origin_ns) for child in self.children]
+        return entry
+
+class DecisionTrace:
+    """Árvore de spans da decisão de um símbolo em um ciclo"""
+
+    __slots__ = ("trace_id", "symbol", "cycle", "created_at", "outcome", "root", "_stack")
+
+    def __init__(self, trace_id: int, symbol: str, cycle: int):
+        self.trace_id = trace_id
+        self.symbol = symbol
+        self.cycle = cycle
+        self.created_at = time.time()
+        self.outcome: Optional[str] = None
+        self.root = Span(self, "decision", {})
+        self.root.start_ns = time.perf_counter_ns()
+        self._stack = [self.root]
+
+    def __bool__(self) -> bool:
+        return True
+
+    def span(self, name: str, **attrs) -> Span:
+        """Novo span filho do span aberto (use com `with`)"""
+        return Span(self, name, attrs)
+
+    def annotate(self, **attrs):
+        """Valores intermediários no span aberto"""
+        self._stack[-1].attrs.update(attrs)
+
+    def finish(self, outcome: str):
+        self.outcome = outcome
+        self.root.end_ns = time.perf_counter_ns()
+
+    @property
+    def duration_us(self) -> int:
+        return (self.root.end_ns - self.root.start_ns) // 1000
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "cycle": self.cycle,
+            "symbol": self.symbol,
+            "created_at": datetime.fromtimestamp(self.created_at).isoformat(timespec="milliseconds"),
+            "outcome": self.outcome,
+            "duration_us": self.duration_us,
+            "spans": self.root.to_dict(self.root.start_ns),
+        }
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+class _NullTrace:
+    """Rastro desligado: mesma interface, nada é gravado (bool False para pular anotações caras)"""
+
+    _span = _NullSpan()
+
+    def __bool__(self) -> bool:
+        return False
+
+    def span(self, name: str, **attrs):
+        return self._span
+
+    def annotate(self, **attrs):
+        pass
+
+    def finish(self, outcome: str):
+        pass
+
+NULL_TRACE = _NullTrace()
+
+class DecisionTracer:
+    """
+    Buffer limitado de rastros concluídos + exportação periódica em JSONL.gz
+    """
+
+    def __init__(self, enabled: bool = DECISION_TRACE, buffer_size: int = DECISION_TRACE_BUFFER,
+                 directory: str = DECISION_TRACE_DIR, export_interval: float = DECISION_TRACE_EXPORT_INTERVAL):
+        self.enabled = enabled
+        self.directory = directory
+        self.export_interval = export_interval
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._cycle = 0
+        self._traces: deque = deque(maxlen=buffer_size)
+        # Ainda não exportados; também limitado (exportação atrasada perde os mais antigos)
+        self._pending: deque = deque(maxlen=buffer_size)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"recorded": 0, "exported": 0, "export_errors": 0}
+
+    def begin_cycle(self) -> int:
+        with self._lock:
+            self._cycle += 1
+            return self._cycle
+
+    def start_trace(self, symbol: str):
+        """Rastro novo para o símbolo (NULL_TRACE se desligado)"""
+        if not self.enabled:
+            return NULL_TRACE
+        return DecisionTrace(next(self._ids), symbol, self._cycle)
+
+    def record(self, trace, outcome: str):
+        """Conclui o rastro e guarda no buffer"""
+        if not trace:
+            return
+        trace.finish(outcome)
+        with self._lock:
+            self._traces.append(trace)
+            self._pending.append(trace)
+            self.stats["recorded"] += 1
+
+    def query(self, symbol: Optional[str] = None, cycle: Optional[int] = None, outcome: Optional[str] = None,
+              slowest: bool = False, limit: int = 50) -> List[Dict]:
+        """Rastros do buffer (mais recentes primeiro, ou mais lentos com slowest=True)"""
+        with self._lock:
+            traces = list(self._traces)
+        symbol = symbol.upper() if symbol else None
+        selected = [
+            t for t in traces
+            if (symbol is None or t.symbol == symbol)
+            and (cycle is None or t.cycle == cycle)
+            and (outcome is None or (t.outcome or "").startswith(outcome))
+        ]
+        if slowest:
+            selected.sort(key=lambda t: t.duration_us, reverse=True)
+        else:
+            selected.reverse()
+        return [t.to_dict() for t in selected[:limit]]
+
+    def summary(self, cycle: Optional[int] = None, top: int = 10) -> Dict:
+        """
+        Tempos por etapa (média, p95, máximo), símbolos mais lentos e desfechos
+
+        Etapas em lote entram com o tempo do lote dividido pelo número de candidatos.
+        """
+        with self._lock:
+            traces = [t for t in self._traces if cycle is None or t.cycle == cycle]
+        stage_times = defaultdict(list)
+        symbol_times = defaultdict(list)
+        outcomes = defaultdict(int)
+        for trace in traces:
+            symbol_times[trace.symbol].append(trace.duration_us)
+            outcomes[trace.outcome] += 1
+            for span in trace.root.children:
+                stage_times[span.name].append((span.end_ns - span.start_ns) // 1000 // span.attrs.get("batch", 1))
+
+        def describe(values):
+            values = np.asarray(values)
+            return {"count": int(values.size), "avg_us": round(float(values.mean()), 1),
+                    "p95_us": int(np.percentile(values, 95)), "max_us": int(values.max())}
+
+        slowest = sorted(symbol_times.items(), key=lambda item: -np.mean(item[1]))[:top]
+        return {
+            "traces": len(traces),
+            "cycle": cycle if cycle is not None else self._cycle,
+            "stages": {name: describe(values) for name, values in stage_times.items()},
+            "slowest_symbols": [dict(describe(values), symbol=symbol) for symbol, values in slowest],
+            "outcomes": dict(outcomes),
+        }
+
+    def export(self) -> int:
+        """Grava os rastros pendentes no arquivo do dia (.jsonl.gz); retorna quantos"""
+        with self._lock:
+            pending = list(self._pending)
+            self._pending.clear()
+        if not pending:
+            return 0
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"decision_traces-{time.strftime('%Y%m%d')}.jsonl.gz")
+        try:
+            # Cada exportação vira um membro gzip novo no fim do arquivo (leitura com gzip.open normal)
+            with gzip.open(path, "at", encoding="utf-8") as f:
+                for trace in pending:
+                    f.write(json.dumps(trace.to_dict(), default=str) + "\n")
+        except OSError as e:
+            with self._lock:
+                self.stats["export_errors"] += 1
+            log.error(f"🧵 Erro ao exportar rastros de decisão: {e}")
+            return 0
+        with self._lock:
+            self.stats["exported"] += len(pending)
+        return len(pending)
+
+    def _run(self):
+        while not self._stop.wait(self.export_interval):
+            self.export()
+
+    def start(self):
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="decision-trace-export", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Para a exportação periódica e grava o que estiver pendente"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.export()
+
+    def statistics(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, enabled=self.enabled, buffered=len(self._traces),
+                        pending_export=len(self._pending), cycle=self._cycle)
+
+
+# Instância global
+decision_tracer = DecisionTracer()
@@ -0,0 +1,149 @@
+"""
+Barramento de eventos em processo para o stream /events (SSE)
+
+O scanner publica eventos (sinal aprovado, trade fechado, ciclo concluído) e
+cada cliente conectado em /events tem sua própria fila limitada. A publicação
+nunca bloqueia o scanner:
+
+- o evento é serializado uma vez e colocado na fila de cada assinante;
+- assinante com a fila cheia (cliente lento ou conexão travada) é desconectado
+  e o cliente reconecta com Last-Event-ID;
+- os últimos EVENTS_REPLAY eventos ficam guardados para essa retomada.
+"""
+
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+EVENTS_BUFFER = int(os.getenv("EVENTS_BUFFER", "256"))
+EVENTS_REPLAY = int(os.getenv("EVENTS_REPLAY", "500"))
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "1000"))
+# Comentário enviado a cada N segundos sem eventos (mantém proxies abertos e detecta quem saiu)
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+
+class Event:
+    """Evento numerado com o corpo JSON já pronto"""
+
+    __slots__ = ("id", "type", "data", "published_at")
+
+    def __init__(self, event_id: int, event_type: str, payload: Dict):
+        self.id = event_id
+        self.type = event_type
+        self.published_at = time.time()
+        self.data = json.dumps(dict(payload, published_at=self.published_at), default=str)
+
+    def sse(self) -> str:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {self.data}\n\n"
+
+class Subscriber:
+    """Fila limitada de um cliente; fechada pelo barramento se encher"""
+
+    def __init__(self, types: Optional[Iterable[str]] = None, buffer_size: int = EVENTS_BUFFER):
+        self.types = set(types) if types else None
+        self.queue: "queue.Queue[Optional[Event]]" = queue.Queue(maxsize=buffer_size)
+        self.closed = False
+        self.dropped = False
+
+    def wants(self, event: Event) -> bool:
+        return self.types is None or event.type in self.types
+
+    def get(self, timeout: float) -> Optional[Event]:
+        """Próximo evento; None no timeout ou se a assinatura foi encerrada"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class EventBus:
+    """
+    Publicação para N assinantes com filas limitadas e replay curto
+    """
+
+    def __init__(self, buffer_size: int = EVENTS_BUFFER, replay_size: int = EVENTS_REPLAY,
+                 max_subscribers: int = EVENTS_MAX_SUBSCRIBERS):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._subscribers: List[Subscriber] = []
+        self._replay: deque = deque(maxlen=replay_size)
+        self.stats = {"published": 0, "delivered": 0, "dropped_subscribers": 0, "rejected_subscribers": 0}
+
+    def publish(self, event_type: str, payload: Dict) -> Event:
+        """Entrega o evento a todos os assinantes sem bloquear"""
+        with self._lock:
+            event = Event(next(self._ids), event_type, payload)
+            self._replay.append(event)
+            subscribers = list(self._subscribers)
+            self.stats["published"] += 1
+
+        delivered, dropped = 0, []
+        for subscriber in subscribers:
+            if not subscriber.wants(event):
+                continue
+            try:
+                subscriber.queue.put_nowait(event)
+                delivered += 1
+            except queue.Full:
+                dropped.append(subscriber)
+        for subscriber in dropped:
+            self._drop(subscriber)
+        with self._lock:
+            self.stats["delivered"] += delivered
+        return event
+
+    def subscribe(self, types: Optional[Iterable[str]] = None,
+                  last_event_id: Optional[int] = None) -> Optional[Subscriber]:
+        """Nova assinatura (None se o limite de assinantes foi atingido)"""
+        subscriber = Subscriber(types, self.buffer_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self.stats["rejected_subscribers"] += 1
+                return None
+            # Retomada: eventos perdidos desde o último recebido entram primeiro
+            if last_event_id is not None:
+                missed = [e for e in self._replay if e.id > last_event_id and subscriber.wants(e)]
+                for event in missed[-self.buffer_size:]:
+                    subscriber.queue.put_nowait(event)
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+        subscriber.closed = True
+
+    def _drop(self, subscriber: Subscriber):
+        """Cliente lento: sai do barramento; o stream dele encerra na próxima leitura"""
+        with self._lock:
+            if subscriber not in self._subscribers:
+                return
+            self._subscribers.remove(subscriber)
+            self.stats["dropped_subscribers"] += 1
+        subscriber.closed = True
+        subscriber.dropped = True
+        # Acorda o stream mesmo com a fila cheia
+        while True:
+            try:
+                subscriber.queue.put_nowait(None)
+                break
+            except queue.Full:
+                try:
+                    subscriber.queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def statistics(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, subscribers=len(self._subscribers),
+                        last_event_id=self._replay[-1].id if self._replay else 0)
+
+
+# Instância global
+event_bus = EventBus()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita o endpoint /v2/everything da NewsAPI
+
+Usado em testes de vazão da etapa de sentimento, sem gastar a cota da NewsAPI:
+
+    python fake_news_server.py --port 8082 --latency 0.3
+    NEWS_API_URL=http://127.0.0.1:8082/v2/everything python scanner_hybrid.py
+
+Os artigos vêm de um conjunto fixo compartilhado entre as buscas, então o
+mesmo artigo aparece para vários símbolos (como notícias gerais de mercado).
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+HEADLINES = [
+    ("{q} rallies as institutional demand grows", "Analysts see strong momentum and record inflows."),
+    ("{q} slips after regulators warn on risk", "Traders worry about a weak market and falling volume."),
+    ("Crypto market steady ahead of Fed decision", "Bitcoin and altcoins trade in a narrow range."),
+    ("{q} network upgrade completed successfully", "Developers report faster and cheaper transactions."),
+    ("Exchange outage hits crypto traders", "Users could not withdraw funds for several hours, a terrible day."),
+    ("{q} price prediction: bulls eye new highs", "Positive sentiment builds on social media."),
+    ("Stablecoin supply hits new record", "Liquidity returns to the market as volumes climb."),
+    ("{q} faces selling pressure from miners", "Large holders moved coins to exchanges, a bad sign."),
+]
+SHARED_ARTICLES = 3  # artigos gerais (sem {q}) repetidos entre símbolos
+
+class FakeNewsState:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = 0
+
+def make_articles(query: str, page_size: int):
+    rng = random.Random(query)
+    picks = rng.sample(range(len(HEADLINES)), k=min(page_size, len(HEADLINES)))
+    articles = []
+    for i in picks:
+        title, description = HEADLINES[i]
+        shared = "{q}" not in title
+        articles.append({
+            "title": title.format(q=query),
+            "description": description,
+            "url": f"https://news.local/{i}" if shared else f"https://news.local/{query}/{i}"
+        })
+    return articles
+
+def make_handler(state: FakeNewsState):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            if state.latency:
+                time.sleep(state.latency)
+            with state.lock:
+                state.requests += 1
+            if not url.path.endswith("/everything") or "q" not in params:
+                self._reply(400, {"status": "error", "message": "Bad Request"})
+                return
+            articles = make_articles(params["q"][0], int(params.get("pageSize", ["5"])[0]))
+            self._reply(200, {"status": "ok", "totalResults": len(articles), "articles": articles})
+
+        def _reply(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def start_fake_server(port: int = 0, latency: float = 0.0):
+    """Sobe o servidor em uma thread; retorna (servidor, estado, url do endpoint)"""
+    state = FakeNewsState(latency)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}/v2/everything"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor fake da NewsAPI")
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latência simulada (s)")
+    args = parser.parse_args()
+
+    server, state, url = start_fake_server(args.port, args.latency)
+    print(f"📰 NewsAPI fake em {url}")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"   📨 requisições: {state.requests}")
+    except KeyboardInterrupt:
+        server.shutdown()
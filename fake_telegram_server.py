@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita o endpoint sendMessage da API do Telegram
+
+Usado em testes de vazão do dispatcher de notificações, sem tocar no Telegram:
+
+    python fake_telegram_server.py --port 8081 --latency 0.2
+    TELEGRAM_API_BASE=http://127.0.0.1:8081 python scanner_hybrid.py
+
+Simula latência de rede e o limite por chat (HTTP 429 com retry_after).
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeTelegramState:
+    """Contadores e janela deslizante de mensagens por chat"""
+
+    def __init__(self, latency: float = 0.0, per_chat_limit: int = 1, window: float = 1.0):
+        self.latency = latency
+        self.per_chat_limit = per_chat_limit
+        self.window = window
+        self.lock = threading.Lock()
+        self.recent = defaultdict(deque)
+        self.messages = defaultdict(list)
+        self.accepted = 0
+        self.throttled = 0
+
+    def register(self, chat_id: str, text: str):
+        """Retorna None se aceitou ou os segundos de retry_after se excedeu o limite"""
+        now = time.monotonic()
+        with self.lock:
+            recent = self.recent[chat_id]
+            while recent and now - recent[0] > self.window:
+                recent.popleft()
+            if self.per_chat_limit and len(recent) >= self.per_chat_limit:
+                self.throttled += 1
+                return max(1, int(self.window - (now - recent[0]) + 0.999))
+            recent.append(now)
+            self.messages[chat_id].append(text)
+            self.accepted += 1
+            return None
+
+def make_handler(state: FakeTelegramState):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if state.latency:
+                time.sleep(state.latency)
+
+            if not self.path.endswith("/sendMessage") or "chat_id" not in payload:
+                self._reply(400, {"ok": False, "error_code": 400, "description": "Bad Request"})
+                return
+
+            retry_after = state.register(str(payload["chat_id"]), payload.get("text", ""))
+            if retry_after is not None:
+                self._reply(429, {
+                    "ok": False, "error_code": 429,
+                    "description": f"Too Many Requests: retry after {retry_after}",
+                    "parameters": {"retry_after": retry_after}
+                })
+                return
+            self._reply(200, {"ok": True, "result": {"message_id": state.accepted}})
+
+        def _reply(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def start_fake_server(port: int = 0, latency: float = 0.0, per_chat_limit: int = 1,
+                      window: float = 1.0):
+    """Sobe o servidor em uma thread; retorna (servidor, estado, url base)"""
+    state = FakeTelegramState(latency, per_chat_limit, window)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor fake da API do Telegram")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latência simulada (s)")
+    parser.add_argument("--per-chat-limit", type=int, default=1, help="Mensagens por janela por chat (0 = sem limite)")
+    parser.add_argument("--window", type=float, default=1.0, help="Janela do limite (s)")
+    args = parser.parse_args()
+
+    server, state, url = start_fake_server(args.port, args.latency, args.per_chat_limit, args.window)
+    print(f"🤖 Telegram fake em {url}")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"   📨 aceitas: {state.accepted} | 🚦 429: {state.throttled}")
+    except KeyboardInterrupt:
+        server.shutdown()
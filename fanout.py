@@ -0,0 +1,273 @@
+"""
+Entrega de notificações para vários destinos (chats do Telegram e webhooks)
+
+Cada mensagem é renderizada uma única vez; o NotificationDispatcher agenda uma
+entrega por destino e o FanoutEngine faz o envio usando uma sessão HTTP com
+pool de conexões. Cada destino tem seu próprio rate limit e circuit breaker,
+então um destino lento ou fora do ar não afeta os demais.
+
+Destinos são lidos de NOTIFY_DESTINATIONS_FILE (ver destinations.example.json);
+sem o arquivo, o único destino é o canal padrão do Telegram (notifier.CHAT_ID).
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+import notifier
+from metrics import metrics
+
+DESTINATIONS_FILE = os.getenv("NOTIFY_DESTINATIONS_FILE", "destinations.json")
+
+API_CALLS = metrics.counter("scanner_api_calls_total", "Requisições a APIs externas por status HTTP", ["api", "status"])
+NOTIFY_SECONDS = metrics.histogram(
+    "scanner_notification_latency_seconds", "Tempo do envio à entrega por destino (inclui fila e retries)", ["destination"]
+)
+
+class TokenBucket:
+    """Limita a taxa de envio: `rate` tokens por segundo, até `capacity` acumulados"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def try_acquire(self, now: Optional[float] = None) -> float:
+        """Consome um token; retorna 0 se conseguiu ou quantos segundos esperar"""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class CircuitBreaker:
+    """Suspende um destino após falhas consecutivas, por `cooldown` segundos"""
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def wait_time(self, now: float) -> float:
+        return max(0.0, self.open_until - now)
+
+    def record_success(self):
+        self.consecutive_failures = 0
+
+    def record_failure(self, now: float):
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            self.open_until = now + self.cooldown
+
+    @property
+    def is_open(self) -> bool:
+        return self.open_until > time.monotonic()
+
+class LatencyTracker:
+    """Amostras recentes de latência (janela fixa) com percentis"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(seconds)
+
+    def percentiles(self) -> Dict[str, Dict]:
+        with self._lock:
+            samples = {name: np.array(values) for name, values in self._samples.items() if values}
+        result = {}
+        for name, values in samples.items():
+            p50, p90, p99 = (float(p) for p in np.percentile(values, [50, 90, 99]))
+            result[name] = {
+                "count": int(len(values)),
+                "p50_ms": round(p50 * 1000, 1),
+                "p90_ms": round(p90 * 1000, 1),
+                "p99_ms": round(p99 * 1000, 1)
+            }
+        return result
+
+class RenderedMessage:
+    """Mensagem renderizada uma vez e reaproveitada por todos os destinos"""
+
+    def __init__(self, text: str, context: Optional[Dict] = None):
+        self.text = text
+        self.payload = {"text": text, "signal": context}
+        self.body = json.dumps(self.payload, default=str).encode()
+
+class Destination:
+    """Destino base: nome + parâmetros de rate limit"""
+
+    kind = "base"
+
+    def __init__(self, name: str, rate_per_sec: float = 1.0, burst: float = 3):
+        self.name = name
+        self.rate_per_sec = rate_per_sec
+        self.burst = burst
+
+    def send(self, session: requests.Session, message: RenderedMessage, timeout: float) -> Tuple[bool, Optional[float], bool]:
+        raise NotImplementedError
+
+    @staticmethod
+    def classify(response: requests.Response, retry_after: Optional[float]) -> Tuple[bool, Optional[float], bool]:
+        """(enviado, retry_after, falha permanente) a partir do status HTTP"""
+        if 200 <= response.status_code < 300:
+            return True, None, False
+        if response.status_code == 429:
+            return False, retry_after if retry_after is not None else 1.0, False
+        return False, None, 400 <= response.status_code < 500
+
+class TelegramDestination(Destination):
+    kind = "telegram"
+
+    def __init__(self, name: str, chat_id: str, **kwargs):
+        super().__init__(name, **kwargs)
+        self.chat_id = chat_id
+
+    def send(self, session, message, timeout):
+        url = f"{notifier.TELEGRAM_API_BASE}/bot{notifier.BOT_TOKEN}/sendMessage"
+        response = session.post(url, json={"chat_id": self.chat_id, "text": message.text}, timeout=timeout)
+        retry_after = None
+        if response.status_code == 429:
+            try:
+                retry_after = float(response.json().get("parameters", {}).get("retry_after", 1))
+            except ValueError:
+                retry_after = 1.0
+        return self.classify(response, retry_after)
+
+class WebhookDestination(Destination):
+    kind = "webhook"
+
+    def __init__(self, name: str, url: str, headers: Optional[Dict] = None, **kwargs):
+        super().__init__(name, **kwargs)
+        self.url = url
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+
+    def send(self, session, message, timeout):
+        response = session.post(self.url, data=message.body, headers=self.headers, timeout=timeout)
+        retry_after = response.headers.get("Retry-After")
+        try:
+            retry_after = float(retry_after) if retry_after is not None else None
+        except ValueError:
+            retry_after = None
+        return self.classify(response, retry_after)
+
+def build_destination(config: Dict) -> Destination:
+    kind = config.get("type", "telegram")
+    options = {k: config[k] for k in ("rate_per_sec", "burst") if k in config}
+    if kind == "telegram":
+        return TelegramDestination(config["name"], config["chat_id"], **options)
+    if kind == "webhook":
+        return WebhookDestination(config["name"], config["url"], config.get("headers"), **options)
+    raise ValueError(f"Tipo de destino desconhecido: {kind}")
+
+def load_destinations(path: str = DESTINATIONS_FILE) -> List[Destination]:
+    """Lê os destinos do arquivo JSON; sem arquivo, usa TELEGRAM_CHAT_ID (ou o canal padrão do notifier)"""
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                return [build_destination(item) for item in json.load(f)]
+        except Exception as e:
+            print(f"[FANOUT] ❌ Erro ao ler destinos de {path}: {e}")
+    return [TelegramDestination(
+        "telegram_default", os.getenv("TELEGRAM_CHAT_ID", notifier.CHAT_ID),
+        rate_per_sec=float(os.getenv("TELEGRAM_RATE_PER_CHAT", "0.33")),
+        burst=float(os.getenv("TELEGRAM_BURST_PER_CHAT", "3"))
+    )]
+
+class FanoutEngine:
+    """
+    Envio por destino com pool de conexões, rate limit, circuit breaker e latência
+    """
+
+    def __init__(self, destinations: Optional[List[Destination]] = None, pool_size: int = 32,
+                 timeout: float = 10.0, failure_threshold: int = 5, cooldown: float = 60.0):
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.destinations: Dict[str, Destination] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self.request_latency = LatencyTracker()
+        self.delivery_latency = LatencyTracker()
+        for destination in destinations if destinations is not None else load_destinations():
+            self.add_destination(destination)
+
+    def add_destination(self, destination: Destination):
+        with self._lock:
+            self.destinations[destination.name] = destination
+            self._buckets[destination.name] = TokenBucket(destination.rate_per_sec, destination.burst)
+            self._breakers[destination.name] = CircuitBreaker(self.failure_threshold, self.cooldown)
+
+    def destination_names(self) -> List[str]:
+        return list(self.destinations.keys())
+
+    def acquire(self, name: str, now: Optional[float] = None) -> float:
+        """0 se o destino pode receber agora; senão, segundos até poder"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            wait = self._breakers[name].wait_time(now)
+            if wait > 0:
+                return wait
+            return self._buckets[name].try_acquire(now)
+
+    def send(self, name: str, message: RenderedMessage, submitted_at: Optional[float] = None) -> Tuple[bool, Optional[float], bool]:
+        """Envia para um destino e atualiza circuit breaker e latências"""
+        destination = self.destinations.get(name)
+        if destination is None:
+            return False, None, True
+
+        start = time.monotonic()
+        try:
+            sent, retry_after, permanent = destination.send(self.session, message, self.timeout)
+        except requests.RequestException as e:
+            print(f"[FANOUT] ❌ Erro de rede para {name}: {e}")
+            sent, retry_after, permanent = False, None, False
+        elapsed = time.monotonic() - start
+        API_CALLS.inc(api=f"notify:{name}", status="sent" if sent else "retry" if retry_after is not None else "error")
+        self.request_latency.record(name, elapsed)
+
+        with self._lock:
+            if sent:
+                self._breakers[name].record_success()
+            elif retry_after is None:
+                self._breakers[name].record_failure(time.monotonic())
+        if sent and submitted_at is not None:
+            self.delivery_latency.record(name, time.time() - submitted_at)
+            NOTIFY_SECONDS.observe(time.time() - submitted_at, destination=name)
+        return sent, retry_after, permanent
+
+    def stats(self) -> Dict:
+        return {
+            "destinations": {
+                name: {
+                    "type": d.kind,
+                    "circuit_open": self._breakers[name].is_open,
+                    "consecutive_failures": self._breakers[name].consecutive_failures
+                }
+                for name, d in self.destinations.items()
+            },
+            "request_latency": self.request_latency.percentiles(),
+            "delivery_latency": self.delivery_latency.percentiles()
+        }
+
+
+# Instância global
+fanout_engine = FanoutEngine()
@@ -0,0 +1,361 @@
+"""
+Arquivo histórico colunar dos sinais concluídos
+
+Registros concluídos saem do armazenamento quente (storage.py) e vão para
+arquivos .npz particionados por mês de criação do sinal:
+
+    history_archive/outcomes/2026-01.npz   (entradas do AIResultMonitor)
+    history_archive/signals/2026-01.npz    (registros de treino do AIDataCollector)
+
+Cada coluna é um array separado dentro do .npz e só é lida quando acessada.
+O manifest.json guarda as contagens por partição, para que os contadores dos
+módulos de IA incluam o histórico sem abrir nenhuma partição na inicialização,
+e uma versão por partição (incrementada a cada regravação), que invalida o
+cache do DataFrame de treino.
+
+Só registros concluídos há mais de ARCHIVE_RETENTION_DAYS dias são arquivados,
+no máximo uma vez a cada ARCHIVE_INTERVAL segundos: os recentes continuam no
+buffer de treino quente.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional
+import numpy as np
+import pandas as pd
+from storage import OUTCOME_COLUMNS, SIGNAL_COLUMNS
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos (uma réplica só)
+    fcntl = None
+
+ARCHIVE_DIR = "history_archive"
+ARCHIVE_RETENTION_DAYS = float(os.getenv("ARCHIVE_RETENTION_DAYS", "30"))
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", "3600"))
+
+DATASET_COLUMNS = {
+    "outcomes": OUTCOME_COLUMNS,
+    "signals": SIGNAL_COLUMNS
+}
+
+TEXT_COLUMNS = {
+    "signal_id", "symbol", "created_at", "status", "result",
+    "completion_date", "result_updated_at", "strategy"
+}
+
+class HistoryArchive:
+    """
+    Leitura e escrita das partições mensais do histórico
+    """
+
+    def __init__(self, base_dir: str = ARCHIVE_DIR):
+        self.base_dir = base_dir
+        self.manifest_path = os.path.join(base_dir, "manifest.json")
+        self._lock = threading.Lock()
+        self.manifest = self._load_manifest()
+        # {mês: (entrada do manifest, DataFrame)} e o DataFrame concatenado
+        self._training_parts: Dict[str, tuple] = {}
+        self._training_frame = None
+        self.last_archived_at = 0.0
+
+    def _load_manifest(self) -> Dict:
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"[ARCHIVE] ⚠️ Manifest ilegível, será reconstruído: {e}")
+        return {dataset: {} for dataset in DATASET_COLUMNS}
+
+    def _save_manifest(self):
+        os.makedirs(self.base_dir, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, separators=(',', ':'))
+        os.replace(tmp_path, self.manifest_path)
+
+    @contextmanager
+    def _exclusive(self):
+        """Lock entre threads e entre processos (réplicas do scanner no mesmo diretório)"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self.base_dir, exist_ok=True)
+            with open(os.path.join(self.base_dir, ".lock"), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _manifest_entry(self, dataset: str, month: str, arrays: Dict[str, np.ndarray]) -> Dict:
+        """Contagens da partição regravada, com a versão seguinte"""
+        previous = self.manifest.get(dataset, {}).get(month, {})
+        return {
+            "rows": int(len(arrays["signal_id"])),
+            "successful": int((arrays["result"] == "success").sum()),
+            "version": previous.get("version", 0) + 1
+        }
+
+    def _partition_path(self, dataset: str, month: str) -> str:
+        return os.path.join(self.base_dir, dataset, f"{month}.npz")
+
+    @classmethod
+    def _read_columns(cls, npz, columns: List[str]) -> Dict[str, np.ndarray]:
+        """Colunas de uma partição; as que não existiam quando ela foi gravada vêm vazias"""
+        rows = len(npz["signal_id"])
+        return {col: npz[col] if col in npz.files else cls._to_column(col, [None] * rows) for col in columns}
+
+    @staticmethod
+    def _to_column(name: str, values: List):
+        if name in TEXT_COLUMNS:
+            return np.array(["" if v is None else str(v) for v in values])
+        return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+
+    def counts(self, dataset: str, symbols: Optional[Iterable[str]] = None) -> Dict:
+        """
+        Totais arquivados de um dataset (linhas e sucessos)
+
+        Com `symbols` (shard da réplica) lê só as colunas symbol e result das
+        partições; sem, vem direto do manifest.
+        """
+        if symbols is not None:
+            symbols = list(symbols)
+            rows = successful = 0
+            if symbols:
+                for df in self.iter_partitions(dataset, ["symbol", "result"]):
+                    owned = df["result"][df["symbol"].isin(symbols)]
+                    rows += len(owned)
+                    successful += int((owned == "success").sum())
+            return {"rows": rows, "successful": successful}
+        partitions = self.manifest.get(dataset, {})
+        return {
+            "rows": sum(p["rows"] for p in partitions.values()),
+            "successful": sum(p["successful"] for p in partitions.values())
+        }
+
+    def months(self, dataset: str, since: Optional[str] = None, until: Optional[str] = None) -> List[str]:
+        """Partições (YYYY-MM) de um dataset, podadas pelo intervalo de datas"""
+        months = sorted(self.manifest.get(dataset, {}).keys())
+        if since:
+            months = [m for m in months if m >= since[:7]]
+        if until:
+            months = [m for m in months if m <= until[:7]]
+        return months
+
+    def append(self, dataset: str, records: List[Dict]) -> int:
+        """
+        Grava registros nas partições mensais (por created_at)
+
+        Registros já arquivados (mesmo signal_id) são ignorados, então repetir
+        a operação após uma falha (ou duas réplicas arquivando o mesmo
+        registro) não duplica linhas.
+        """
+        columns = DATASET_COLUMNS[dataset]
+        by_month: Dict[str, List[Dict]] = {}
+        for record in records:
+            by_month.setdefault((record.get('created_at') or "0000-00")[:7], []).append(record)
+
+        written = 0
+        with self._exclusive():
+            # Outra réplica pode ter gravado partições desde a última leitura
+            self.manifest = self._load_manifest()
+            os.makedirs(os.path.join(self.base_dir, dataset), exist_ok=True)
+            for month, month_records in by_month.items():
+                path = self._partition_path(dataset, month)
+                existing = None
+                if os.path.exists(path):
+                    with np.load(path) as npz:
+                        existing = self._read_columns(npz, columns)
+                    known_ids = set(existing["signal_id"].tolist())
+                    month_records = [r for r in month_records if r['signal_id'] not in known_ids]
+                if not month_records:
+                    continue
+
+                arrays = {col: self._to_column(col, [r.get(col) for r in month_records]) for col in columns}
+                if existing is not None:
+                    arrays = {col: np.concatenate([existing[col], arrays[col]]) for col in columns}
+
+                tmp_path = f"{path}.tmp.npz"
+                np.savez_compressed(tmp_path, **arrays)
+                os.replace(tmp_path, path)
+
+                self.manifest.setdefault(dataset, {})[month] = self._manifest_entry(dataset, month, arrays)
+                written += len(month_records)
+
+            if written:
+                self._save_manifest()
+        return written
+
+    def relabel(self, dataset: str, updates: Dict[str, Dict]) -> int:
+        """
+        Reescreve colunas de registros já arquivados ({signal_id: {coluna: valor}})
+
+        Usado pelo replay de resultados (outcome_engine); só as partições com
+        algum registro alterado são regravadas.
+        """
+        if not updates:
+            return 0
+        columns = DATASET_COLUMNS[dataset]
+        changed = 0
+        with self._exclusive():
+            self.manifest = self._load_manifest()
+            for month in sorted(self.manifest.get(dataset, {})):
+                path = self._partition_path(dataset, month)
+                if not os.path.exists(path):
+                    continue
+                with np.load(path) as npz:
+                    arrays = self._read_columns(npz, columns)
+                positions = [i for i, signal_id in enumerate(arrays["signal_id"].tolist()) if signal_id in updates]
+                if not positions:
+                    continue
+
+                for col in {col for update in updates.values() for col in update if col in arrays}:
+                    values = arrays[col].tolist()
+                    for i in positions:
+                        update = updates[arrays["signal_id"][i]]
+                        if col in update:
+                            values[i] = update[col]
+                    arrays[col] = self._to_column(col, values)
+
+                tmp_path = f"{path}.tmp.npz"
+                np.savez_compressed(tmp_path, **arrays)
+                os.replace(tmp_path, path)
+                self.manifest[dataset][month] = self._manifest_entry(dataset, month, arrays)
+                changed += len(positions)
+            if changed:
+                self._save_manifest()
+        return changed
+
+    def iter_partitions(self, dataset: str, columns: Optional[List[str]] = None,
+                        since: Optional[str] = None, until: Optional[str] = None) -> Iterator[pd.DataFrame]:
+        """Lê as partições uma a uma, carregando apenas as colunas pedidas"""
+        columns = columns or DATASET_COLUMNS[dataset]
+        needed = list(dict.fromkeys(columns + (["created_at"] if since or until else [])))
+        for month in self.months(dataset, since, until):
+            path = self._partition_path(dataset, month)
+            if not os.path.exists(path):
+                continue
+            with np.load(path) as npz:
+                df = pd.DataFrame(self._read_columns(npz, needed))
+            if since:
+                df = df[df["created_at"] >= since]
+            if until:
+                df = df[df["created_at"] <= until]
+            yield df[columns]
+
+    def read(self, dataset: str, columns: Optional[List[str]] = None,
+             since: Optional[str] = None, until: Optional[str] = None) -> pd.DataFrame:
+        """Concatena as partições do intervalo em um único DataFrame"""
+        frames = list(self.iter_partitions(dataset, columns, since, until))
+        if not frames:
+            return pd.DataFrame(columns=columns or DATASET_COLUMNS[dataset])
+        return pd.concat(frames, ignore_index=True)
+
+    def training_frame(self, feature_columns: List[str]) -> pd.DataFrame:
+        """
+        Features e target (1.0 sucesso, 0.0 falha) dos sinais arquivados
+
+        Em cache pela versão das partições no manifest (relido do disco, para
+        ver gravações de outras réplicas): só as partições novas ou regravadas
+        são lidas de novo. O DataFrame é compartilhado e não deve ser modificado.
+        """
+        partitions = self._load_manifest().get("signals", {})
+        columns = list(feature_columns)
+        key = (tuple(columns), tuple(sorted((m, tuple(sorted(e.items()))) for m, e in partitions.items())))
+        cached = self._training_frame
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        frames = []
+        parts = {}
+        for month in sorted(partitions):
+            entry = (tuple(columns), tuple(sorted(partitions[month].items())))
+            part = self._training_parts.get(month)
+            if part is None or part[0] != entry:
+                path = self._partition_path("signals", month)
+                if not os.path.exists(path):
+                    continue
+                with np.load(path) as npz:
+                    df = pd.DataFrame(self._read_columns(npz, columns + ["result"]))
+                df["target"] = (df.pop("result") == "success").astype(np.float64)
+                part = (entry, df.astype(np.float64))
+            parts[month] = part
+            frames.append(part[1])
+
+        if frames:
+            df = pd.concat(frames, ignore_index=True)
+        else:
+            df = pd.DataFrame(columns=columns + ["target"], dtype=np.float64)
+        self._training_parts = parts
+        self._training_frame = (key, df)
+        return df
+
+
+def _completed_before(record: Dict, key: str, cutoff: datetime) -> bool:
+    """Se o registro foi concluído antes do corte (sem data de conclusão vale created_at)"""
+    value = record.get(key) or record.get('created_at')
+    try:
+        completed = datetime.fromisoformat(str(value))
+    except ValueError:
+        return True
+    if completed.tzinfo is not None:
+        completed = completed.astimezone().replace(tzinfo=None)
+    return completed < cutoff
+
+
+def archive_completed(monitor, collector, archive: Optional[HistoryArchive] = None,
+                      retention_days: float = ARCHIVE_RETENTION_DAYS, force: bool = False) -> Dict:
+    """
+    Move os registros concluídos há mais de `retention_days` dias para o arquivo
+
+    Roda no máximo uma vez a cada ARCHIVE_INTERVAL segundos (force ignora o
+    intervalo); os concluídos recentes ficam no armazenamento quente e no
+    buffer de treino.
+
+    Args:
+        monitor: instância de AIResultMonitor
+        collector: instância de AIDataCollector
+    """
+    archive = archive or history_archive
+    moved = {"outcomes": 0, "signals": 0}
+    if not force and time.time() - archive.last_archived_at < ARCHIVE_INTERVAL:
+        return moved
+    archive.last_archived_at = time.time()
+
+    cutoff = datetime.now() - timedelta(days=retention_days)
+    outcomes = [e for e in monitor.completed_entries() if _completed_before(e, 'completion_date', cutoff)]
+    signals = [item for item in collector.snapshot(labeled_only=True)
+               if _completed_before(item, 'result_updated_at', cutoff)]
+
+    if outcomes:
+        archive.append("outcomes", outcomes)
+        monitor.evict_archived([e['signal_id'] for e in outcomes])
+        moved["outcomes"] = len(outcomes)
+    if signals:
+        archive.append("signals", signals)
+        collector.evict_archived([r['signal_id'] for r in signals])
+        moved["signals"] = len(signals)
+
+    if outcomes or signals:
+        print(f"[ARCHIVE] 📦 Registros arquivados: {moved}")
+    return moved
+
+
+# Instância global
+history_archive = HistoryArchive()
+
+
+if __name__ == "__main__":
+    from ai_result_monitor import ai_result_monitor
+    from ai_data_collector import ai_data_collector
+    from storage import storage
+
+    with storage.batch():
+        archive_completed(ai_result_monitor, ai_data_collector, force=True)
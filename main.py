@@ -7,20 +7,31 @@ Ponto de entrada principal para deploy no Railway
 import os
 import threading
 import time
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, send_file
 from flask_cors import CORS
 from dotenv import load_dotenv
 import logging
 
+# Carregar variáveis de ambiente antes dos módulos do sistema: vários leem a
+# configuração (STORAGE_BACKEND, SHARDING, SCAN_*, LOG_LEVEL...) na importação
+load_dotenv()
+
 # Importar módulos do sistema
-from scanner_hybrid import main as scanner_main
-from state_manager import load_open_trades
+from scanner_hybrid import main as scanner_main, scan_scheduler, scan_pipeline, trade_monitor, SHARDING
+from shard_coordinator import shard_coordinator
+from storage import storage
+from status_snapshot import status_snapshots
+from signal_history import signal_history, SIGNALS_PAGE_SIZE
+from event_bus import event_bus, EVENTS_HEARTBEAT
+from metrics import metrics, METRICS_ENABLED
+from structured_log import log_buffer
+from cycle_profiler import cycle_profiler
+from decision_trace import decision_tracer
+from state_manager import open_trades_state
+from notification_dispatcher import notification_dispatcher
 from ml_model_loader import ml_model
 from ai_predictor import ai_predictor
 
-# Carregar variáveis de ambiente
-load_dotenv()
-
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -29,9 +40,14 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
+# Com sharding o banco compartilhado tem os sinais quentes de todas as réplicas
+if SHARDING:
+    signal_history.hot_source = storage.load_monitoring
+
 # Estado global do sistema
 system_status = {
     "running": False,
+    "stopping": False,
     "last_scan": None,
     "total_signals": 0,
     "open_trades": 0,
@@ -54,22 +70,83 @@ def update_system_status():
         else:
             system_status["ai_status"] = "training"
         
-        # Verificar trades abertos
-        open_trades = load_open_trades()
-        system_status["open_trades"] = len(open_trades)
+        # Verificar trades abertos (estado em memória, sem leitura de disco)
+        system_status["open_trades"] = len(open_trades_state)
+        
+        # Sharding: cada réplica só conhece o próprio shard; soma o publicado por todas
+        if SHARDING:
+            cluster = shard_coordinator.cluster_status()
+            system_status["shards"] = cluster
+            system_status["open_trades"] = cluster["totals"].get("open_trades", 0)
+        
+        # Agenda: atraso de disparo e duração dos ciclos
+        system_status["schedule"] = scan_scheduler.statistics()
+        
+        # Pipeline (SCAN_MODE=pipeline): métricas por etapa do último ciclo
+        system_status["pipeline"] = scan_pipeline.last_run
+        
+        # Monitor rápido de alvo/stop
+        system_status["trade_monitor"] = trade_monitor.statistics()
+        
+        # Stream /events: assinantes conectados e desconectados por lentidão
+        system_status["events"] = event_bus.statistics()
         
     except Exception as e:
         logger.error(f"Erro ao atualizar status: {e}")
 
+def build_status():
+    """Snapshot de /status (publicado pelo scanner no fim de cada fase)"""
+    update_system_status()
+    return dict(system_status)
+
+def build_trades():
+    """Snapshot de /trades"""
+    # Com sharding o banco compartilhado tem os trades de todas as réplicas
+    trades = storage.load_open_trades() if SHARDING else open_trades_state.snapshot()
+    return {"trades": trades, "count": len(trades)}
+
+def build_config():
+    """Snapshot de /config"""
+    return {
+        "news_api_configured": bool(os.getenv("NEWS_API_KEY")),
+        "telegram_configured": bool(os.getenv("TELEGRAM_BOT_TOKEN")),
+        "ml_model_available": ml_model.model is not None,
+        "ai_model_available": hasattr(ai_predictor, 'model') and ai_predictor.model is not None
+    }
+
+status_snapshots.register("status", build_status)
+status_snapshots.register("trades", build_trades)
+status_snapshots.register("config", build_config, ttl=60)
+
+def snapshot_response(key):
+    """Resposta do snapshot em memória, com ETag (304 para If-None-Match igual)"""
+    snapshot = status_snapshots.get(key)
+    if snapshot.etag in request.if_none_match:
+        status_snapshots.record_not_modified()
+        response = Response(status=304)
+    else:
+        response = Response(snapshot.body, mimetype="application/json")
+    response.set_etag(snapshot.etag)
+    response.headers["Cache-Control"] = f"max-age={int(status_snapshots.ttl_of(key))}"
+    return response
+
+# Thread do scanner (uma por vez: /start espera a anterior terminar)
+scanner_thread = None
+scanner_lock = threading.Lock()
+
 def run_scanner():
     """Executa o scanner em thread separada"""
     try:
         system_status["running"] = True
+        status_snapshots.publish(["status"])
         logger.info("🚀 Iniciando scanner híbrido...")
         scanner_main()
     except Exception as e:
         logger.error(f"Erro no scanner: {e}")
+    finally:
         system_status["running"] = False
+        system_status["stopping"] = False
+        status_snapshots.publish(["status"])
 
 # Rotas da API
 @app.route('/')
@@ -83,9 +160,8 @@ def home():
 
 @app.route('/status')
 def status():
-    """Retorna status detalhado do sistema"""
-    update_system_status()
-    return jsonify(system_status)
+    """Retorna status detalhado do sistema (snapshot em memória)"""
+    return snapshot_response("status")
 
 @app.route('/health')
 def health():
@@ -94,47 +170,166 @@ def health():
 
 @app.route('/start', methods=['POST'])
 def start_scanner():
-    """Inicia o scanner"""
-    if not system_status["running"]:
+    """Inicia o scanner (só depois que o loop anterior terminou de parar)"""
+    global scanner_thread
+    with scanner_lock:
+        if scan_scheduler.is_stopping():
+            return jsonify({"message": "Scanner ainda parando; tente de novo em instantes", "status": "stopping"}), 409
+        if (scanner_thread is not None and scanner_thread.is_alive()) or scan_scheduler.is_running():
+            return jsonify({"message": "Scanner já está rodando", "status": "running"})
         scanner_thread = threading.Thread(target=run_scanner, daemon=True)
         scanner_thread.start()
         return jsonify({"message": "Scanner iniciado", "status": "starting"})
-    else:
-        return jsonify({"message": "Scanner já está rodando", "status": "running"})
 
 @app.route('/stop', methods=['POST'])
 def stop_scanner():
-    """Para o scanner"""
-    system_status["running"] = False
-    return jsonify({"message": "Scanner parado", "status": "stopped"})
+    """Para o scanner; "stopping" enquanto o ciclo em andamento termina"""
+    scan_scheduler.stop()
+    if scan_scheduler.join(timeout=1.0) and (scanner_thread is None or not scanner_thread.is_alive()):
+        return jsonify({"message": "Scanner parado", "status": "stopped"})
+    system_status["stopping"] = True
+    status_snapshots.publish(["status"])
+    return jsonify({"message": "Parada solicitada; o ciclo em andamento termina antes", "status": "stopping"})
 
 @app.route('/trades')
 def get_trades():
-    """Retorna trades abertos"""
+    """Retorna trades abertos (snapshot em memória)"""
     try:
-        trades = load_open_trades()
-        return jsonify({"trades": trades, "count": len(trades)})
+        return snapshot_response("trades")
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/notifications')
+def get_notifications():
+    """Estatísticas de entrega: pendências, falhas e latências por destino"""
+    return jsonify(notification_dispatcher.statistics())
+
+@app.route('/shards')
+def get_shards():
+    """Réplicas do scanner, partições de cada uma e totais agregados"""
+    if not SHARDING:
+        return jsonify({"enabled": False})
+    return jsonify(dict(shard_coordinator.cluster_status(), enabled=True))
+
+@app.route('/signals')
+def get_signals():
+    """Histórico de sinais paginado por cursor (filtros: symbol, since, until, result, strategy)"""
+    args = request.args
+    try:
+        page = signal_history.query(
+            symbol=args.get("symbol"), since=args.get("since"), until=args.get("until"),
+            result=args.get("result"), strategy=args.get("strategy"), cursor=args.get("cursor"),
+            limit=args.get("limit", SIGNALS_PAGE_SIZE, type=int)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(page)
+
+@app.route('/signals/stats')
+def get_signal_stats():
+    """Totais e taxa de acerto por símbolo e por estratégia"""
+    args = request.args
+    return jsonify(signal_history.statistics(
+        symbol=args.get("symbol"), since=args.get("since"),
+        until=args.get("until"), strategy=args.get("strategy")
+    ))
+
+@app.route('/signals/<signal_id>')
+def get_signal(signal_id):
+    """Sinal pelo ID, com resultado e features de treino"""
+    record = signal_history.get(signal_id)
+    if record is None:
+        return jsonify({"error": "Sinal não encontrado"}), 404
+    return jsonify(record)
+
+@app.route('/traces')
+def get_traces():
+    """Rastros da decisão por símbolo (filtros: symbol, cycle, outcome; sort=slowest)"""
+    args = request.args
+    traces = decision_tracer.query(
+        symbol=args.get("symbol"), cycle=args.get("cycle", type=int), outcome=args.get("outcome"),
+        slowest=args.get("sort") == "slowest", limit=max(1, min(args.get("limit", 50, type=int), 500))
+    )
+    return jsonify({"traces": traces, "tracer": decision_tracer.statistics()})
+
+@app.route('/traces/summary')
+def get_traces_summary():
+    """Tempo por etapa, símbolos mais lentos e desfechos (?cycle=N para um ciclo)"""
+    return jsonify(decision_tracer.summary(cycle=request.args.get("cycle", type=int)))
+
+@app.route('/events')
+def events():
+    """Stream SSE de sinais, trades fechados e ciclos concluídos (?types=signal,trade_closed)"""
+    types = [t for t in request.args.get("types", "").split(",") if t] or None
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    subscriber = event_bus.subscribe(types, last_event_id)
+    if subscriber is None:
+        return jsonify({"error": "Limite de assinantes atingido"}), 503
+
+    def stream():
+        try:
+            yield "retry: 2000\n\n"
+            while not subscriber.closed:
+                event = subscriber.get(timeout=EVENTS_HEARTBEAT)
+                if event is not None:
+                    yield event.sse()
+                elif not subscriber.closed:
+                    yield ": ping\n\n"
+        finally:
+            event_bus.unsubscribe(subscriber)
+
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/metrics')
+def get_metrics():
+    """Métricas no formato texto do Prometheus"""
+    if not METRICS_ENABLED:
+        return jsonify({"error": "Métricas desativadas (METRICS_ENABLED=false)"}), 404
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/profile', methods=['GET', 'POST'])
+def profile_cycles():
+    """POST {"cycles": N} liga o profiler nos próximos N scans; GET lista as capturas"""
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        try:
+            cycles = int(body.get("cycles", request.args.get("cycles", 1)))
+        except (TypeError, ValueError):
+            return jsonify({"error": "cycles deve ser um inteiro"}), 400
+        cycle_profiler.request(cycles)
+    return jsonify(dict(cycle_profiler.statistics(), captures=cycle_profiler.summaries()))
+
+@app.route('/profile/<capture_id>/<filename>')
+def get_profile_artifact(capture_id, filename):
+    """Download de um artefato (cycle.pstats, stacks.collapsed, spans.json, ...)"""
+    path = cycle_profiler.artifact_path(capture_id, filename)
+    if path is None:
+        return jsonify({"error": "Artefato não encontrado"}), 404
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=f"{capture_id}-{filename}")
+
 @app.route('/config')
 def get_config():
     """Retorna configuração atual"""
-    config = {
-        "news_api_configured": bool(os.getenv("NEWS_API_KEY")),
-        "telegram_configured": bool(os.getenv("TELEGRAM_BOT_TOKEN")),
-        "ml_model_available": ml_model.model is not None,
-        "ai_model_available": hasattr(ai_predictor, 'model') and ai_predictor.model is not None
-    }
-    return jsonify(config)
+    return snapshot_response("config")
 
 @app.route('/logs')
 def get_logs():
-    """Retorna logs recentes (implementação básica)"""
-    return jsonify({
-        "message": "Logs disponíveis via Railway dashboard",
-        "status": system_status
-    })
+    """Últimos registros do scanner (filtros: level, symbol, since, limit)"""
+    args = request.args
+    limit = max(1, min(args.get("limit", 200, type=int), log_buffer.capacity))
+    try:
+        logs = log_buffer.query(
+            level=args.get("level"), symbol=args.get("symbol"),
+            since_id=args.get("since", type=int), limit=limit
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"logs": logs, "buffer": log_buffer.statistics()})
 
 if __name__ == '__main__':
     # Configurar porta para Railway
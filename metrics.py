@@ -0,0 +1,213 @@
+"""
+Métricas no formato texto do Prometheus, sem dependências externas
+
+Contadores, gauges e histogramas com labels, registrados em um registro global
+e expostos por GET /metrics (main.py). Cada módulo declara as métricas que
+alimenta; declarar de novo o mesmo nome devolve a métrica já registrada, então
+módulos diferentes podem observar a mesma série.
+
+O custo no caminho quente é um lock curto e uma busca binária nos buckets.
+Gauges de estado (trades abertos, filas) usam callbacks avaliados só na coleta.
+Com METRICS_ENABLED=false nada é registrado nem observado.
+"""
+
+import bisect
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Segundos: de chamadas locais (ms) a requisições lentas e ciclos completos
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Iterable[str], values: Iterable, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Metric:
+    """Base: nome, descrição, labels e valores por combinação de labels"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, description: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, object] = {}
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type_name}"]
+        lines += [f"{name}{labels} {_format_value(value)}" for name, labels, value in self.samples()]
+        return lines
+
+class Counter(Metric):
+    """Valor que só cresce (requisições, acertos de cache, sinais enviados)"""
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in items]
+
+class Gauge(Metric):
+    """Valor atual; com set_function é calculado na coleta"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, description: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, description, labelnames)
+        self._function: Optional[Callable] = None
+
+    def set(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def set_function(self, func: Callable):
+        """func() -> número (sem labels) ou {valor do label (ou tupla): número}"""
+        self._function = func
+
+    def samples(self):
+        if self._function is not None:
+            try:
+                result = self._function()
+            except Exception as e:
+                print(f"[METRICS] ⚠️ Falha ao coletar {self.name}: {e}")
+                return []
+            if not isinstance(result, dict):
+                return [(self.name, "", float(result))]
+            return [
+                (self.name, _format_labels(self.labelnames, key if isinstance(key, tuple) else (key,)), float(value))
+                for key, value in result.items()
+            ]
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in items]
+
+class Histogram(Metric):
+    """Distribuição em buckets cumulativos (latências, durações)"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, description: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [contagem por bucket (não cumulativa, último = +Inf), soma]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observa a duração do bloco"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return sum(state[0]) if state else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        samples = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                samples.append((f"{self.name}_bucket", _format_labels(self.labelnames, key, le), cumulative))
+            samples.append((f"{self.name}_sum", _format_labels(self.labelnames, key), total))
+            samples.append((f"{self.name}_count", _format_labels(self.labelnames, key), cumulative))
+        return samples
+
+class MetricsRegistry:
+    """
+    Registro das métricas do processo e renderização do /metrics
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Metric] = {}
+
+    def _register(self, cls, name: str, description: str, labelnames: Iterable[str], **kwargs) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, description, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Métrica '{name}' já registrada com outro tipo ou labels")
+            return metric
+
+    def counter(self, name: str, description: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter, name, description, labelnames)
+
+    def gauge(self, name: str, description: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge, name, description, labelnames)
+
+    def histogram(self, name: str, description: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, description, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """Exposição no formato texto 0.0.4 do Prometheus"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+# Instância global
+metrics = MetricsRegistry()
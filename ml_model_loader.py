@@ -4,6 +4,16 @@ import pandas as pd
 import os
 from typing import Dict, Tuple, Optional
 
+# Cortes de probabilidade -> recomendação (do mais alto para o mais baixo)
+RECOMMENDATION_THRESHOLDS = ((0.8, "STRONG_BUY"), (0.65, "BUY"), (0.5, "WEAK_BUY"))
+
+def recommendation_for(probability: float, thresholds=RECOMMENDATION_THRESHOLDS) -> str:
+    """Recomendação para uma probabilidade (SKIP abaixo do menor corte)"""
+    for cutoff, recommendation in thresholds:
+        if probability >= cutoff:
+            return recommendation
+    return "SKIP"
+
 class MLModelLoader:
     """
     Carrega e usa o modelo de ML treinado com 2 anos de dados históricos
@@ -110,6 +120,53 @@ class MLModelLoader:
         
         return np.array(feature_array).reshape(1, -1)
     
+    def prepare_features_batch(self, market_data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Features de todas as velas de uma vez (backtest)
+
+        Cada linha tem os mesmos valores que prepare_features daria com a série
+        terminando naquela vela; linhas sem histórico suficiente ficam com NaN.
+        """
+        close = market_data['close']
+        features = pd.DataFrame(index=market_data.index)
+        features['rsi'] = market_data['rsi'] if 'rsi' in market_data else 50
+        features['macd'] = market_data['macd_diff'] if 'macd_diff' in market_data else 0
+
+        sma_20 = close.rolling(20).mean()
+        std_20 = close.rolling(20).std()
+        features['bb_upper'] = sma_20 + (2 * std_20)
+        features['bb_lower'] = sma_20 - (2 * std_20)
+        features['bb_position'] = ((close - features['bb_lower']) / (features['bb_upper'] - features['bb_lower'])).clip(0, 1)
+
+        volume_sma = market_data['volume_sma_20'] if 'volume_sma_20' in market_data else market_data['volume']
+        features['volume_ratio'] = market_data['volume'] / volume_sma
+        # Mesmas defasagens de prepare_features: iloc[-5] e iloc[-10]
+        features['price_change'] = (close - close.shift(4)) / close.shift(4) * 100
+        features['volatility'] = close.pct_change().rolling(20).std() * 100
+        features['momentum'] = (close - close.shift(9)) / close.shift(9) * 100
+
+        return pd.DataFrame({col: features[col] if col in features else 0.0 for col in self.feature_columns},
+                            index=market_data.index)
+
+    def predict_probabilities(self, market_data: pd.DataFrame) -> np.ndarray:
+        """Probabilidade do modelo para todas as velas em uma chamada (NaN sem features)"""
+        probabilities = np.full(len(market_data), np.nan)
+        if not self.is_loaded or market_data.empty:
+            return probabilities
+        features = self.prepare_features_batch(market_data)
+        valid = np.isfinite(features.to_numpy(dtype=float)).all(axis=1)
+        if not valid.any():
+            return probabilities
+        matrix = features[valid].to_numpy(dtype=float)
+        if self.scaler is not None:
+            matrix = self.scaler.transform(matrix)
+        if hasattr(self.model, 'predict_proba'):
+            predicted = self.model.predict_proba(matrix)
+            probabilities[valid] = predicted[:, 1] if predicted.shape[1] > 1 else predicted[:, 0]
+        else:
+            probabilities[valid] = self.model.predict(matrix)
+        return probabilities
+
     def predict_signal_quality(self, market_data: pd.DataFrame) -> Tuple[float, str, Dict]:
         """
         Prediz a qualidade do sinal usando o modelo treinado com 2 anos de dados
@@ -125,6 +182,7 @@ class MLModelLoader:
             features = self.prepare_features(market_data)
             if features is None:
                 return 0.5, "FALLBACK", {"error": "Dados insuficientes"}
+            raw_features = dict(zip(self.feature_columns, features[0].tolist()))
             
             # Normaliza features se há scaler
             if self.scaler is not None:
@@ -141,19 +199,13 @@ class MLModelLoader:
                 probability = float(prediction)
             
             # Determina recomendação baseada na probabilidade
-            if probability >= 0.8:
-                recommendation = "STRONG_BUY"
-            elif probability >= 0.65:
-                recommendation = "BUY"
-            elif probability >= 0.5:
-                recommendation = "WEAK_BUY"
-            else:
-                recommendation = "SKIP"
+            recommendation = recommendation_for(probability)
             
             details = {
                 "model_accuracy": self.model_accuracy,
                 "features_used": len(self.feature_columns),
-                "data_source": "2_years_historical"
+                "data_source": "2_years_historical",
+                "features": raw_features
             }
             
             return probability, recommendation, details
@@ -0,0 +1,145 @@
+import heapq
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+class MonitorStore:
+    """
+    Estrutura indexada dos sinais monitorados pelo AIResultMonitor
+
+    - ativos agrupados por símbolo (dict de dicts)
+    - min-heap pelo horário de expiração, para expirar sem varrer a lista
+    - contadores mantidos incrementalmente (estatísticas em O(1))
+
+    O custo por ciclo depende apenas da quantidade de sinais ativos.
+    """
+
+    def __init__(self, entries: Optional[Iterable[Dict]] = None, expiry_days: int = 7,
+                 archived: Optional[Dict] = None):
+        self.expiry = timedelta(days=expiry_days)
+        self.entries: Dict[str, Dict] = {}
+        self.active_by_symbol: Dict[str, Dict[str, Dict]] = {}
+        self._expiry_heap: List = []
+
+        # Entradas já movidas para o arquivo histórico entram só nos contadores
+        archived = archived or {}
+        self.total = archived.get('rows', 0)
+        self.active = 0
+        self.completed = archived.get('rows', 0)
+        self.successful = archived.get('successful', 0)
+
+        for entry in entries or []:
+            self.add(entry)
+
+    def add(self, entry: Dict):
+        """Indexa uma entrada (nova ou carregada do armazenamento)"""
+        signal_id = entry['signal_id']
+        if signal_id in self.entries:
+            self._unindex(self.entries[signal_id])
+        else:
+            self.total += 1
+        self.entries[signal_id] = entry
+
+        if entry['status'] == 'monitoring':
+            self.active += 1
+            self.active_by_symbol.setdefault(entry['symbol'], {})[signal_id] = entry
+            expires_at = datetime.fromisoformat(entry['created_at']) + self.expiry
+            heapq.heappush(self._expiry_heap, (expires_at, signal_id))
+        else:
+            self.completed += entry['status'] == 'completed'
+            self.successful += entry.get('result') == 'success'
+
+    def _unindex(self, entry: Dict):
+        """Remove a contribuição de uma entrada dos índices e contadores"""
+        if entry['status'] == 'monitoring':
+            self.active -= 1
+            symbol_signals = self.active_by_symbol.get(entry['symbol'], {})
+            symbol_signals.pop(entry['signal_id'], None)
+            if not symbol_signals:
+                self.active_by_symbol.pop(entry['symbol'], None)
+        else:
+            self.completed -= entry['status'] == 'completed'
+            self.successful -= entry.get('result') == 'success'
+
+    def complete(self, signal_id: str, result: str, days_to_result: int,
+                 completion_date: Optional[str] = None) -> Dict:
+        """Marca um sinal ativo como concluído e atualiza os índices"""
+        entry = self.entries[signal_id]
+        self._unindex(entry)
+        entry['status'] = 'completed'
+        entry['result'] = result
+        entry['completion_date'] = completion_date or datetime.now().isoformat()
+        entry['days_to_result'] = days_to_result
+        self.completed += 1
+        self.successful += result == 'success'
+        # A entrada no heap fica obsoleta e é descartada em pop_expired()
+        return entry
+
+    def active_symbols(self) -> List[str]:
+        return list(self.active_by_symbol.keys())
+
+    def active_for_symbol(self, symbol: str) -> List[Dict]:
+        return list(self.active_by_symbol.get(symbol, {}).values())
+
+    def active_entries(self) -> List[Dict]:
+        return [entry for signals in self.active_by_symbol.values() for entry in signals.values()]
+
+    def completed_entries(self) -> List[Dict]:
+        return [entry for entry in self.entries.values() if entry['status'] == 'completed']
+
+    def evict(self, signal_ids: Iterable[str]):
+        """Remove entradas concluídas da memória, mantendo-as nos contadores"""
+        for signal_id in signal_ids:
+            entry = self.entries.get(signal_id)
+            if entry is not None and entry['status'] != 'monitoring':
+                del self.entries[signal_id]
+
+    def add_archived(self, archived: Dict, sign: int = 1):
+        """Soma (ou subtrai, sign=-1) contagens do arquivo histórico aos contadores"""
+        self.total += sign * archived.get('rows', 0)
+        self.completed += sign * archived.get('rows', 0)
+        self.successful += sign * archived.get('successful', 0)
+
+    def symbol_entries(self, symbols: Set[str]) -> List[Dict]:
+        """Entradas (ativas e concluídas) dos símbolos"""
+        return [entry for entry in self.entries.values() if entry['symbol'] in symbols]
+
+    def discard(self, signal_id: str):
+        """Esquece uma entrada (concluída por outra réplica), sem contá-la como concluída"""
+        entry = self.entries.pop(signal_id, None)
+        if entry is not None:
+            self._unindex(entry)
+            self.total -= 1
+
+    def pop_expired(self, now: Optional[datetime] = None, symbols: Optional[Set[str]] = None) -> List[Dict]:
+        """Retira do heap os sinais ativos cujo prazo venceu (só dos símbolos informados, se houver)"""
+        now = now or datetime.now()
+        expired = {}
+        kept = []
+        while self._expiry_heap and self._expiry_heap[0][0] < now:
+            item = heapq.heappop(self._expiry_heap)
+            entry = self.entries.get(item[1])
+            if entry is None or entry['status'] != 'monitoring':
+                continue
+            if symbols is not None and entry['symbol'] not in symbols:
+                kept.append(item)
+                continue
+            expired[item[1]] = entry
+        for item in kept:
+            heapq.heappush(self._expiry_heap, item)
+        return list(expired.values())
+
+    def statistics(self) -> Dict:
+        success_rate = (self.successful / self.completed * 100) if self.completed > 0 else 0
+        return {
+            'total_monitored': self.total,
+            'active_monitoring': self.active,
+            'completed': self.completed,
+            'successful': self.successful,
+            'success_rate': round(success_rate, 2)
+        }
+
+    def __len__(self):
+        return self.total
+
+    def __iter__(self):
+        return iter(self.entries.values())
@@ -0,0 +1,142 @@
+"""
+Etapa de sentimento: busca de notícias concorrente + pontuação em lote
+
+Antes do loop de análise, o scanner pede os scores de todos os símbolos de uma
+vez. As buscas na NewsAPI rodam em paralelo (pool de conexões), artigos que
+aparecem para mais de um símbolo são pontuados uma única vez e a polaridade de
+cada artigo fica memorizada entre ciclos. Lotes grandes de textos novos são
+pontuados com TextBlob em um pool de processos; o score de cada símbolo é a
+média das polaridades dos seus artigos, como antes.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from textblob import TextBlob
+from metrics import metrics
+
+NEWS_API_URL = os.getenv("NEWS_API_URL", "https://newsapi.org/v2/everything")
+
+API_CALLS = metrics.counter("scanner_api_calls_total", "Requisições a APIs externas por status HTTP", ["api", "status"])
+
+def _polarity(text: str) -> float:
+    return TextBlob(text).sentiment.polarity
+
+def _polarity_batch(texts: List[str]) -> List[float]:
+    return [_polarity(text) for text in texts]
+
+def article_text(article: Dict) -> str:
+    return (article.get("title") or "") + " " + (article.get("description") or "")
+
+def article_key(article: Dict) -> str:
+    """Identidade do artigo: URL quando existe, senão hash do texto"""
+    return article.get("url") or hashlib.sha1(article_text(article).encode()).hexdigest()
+
+class NewsSentimentFetcher:
+    """
+    Chamável em lote: fetcher(symbols) -> {symbol: score}
+
+    Símbolos cuja busca falhou ficam fora do resultado (o SentimentCache mantém
+    o valor anterior).
+    """
+
+    def __init__(self, api_key: Optional[str], queries: Dict[str, str], api_url: str = NEWS_API_URL,
+                 workers: int = 8, page_size: int = 5, memo_size: int = 5000,
+                 process_pool_min: int = 500, timeout: float = 10.0):
+        self.api_key = api_key
+        self.queries = queries
+        self.api_url = api_url
+        self.workers = workers
+        self.page_size = page_size
+        self.memo_size = memo_size
+        self.process_pool_min = process_pool_min
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._fetch_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="news")
+        self._score_pool = None
+        self._score_workers = min(4, os.cpu_count() or 1)
+        self._memo: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "articles": 0, "unique_articles": 0, "scored": 0}
+
+    def fetch_articles(self, symbol: str) -> List[Dict]:
+        params = {
+            "q": self.queries.get(symbol, symbol),
+            "language": "en",
+            "sortBy": "publishedAt",
+            "pageSize": self.page_size,
+            "apiKey": self.api_key
+        }
+        try:
+            resp = self.session.get(self.api_url, params=params, timeout=self.timeout)
+        except requests.RequestException:
+            API_CALLS.inc(api="newsapi", status="error")
+            raise
+        API_CALLS.inc(api="newsapi", status=resp.status_code)
+        resp.raise_for_status()
+        return resp.json().get("articles") or []
+
+    def score_texts(self, texts: Dict[str, str]) -> Dict[str, float]:
+        """Polaridade por chave de artigo; só textos ainda não vistos são pontuados"""
+        with self._lock:
+            scores = {key: self._memo[key] for key in texts if key in self._memo}
+        pending = [key for key in texts if key not in scores]
+        if pending:
+            batch = [texts[key] for key in pending]
+            if len(batch) >= self.process_pool_min:
+                if self._score_pool is None:
+                    # spawn: o processo principal tem threads (Flask, dispatcher)
+                    self._score_pool = ProcessPoolExecutor(
+                        max_workers=self._score_workers,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+                chunk = max(16, len(batch) // (4 * self._score_workers))
+                chunks = [batch[i:i + chunk] for i in range(0, len(batch), chunk)]
+                polarities = [p for part in self._score_pool.map(_polarity_batch, chunks) for p in part]
+            else:
+                polarities = _polarity_batch(batch)
+            new_scores = dict(zip(pending, polarities))
+            scores.update(new_scores)
+            with self._lock:
+                self._memo.update(new_scores)
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+                self.stats["scored"] += len(pending)
+        return scores
+
+    def __call__(self, symbols: List[str]) -> Dict[str, float]:
+        futures = {symbol: self._fetch_pool.submit(self.fetch_articles, symbol) for symbol in symbols}
+        articles_by_symbol = {}
+        for symbol, future in futures.items():
+            try:
+                articles_by_symbol[symbol] = future.result()
+            except Exception as e:
+                print(f"⚠️ Erro ao buscar sentimento para {symbol}: {e}")
+
+        texts = {}
+        keys_by_symbol = {}
+        for symbol, articles in articles_by_symbol.items():
+            keys_by_symbol[symbol] = [article_key(a) for a in articles]
+            for key, article in zip(keys_by_symbol[symbol], articles):
+                texts.setdefault(key, article_text(article))
+
+        polarity = self.score_texts(texts)
+        with self._lock:
+            self.stats["requests"] += len(symbols)
+            self.stats["articles"] += sum(len(keys) for keys in keys_by_symbol.values())
+            self.stats["unique_articles"] += len(texts)
+
+        return {
+            symbol: (sum(polarity[k] for k in keys) / len(keys) if keys else 0)
+            for symbol, keys in keys_by_symbol.items()
+        }
@@ -0,0 +1,350 @@
+"""
+Dispatcher assíncrono de notificações
+
+O scanner apenas enfileira a mensagem (submit) e segue analisando os próximos
+símbolos. Cada mensagem gera uma entrega por destino do FanoutEngine (fanout.py);
+a thread de agendamento libera as entregas respeitando o rate limit e o circuit
+breaker de cada destino, refaz tentativas com backoff exponencial por destino e,
+na primeira entrega bem-sucedida, executa o callback registrado (ex.: registrar
+o trade aberto).
+
+Mensagens pendentes ficam em um outbox persistente e são reenviadas se o
+processo reiniciar antes da entrega. O outbox é um diário só de acréscimo (uma
+linha JSON por mudança de estado: mensagem nova, tentativa falha, destino
+concluído), gravado fora do lock do dispatcher e compactado na partida e a cada
+OUTBOX_COMPACT_EVERY linhas. Arquivos no formato antigo (lista JSON) são lidos
+normalmente.
+"""
+
+import heapq
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from fanout import FanoutEngine, RenderedMessage, fanout_engine
+from metrics import metrics
+
+# Um arquivo por réplica do scanner (ver SHARDING no README)
+OUTBOX_FILE = os.getenv("NOTIFY_OUTBOX_FILE", "notification_outbox.json")
+# Linhas do diário antes de reescrevê-lo só com as mensagens vivas
+OUTBOX_COMPACT_EVERY = 1000
+
+RETRIES = metrics.counter("scanner_retries_total", "Novas tentativas agendadas", ["component"])
+NOTIFICATIONS = metrics.counter("scanner_notifications_total", "Entregas concluídas por destino", ["destination", "outcome"])
+
+class NotificationDispatcher:
+    """
+    Fila limitada + outbox persistente + entrega por destino + retry com backoff
+    """
+
+    def __init__(self, engine: Optional[FanoutEngine] = None, outbox_file: str = OUTBOX_FILE,
+                 maxsize: int = 1000, workers: int = 8, max_attempts: int = 8,
+                 max_backoff: float = 60.0):
+        self.engine = engine or fanout_engine
+        self.outbox_file = outbox_file
+        self.maxsize = maxsize
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+
+        self._callbacks: Dict[str, Callable] = {}
+        self._outbox: Dict[str, Dict] = {}
+        self._rendered: Dict[str, RenderedMessage] = {}
+        self._intake = queue.Queue()
+        # O diário tem lock próprio: gravar não bloqueia submit nem a agenda
+        self._journal_lock = threading.Lock()
+        self._journal_lines = 0
+        self._lock = threading.RLock()
+        self._idle = threading.Condition(self._lock)
+        self._slots = threading.Semaphore(workers)
+        self._executor = None
+        self._thread = None
+        self._running = False
+        self.stats = {"submitted": 0, "sent": 0, "failed": 0, "retries": 0, "rejected": 0}
+
+    # --- Configuração ---
+    def register_callback(self, name: str, func: Callable):
+        """Registra um callback por nome (nomes sobrevivem a reinícios, funções não)"""
+        self._callbacks[name] = func
+
+    def start(self):
+        """Inicia a thread de entrega e reenfileira o outbox salvo em disco"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="notify")
+            for message in self._load_outbox():
+                if "pending" not in message:
+                    # Formato antigo (um único chat): reenvia para todos os destinos atuais
+                    message["pending"] = {name: 0 for name in self.engine.destination_names()}
+                    message.setdefault("delivered", False)
+                self._outbox[message["id"]] = message
+                for destination in message["pending"]:
+                    self._intake.put((0.0, message["id"], destination))
+            if self._outbox:
+                print(f"[DISPATCHER] 📬 {len(self._outbox)} mensagens pendentes recuperadas do outbox")
+            self._thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+            self._thread.start()
+        # Fora de self._lock: a ordem dos locks é sempre diário -> dispatcher
+        with self._journal_lock:
+            self._compact()
+
+    def stop(self, timeout: float = 5.0):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    # --- Outbox persistente ---
+    def _load_outbox(self) -> List[Dict]:
+        """Reaplica o diário; mensagens sem destinos pendentes já foram encerradas"""
+        if not os.path.exists(self.outbox_file):
+            return []
+        try:
+            with open(self.outbox_file, 'r') as f:
+                content = f.read()
+        except Exception as e:
+            print(f"[DISPATCHER] ⚠️ Outbox ilegível, ignorado: {e}")
+            return []
+        if content.lstrip().startswith('['):
+            try:
+                return json.loads(content)
+            except Exception as e:
+                print(f"[DISPATCHER] ⚠️ Outbox ilegível, ignorado: {e}")
+                return []
+
+        messages: Dict[str, Dict] = {}
+        for line in content.splitlines():
+            try:
+                event = json.loads(line)
+            except ValueError:
+                # Última linha cortada por uma queda no meio da gravação
+                continue
+            message = messages.get(event.get("id"))
+            if event["op"] == "put":
+                messages[event["id"]] = event["message"]
+            elif message is None:
+                continue
+            elif event["op"] == "attempt":
+                if event["destination"] in message["pending"]:
+                    message["pending"][event["destination"]] = event["attempts"]
+            elif event["op"] == "done":
+                message["pending"].pop(event["destination"], None)
+                message["delivered"] = message["delivered"] or event["delivered"]
+        return [m for m in messages.values() if m.get("pending", True)]
+
+    def _journal(self, event: Dict):
+        """Acrescenta uma mudança de estado ao diário (chamar sem self._lock)"""
+        line = json.dumps(event, separators=(',', ':')) + "\n"
+        with self._journal_lock:
+            with open(self.outbox_file, 'a') as f:
+                f.write(line)
+            self._journal_lines += 1
+            if self._journal_lines >= OUTBOX_COMPACT_EVERY:
+                self._compact()
+
+    def _compact(self):
+        """Reescreve o diário só com as mensagens vivas (chamar com self._journal_lock)"""
+        with self._lock:
+            live = [dict(m, pending=dict(m["pending"])) for m in self._outbox.values()]
+        tmp_path = f"{self.outbox_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            for message in live:
+                f.write(json.dumps({"op": "put", "id": message["id"], "message": message},
+                                   separators=(',', ':')) + "\n")
+        os.replace(tmp_path, self.outbox_file)
+        self._journal_lines = len(live)
+
+    # --- API usada pelo scanner ---
+    def submit(self, text: str, destinations: Optional[List[str]] = None, callback: Optional[str] = None,
+               context: Optional[Dict] = None, on_failure: Optional[str] = None) -> bool:
+        """
+        Enfileira uma mensagem para envio em segundo plano
+
+        Args:
+            destinations: nomes dos destinos (padrão: todos os do FanoutEngine)
+            callback: executado uma vez, na primeira entrega bem-sucedida
+            on_failure: executado se nenhum destino receber a mensagem
+
+        Returns:
+            bool: False se a fila estiver cheia (mensagem não aceita)
+        """
+        if not self._running:
+            self.start()
+
+        destinations = destinations or self.engine.destination_names()
+        with self._lock:
+            if len(self._outbox) >= self.maxsize:
+                self.stats["rejected"] += 1
+                print(f"[DISPATCHER] ⚠️ Fila cheia ({self.maxsize}), mensagem descartada")
+                return False
+
+            message = {
+                "id": str(uuid.uuid4()),
+                "text": text,
+                "callback": callback,
+                "on_failure": on_failure,
+                "context": context,
+                "pending": {name: 0 for name in destinations},
+                "delivered": False,
+                "created_at": time.time()
+            }
+            self._outbox[message["id"]] = message
+            self._rendered[message["id"]] = RenderedMessage(text, context)
+            self.stats["submitted"] += 1
+            record = dict(message, pending=dict(message["pending"]))
+
+        # Gravada antes de entrar na agenda: nenhum evento da entrega a precede no diário
+        self._journal({"op": "put", "id": message["id"], "message": record})
+        for destination in destinations:
+            self._intake.put((0.0, message["id"], destination))
+        return True
+
+    def pending_contexts(self, callback: str) -> List[Dict]:
+        """Contextos das mensagens ainda não entregues de um callback"""
+        with self._lock:
+            return [m["context"] for m in self._outbox.values()
+                    if m["callback"] == callback and not m["delivered"]]
+
+    def pending_count(self) -> int:
+        return len(self._outbox)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Aguarda até o outbox esvaziar (True) ou o timeout expirar (False)"""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._outbox, timeout)
+
+    # --- Entrega ---
+    def _render(self, message: Dict) -> RenderedMessage:
+        """Renderização única por mensagem (refeita só após reinício do processo)"""
+        with self._lock:
+            rendered = self._rendered.get(message["id"])
+            if rendered is None:
+                rendered = RenderedMessage(message["text"], message.get("context"))
+                self._rendered[message["id"]] = rendered
+            return rendered
+
+    def _run(self):
+        """Agenda as entregas: heap por horário de liberação + rate limit por destino"""
+        sequence = itertools.count()
+        ready_heap = []
+        saturated = False
+        while self._running:
+            timeout = 0.5
+            if ready_heap:
+                timeout = max(0.0, min(timeout, ready_heap[0][0] - time.monotonic()))
+            if saturated:
+                # Todos os workers ocupados: espera um pouco em vez de girar em falso
+                timeout = max(timeout, 0.01)
+            try:
+                ready_at, message_id, destination = self._intake.get(timeout=timeout)
+                heapq.heappush(ready_heap, (ready_at, next(sequence), message_id, destination))
+                while True:
+                    ready_at, message_id, destination = self._intake.get_nowait()
+                    heapq.heappush(ready_heap, (ready_at, next(sequence), message_id, destination))
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            saturated = False
+            while ready_heap and ready_heap[0][0] <= now:
+                if not self._slots.acquire(blocking=False):
+                    saturated = True
+                    break
+                _, _, message_id, destination = heapq.heappop(ready_heap)
+                message = self._outbox.get(message_id)
+                if message is None or destination not in message["pending"]:
+                    self._slots.release()
+                    continue
+                if destination not in self.engine.destinations:
+                    self._slots.release()
+                    self._executor.submit(self._complete, message, destination, "failed")
+                    continue
+                wait = self.engine.acquire(destination, now)
+                if wait > 0:
+                    self._slots.release()
+                    heapq.heappush(ready_heap, (now + wait, next(sequence), message_id, destination))
+                    continue
+                self._executor.submit(self._deliver, message, destination)
+
+    def _deliver(self, message: Dict, destination: str):
+        try:
+            sent, retry_after, permanent = self.engine.send(
+                destination, self._render(message), message.get("created_at")
+            )
+        except Exception as e:
+            print(f"[DISPATCHER] ❌ Erro inesperado no envio para {destination}: {e}")
+            sent, retry_after, permanent = False, None, False
+        finally:
+            self._slots.release()
+
+        if sent:
+            self._complete(message, destination, "sent")
+            return
+
+        with self._lock:
+            message["pending"][destination] += 1
+            attempts = message["pending"][destination]
+        if permanent or attempts >= self.max_attempts:
+            print(f"[DISPATCHER] ❌ Entrega para {destination} descartada após {attempts} tentativas")
+            self._complete(message, destination, "failed")
+            return
+
+        # Backoff exponencial, ou o tempo pedido pelo destino em caso de 429
+        delay = retry_after if retry_after is not None else min(self.max_backoff, 2 ** attempts)
+        RETRIES.inc(component="notification")
+        with self._lock:
+            self.stats["retries"] += 1
+        self._journal({"op": "attempt", "id": message["id"], "destination": destination, "attempts": attempts})
+        self._intake.put((time.monotonic() + delay, message["id"], destination))
+
+    def _complete(self, message: Dict, destination: str, outcome: str):
+        """
+        Fecha a entrega de um destino; callbacks rodam no máximo uma vez por mensagem
+
+        A conclusão (e a entrega) vai para o diário antes do callback: se o
+        processo cair no meio do callback, o reinício não o repete.
+        """
+        callback_name = None
+        NOTIFICATIONS.inc(destination=destination, outcome=outcome)
+        with self._lock:
+            self.stats[outcome] += 1
+            message["pending"].pop(destination, None)
+            if outcome == "sent" and not message["delivered"]:
+                message["delivered"] = True
+                callback_name = message.get("callback")
+            elif not message["pending"] and not message["delivered"]:
+                callback_name = message.get("on_failure")
+            delivered = message["delivered"]
+
+        self._journal({"op": "done", "id": message["id"], "destination": destination, "delivered": delivered})
+        callback = self._callbacks.get(callback_name) if callback_name else None
+        if callback is not None:
+            try:
+                callback(message.get("context"))
+            except Exception as e:
+                print(f"[DISPATCHER] ⚠️ Erro no callback '{callback_name}': {e}")
+
+        with self._lock:
+            if not message["pending"]:
+                self._outbox.pop(message["id"], None)
+                self._rendered.pop(message["id"], None)
+            self._idle.notify_all()
+
+    def statistics(self) -> Dict:
+        """Contadores do dispatcher + estado e latências (p50/p90/p99) por destino"""
+        with self._lock:
+            stats = dict(self.stats, pending=len(self._outbox))
+        stats.update(self.engine.stats())
+        return stats
+
+
+# Instância global
+notification_dispatcher = NotificationDispatcher()
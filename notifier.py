@@ -1,51 +1,94 @@
+import os
 import requests
 import time
+from typing import Optional, Tuple
 
 BOT_TOKEN = "7360602779:AAFIpncv7fkXaEX5PdWdEAUBb7NQ9SeA-F0"
 CHAT_ID = "@botsinaistop"
 
-def send_signal_notification(content):
-    """
-    Envia notificação para o Telegram - versão simples que funcionava
-    """
-    try:
-        if isinstance(content, dict):
-            symbol = content["symbol"]
-            entry_price = content["entry_price"]
-            target_price = content["target_price"]
-            stop_loss = content["stop_loss"]
-            risk_reward = content["risk_reward"]
-            confidence_score = content["confidence_score"]
-            strategy = content["strategy"]
-            created_at = content["created_at"]
-
-            text = f"""📢 Novo sinal detectado para {symbol}
+# Permite apontar para um servidor local (fake_telegram_server.py) em testes
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org")
+
+# Sessão compartilhada para reaproveitar conexões HTTP
+_session = requests.Session()
+
+def format_signal_message(content) -> Optional[str]:
+    """Converte um sinal (dict) ou texto pronto na mensagem enviada ao Telegram"""
+    if isinstance(content, dict):
+        symbol = content["symbol"]
+        entry_price = content["entry_price"]
+        target_price = content["target_price"]
+        stop_loss = content["stop_loss"]
+        risk_reward = content["risk_reward"]
+        confidence_score = content["confidence_score"]
+        strategy = content["strategy"]
+        created_at = content["created_at"]
+
+        return f"""📢 Novo sinal detectado para {symbol}
 🎯 Entrada: {entry_price} | Alvo: {target_price} | Stop: {stop_loss}
 📊 R:R: {risk_reward} | Confiança: {confidence_score}%
 ⏱️ Estratégia: {strategy}
 📅 Criado em: {created_at}"""
 
-        elif isinstance(content, str):
-            text = content
-        else:
+    elif isinstance(content, str):
+        return content
+    return None
+
+def post_telegram_message(text, chat_id=CHAT_ID, timeout=10) -> requests.Response:
+    """Faz o POST sendMessage na API do Telegram"""
+    url = f"{TELEGRAM_API_BASE}/bot{BOT_TOKEN}/sendMessage"
+    payload = {
+        "chat_id": chat_id,
+        "text": text
+    }
+    return _session.post(url, json=payload, timeout=timeout)
+
+def deliver_telegram_message(chat_id, text) -> Tuple[bool, Optional[float], bool]:
+    """
+    Envia uma mensagem e classifica o resultado para o dispatcher
+
+    Returns:
+        Tuple[bool, Optional[float], bool]: (enviado, retry_after em segundos, falha permanente)
+    """
+    try:
+        response = post_telegram_message(text, chat_id=chat_id)
+    except requests.RequestException as e:
+        print(f"❌ Erro no envio: {e}")
+        return False, None, False
+
+    if response.status_code == 200:
+        return True, None, False
+
+    if response.status_code == 429:
+        # Telegram informa quanto tempo esperar em parameters.retry_after
+        try:
+            retry_after = float(response.json().get("parameters", {}).get("retry_after", 1))
+        except ValueError:
+            retry_after = 1.0
+        return False, retry_after, False
+
+    print(f"❌ Erro HTTP {response.status_code}")
+    # Erros 4xx (chat inválido, mensagem malformada) não melhoram com retry
+    return False, None, 400 <= response.status_code < 500
+
+def send_signal_notification(content):
+    """
+    Envia notificação para o Telegram - versão simples que funcionava
+    """
+    try:
+        text = format_signal_message(content)
+        if text is None:
             return False
 
-        url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-        payload = {
-            "chat_id": CHAT_ID,
-            "text": text
-        }
-        
-        response = requests.post(url, json=payload, timeout=10)
-        
+        response = post_telegram_message(text)
+
         if response.status_code == 200:
             print("✅ Notificação enviada para o canal com sucesso.")
             return True
         else:
             print(f"❌ Erro HTTP {response.status_code}")
             return False
-            
+
     except Exception as e:
         print(f"❌ Erro no envio: {e}")
         return False
-
@@ -0,0 +1,271 @@
+"""
+Rotulagem de resultados pelo caminho dos candles desde a criação do sinal
+
+Em vez de comparar um único preço por ciclo com alvo e stop, cada sinal é
+avaliado contra todos os candles (máxima/mínima) entre `created_at` e o prazo
+de monitoramento. A primeira passagem por alvo ou stop é encontrada de forma
+vetorizada para todos os sinais de uma vez: as séries dos símbolos são
+concatenadas, cada sinal vira um intervalo [criação, prazo) dessa série e os
+intervalos são reunidos em uma única matriz (sinais x candles do prazo).
+
+Regras:
+- só contam candles que começam em/depois de `created_at` e antes do prazo
+  (EXPIRY_DAYS);
+- alvo e stop no mesmo candle: não dá para saber a ordem dentro do candle,
+  então vale o stop (rótulo conservador);
+- sem passagem até o prazo: sucesso se a máxima chegou a 80% do caminho até o
+  alvo (mesma regra da expiração do AIResultMonitor), senão falha.
+
+Horários: os dois lados são comparados em UTC. `created_at` é gravado na hora
+local do servidor (datetime.now()) e os candles da CoinGecko vêm em UTC sem
+fuso; valores com fuso explícito são convertidos. Os candles devem ter máxima e
+mínima reais (get_ohlc); séries só com close valem sem pavio.
+
+Modo replay (reprocessa o histórico em lote):
+
+    python outcome_engine.py replay [--apply] [--csv BTCUSDT=historical_data_BTC_USDT_1h.csv]
+
+Sem --apply só mostra quantos rótulos mudariam. Com --apply atualiza os
+registros do armazenamento quente e reescreve as partições do arquivo
+histórico (outcomes e signals).
+"""
+
+import sys
+from datetime import timedelta, timezone
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+EXPIRY_DAYS = 7
+PARTIAL_TARGET_RATIO = 0.8
+
+def to_utc(values) -> np.ndarray:
+    """created_at -> datetime64 UTC (sem fuso: hora local de quem gravou; com fuso: convertido)"""
+    return np.array([
+        pd.Timestamp(value).to_pydatetime().astimezone(timezone.utc).replace(tzinfo=None)
+        for value in values
+    ], dtype="datetime64[ns]")
+
+def to_local(timestamp: pd.Timestamp) -> pd.Timestamp:
+    """Instante UTC sem fuso -> hora local sem fuso (mesmo relógio de created_at)"""
+    return pd.Timestamp(timestamp.to_pydatetime().replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None))
+
+class OutcomeEngine:
+    """
+    Primeira passagem por alvo/stop sobre o caminho de candles de cada sinal
+    """
+
+    def __init__(self, expiry_days: int = EXPIRY_DAYS):
+        self.expiry = np.timedelta64(timedelta(days=expiry_days))
+
+    @staticmethod
+    def _series(df: pd.DataFrame):
+        """Início (UTC), máxima e mínima dos candles (séries antigas, só com close, valem sem pavio)"""
+        starts = pd.to_datetime(df["timestamp"])
+        if starts.dt.tz is not None:
+            starts = starts.dt.tz_convert("UTC").dt.tz_localize(None)
+        starts = starts.to_numpy(dtype="datetime64[ns]")
+        highs = df["high" if "high" in df.columns else "close"].to_numpy(dtype=np.float64)
+        lows = df["low" if "low" in df.columns else "close"].to_numpy(dtype=np.float64)
+        return starts, highs, lows
+
+    def evaluate(self, signals: List[Dict], candles: Dict[str, pd.DataFrame]) -> List[Dict]:
+        """
+        Avalia todos os sinais em uma passada
+
+        Args:
+            signals: dicts com symbol, entry_price, target_price, stop_loss, created_at
+            candles: {symbol: DataFrame com timestamp, close e (opcional) high/low}
+
+        Returns:
+            Um dict por sinal (na mesma ordem): result ('success', 'failure' ou
+            None se ainda em aberto), hit_at (início do candle, UTC), expired,
+            path_max e path_min
+            (NaN se nenhum candle do caminho está na série)
+        """
+        empty = {"result": None, "hit_at": None, "expired": False, "path_max": np.nan, "path_min": np.nan}
+        results = [dict(empty) for _ in signals]
+        covered = [i for i, s in enumerate(signals)
+                   if s['symbol'] in candles and not candles[s['symbol']].empty]
+        if not covered:
+            return results
+
+        # Séries de todos os símbolos concatenadas; cada sinal vira um intervalo [start, end)
+        symbols = sorted({signals[i]['symbol'] for i in covered})
+        series = [self._series(candles[symbol]) for symbol in symbols]
+        offsets = dict(zip(symbols, np.cumsum([0] + [len(s[0]) for s in series[:-1]])))
+        starts = np.concatenate([s[0] for s in series])
+        highs = np.concatenate([s[1] for s in series])
+        lows = np.concatenate([s[2] for s in series])
+        last_starts = dict(zip(symbols, (s[0][-1] for s in series)))
+
+        created = to_utc([signals[i]['created_at'] for i in covered])
+        entry = np.array([signals[i]['entry_price'] for i in covered], dtype=np.float64)
+        target = np.array([signals[i]['target_price'] for i in covered], dtype=np.float64)
+        stop = np.array([signals[i]['stop_loss'] for i in covered], dtype=np.float64)
+        deadline = created + self.expiry
+
+        first = np.empty(len(covered), dtype=np.int64)
+        last = np.empty(len(covered), dtype=np.int64)
+        covered_symbols = np.array([signals[i]['symbol'] for i in covered])
+        for symbol, (symbol_starts, _, _) in zip(symbols, series):
+            mask = covered_symbols == symbol
+            first[mask] = offsets[symbol] + np.searchsorted(symbol_starts, created[mask], side="left")
+            last[mask] = offsets[symbol] + np.searchsorted(symbol_starts, deadline[mask], side="left")
+
+        # (sinais x candles do prazo): caminho de cada sinal
+        width = max(1, int((last - first).max()))
+        index = first[:, None] + np.arange(width)
+        in_path = index < last[:, None]
+        index = np.minimum(index, len(starts) - 1)
+        path_high = highs[index]
+        path_low = lows[index]
+        in_path &= ~np.isnan(path_high)
+
+        up = in_path & (path_high >= target[:, None])
+        down = in_path & (path_low <= stop[:, None])
+        first_up = np.where(up.any(axis=1), up.argmax(axis=1), width)
+        first_down = np.where(down.any(axis=1), down.argmax(axis=1), width)
+        hit_stop = (first_down < width) & (first_down <= first_up)
+        hit_target = (first_up < width) & ~hit_stop
+        hit_index = first + np.where(hit_stop, first_down, first_up)
+
+        has_path = in_path.any(axis=1)
+        path_max = np.where(has_path, np.where(in_path, path_high, -np.inf).max(axis=1), np.nan)
+        path_min = np.where(has_path, np.where(in_path, path_low, np.inf).min(axis=1), np.nan)
+
+        # Prazo vencido dentro da série sem passagem: regra dos 80% do caminho até o alvo
+        series_end = np.array([last_starts[symbol] for symbol in covered_symbols])
+        expired = ~hit_stop & ~hit_target & (series_end >= deadline - np.timedelta64(1, "h"))
+        partial = np.nan_to_num(path_max - entry, nan=0.0) >= (target - entry) * PARTIAL_TARGET_RATIO
+
+        for k, i in enumerate(covered):
+            outcome = results[i]
+            outcome["path_max"] = float(path_max[k])
+            outcome["path_min"] = float(path_min[k])
+            if hit_target[k] or hit_stop[k]:
+                outcome["result"] = "success" if hit_target[k] else "failure"
+                outcome["hit_at"] = pd.Timestamp(starts[hit_index[k]])
+            elif expired[k]:
+                outcome["result"] = "success" if partial[k] else "failure"
+                outcome["expired"] = True
+        return results
+
+    @staticmethod
+    def days_to_result(signal: Dict, outcome: Dict) -> int:
+        """Dias entre a criação e o candle da passagem (mínimo 1; expiração = prazo)"""
+        if outcome["hit_at"] is None:
+            return EXPIRY_DAYS
+        created = pd.Timestamp(to_utc([signal['created_at']])[0])
+        return max(1, (outcome["hit_at"] - created).days)
+
+
+def replay(records: List[Dict], candles: Dict[str, pd.DataFrame],
+           engine: Optional["OutcomeEngine"] = None) -> pd.DataFrame:
+    """
+    Reavalia sinais já rotulados contra o caminho de candles
+
+    Returns:
+        DataFrame com signal_id, symbol, old_result, new_result, days_to_result
+        e changed (sinais cujo prazo não está coberto pelos candles ficam de fora)
+    """
+    engine = engine or outcome_engine
+    records = [r for r in records if r.get('result') in ('success', 'failure')]
+    outcomes = engine.evaluate(records, candles)
+    rows = [
+        {
+            "signal_id": record['signal_id'],
+            "symbol": record['symbol'],
+            "old_result": record['result'],
+            "new_result": outcome["result"],
+            "days_to_result": engine.days_to_result(record, outcome)
+        }
+        for record, outcome in zip(records, outcomes) if outcome["result"] is not None
+    ]
+    df = pd.DataFrame(rows, columns=["signal_id", "symbol", "old_result", "new_result", "days_to_result"])
+    df["changed"] = df["old_result"] != df["new_result"]
+    return df
+
+
+def _replay_candles(records: List[Dict], csv_files: Dict[str, str]) -> Dict[str, pd.DataFrame]:
+    """
+    Candles para o replay: CSVs informados ou CoinGecko (janela desde o sinal mais antigo)
+
+    Até OHLC_MAX_DAYS usa os candles OHLC (máximas/mínimas reais, 4 h a partir de
+    3 dias). Janelas maiores caem nos pontos horários da market_chart, em que
+    máxima = mínima = close: passagens só por pavio não aparecem.
+    """
+    from price_fetcher import OHLC_MAX_DAYS, fetch_historical_data_coingecko, fetch_ohlc_coingecko
+
+    candles = {}
+    for symbol in sorted({r['symbol'] for r in records}):
+        if symbol in csv_files:
+            df = pd.read_csv(csv_files[symbol])
+            df["timestamp"] = pd.to_datetime(df["timestamp"])
+            candles[symbol] = df
+            continue
+        oldest = min(pd.Timestamp(r['created_at']) for r in records if r['symbol'] == symbol)
+        # Até 90 dias a CoinGecko devolve pontos horários
+        days = min(90, (pd.Timestamp.now() - oldest).days + 1)
+        if days <= OHLC_MAX_DAYS:
+            df = fetch_ohlc_coingecko(symbol, days=days)
+        else:
+            df = fetch_historical_data_coingecko(symbol, days=days)
+        if df is not None and not df.empty:
+            candles[symbol] = df
+    return candles
+
+
+def _main(argv: List[str]):
+    if not argv or argv[0] != "replay":
+        print("Uso: python outcome_engine.py replay [--apply] [--csv SYMBOL=arquivo.csv ...]")
+        return
+
+    from ai_data_collector import ai_data_collector
+    from ai_result_monitor import ai_result_monitor
+    from history_archive import history_archive
+    from storage import storage
+
+    apply = "--apply" in argv
+    csv_files = dict(arg.split("=", 1) for arg in argv[1:] if "=" in arg)
+
+    hot = ai_data_collector.snapshot()
+    archived = history_archive.read("signals").replace({"": None}).to_dict("records")
+    records = hot + archived
+    candles = _replay_candles(records, csv_files)
+    labels = replay(records, candles)
+
+    before = (labels["old_result"] == "success").mean() * 100 if len(labels) else 0
+    after = (labels["new_result"] == "success").mean() * 100 if len(labels) else 0
+    print(f"[OUTCOME] 🔁 {len(records)} sinais | {len(labels)} cobertos pelos candles | "
+          f"{int(labels['changed'].sum())} rótulos mudariam")
+    print(f"[OUTCOME] 🎯 Taxa de sucesso: {before:.1f}% -> {after:.1f}%")
+    if not apply:
+        return
+
+    changed = labels[labels["changed"]]
+    updates = {
+        row.signal_id: {"result": row.new_result, "days_to_result": row.days_to_result}
+        for row in changed.itertuples()
+    }
+    hot_ids = {r['signal_id'] for r in hot}
+    with storage.batch():
+        for signal_id, update in updates.items():
+            if signal_id in hot_ids:
+                ai_data_collector.update_signal_result(signal_id, update["result"], update["days_to_result"])
+        monitored = [e for e in ai_result_monitor.completed_entries() if e['signal_id'] in updates]
+        for entry in monitored:
+            entry.update(updates[entry['signal_id']])
+        ai_result_monitor.save_monitoring_data(monitored)
+    relabeled = {
+        dataset: history_archive.relabel(dataset, updates) for dataset in ("signals", "outcomes")
+    }
+    print(f"[OUTCOME] ✅ Rótulos aplicados: {len(updates)} (arquivo: {relabeled})")
+
+
+# Instância global
+outcome_engine = OutcomeEngine()
+
+
+if __name__ == "__main__":
+    _main(sys.argv[1:])
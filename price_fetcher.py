@@ -1,7 +1,11 @@
 import requests
 import pandas as pd
+import threading
 import time
 import os
+from metrics import metrics
+from structured_log import get_logger
+from cycle_profiler import cycle_profiler
 
 COINGECKO_API_KEY = os.getenv("COINGECKO_API_KEY", "CG-SnFGo9ozwT62MLbBiuuzpxxh")
 COINGECKO_BASE_URL = "https://api.coingecko.com/api/v3"
@@ -21,10 +25,32 @@ SYMBOL_TO_ID = {
     "PEPEUSDT": "pepe", "SEIUSDT": "sei-network"
 }
 
+# Ids por requisição em /simple/price (limite prático do tamanho da URL)
+SIMPLE_PRICE_BATCH = 250
+
+# Última série de candles de cada símbolo, reaproveitada pelo monitoramento
+# (resultados de sinais e trades abertos) enquanto for mais nova que o TTL
+CANDLE_CACHE_TTL = float(os.getenv("CANDLE_CACHE_TTL", "600"))
+_candle_cache = {}
+_candle_cache_lock = threading.Lock()
+
+# Candles OHLC (/coins/{id}/ohlc) para a rotulagem de resultados: máximas e
+# mínimas reais. A CoinGecko escolhe a granularidade pelo período (30 min até 2
+# dias, 4 h até 30 dias) e o timestamp de cada candle é o do fechamento
+OHLC_DAYS = 2
+OHLC_MAX_DAYS = 30
+_ohlc_cache = {}
+
+FETCH_SECONDS = metrics.histogram("scanner_fetch_seconds", "Duração da requisição de candles por símbolo", ["symbol"])
+API_CALLS = metrics.counter("scanner_api_calls_total", "Requisições a APIs externas por status HTTP", ["api", "status"])
+CACHE_REQUESTS = metrics.counter("scanner_cache_requests_total", "Consultas aos caches (hit, stale, miss)", ["cache", "result"])
+
+log = get_logger(__name__)
+
 def fetch_historical_data_coingecko(symbol, days=3):
     coin_id = SYMBOL_TO_ID.get(symbol)
     if not coin_id:
-        print(f"❌ Moeda não reconhecida no mapeamento: {symbol}")
+        log.error(f"❌ Moeda não reconhecida no mapeamento: {symbol}", extra={"symbol": symbol})
         return None
 
     url = f"{COINGECKO_BASE_URL}/coins/{coin_id}/market_chart"
@@ -34,12 +60,16 @@ def fetch_historical_data_coingecko(symbol, days=3):
     }
 
     try:
-        response = requests.get(url, params=params, headers=HEADERS)
+        start = time.perf_counter()
+        with cycle_profiler.span("fetch", symbol):
+            response = requests.get(url, params=params, headers=HEADERS)
+        FETCH_SECONDS.observe(time.perf_counter() - start, symbol=symbol)
+        API_CALLS.inc(api="coingecko", status=response.status_code)
         response.raise_for_status()
         data = response.json()
 
         if "prices" not in data or not data["prices"]:
-            print(f"⚠️ Dados de preço indisponíveis para {symbol} na resposta da API.")
+            log.warning(f"⚠️ Dados de preço indisponíveis para {symbol} na resposta da API.", extra={"symbol": symbol})
             return None
 
         df = pd.DataFrame(data["prices"], columns=["timestamp", "close"])
@@ -55,29 +85,200 @@ def fetch_historical_data_coingecko(symbol, days=3):
         # Converte para numérico, preenche NaNs com o último valor válido e remove linhas com valores zero no 'close'
         df = df.apply(pd.to_numeric, errors="coerce").ffill().dropna()
         df = df[df['close'] > 0] # Garante que o preço de fechamento não seja zero
-        df = df.resample("1h").last().ffill().reset_index()
 
+        # Candles de 1h (timestamps em UTC, sem fuso): último preço como close;
+        # máxima/mínima dos pontos da hora. A partir de 2 dias a market_chart só
+        # devolve pontos horários, então aqui máxima = mínima = close; a
+        # rotulagem usa os candles OHLC (get_ohlc)
+        hourly = df.resample("1h")
+        candles = hourly.last()
+        candles["high"] = hourly["close"].max()
+        candles["low"] = hourly["close"].min()
+        df = candles.ffill().reset_index()
+
+        with _candle_cache_lock:
+            _candle_cache[symbol] = (time.time(), days, df)
         return df
 
     except requests.exceptions.HTTPError as http_err:
-        print(f"⚠️ Erro HTTP para {symbol}: {http_err.response.status_code} - {http_err.response.text}")
+        log.warning(f"⚠️ Erro HTTP para {symbol}: {http_err.response.status_code} - {http_err.response.text}",
+                    extra={"symbol": symbol})
+        return None
+    except requests.exceptions.RequestException as e:
+        API_CALLS.inc(api="coingecko", status="error")
+        log.error(f"❌ Erro de conexão ao buscar dados de {symbol}: {e}", extra={"symbol": symbol})
         return None
     except Exception as e:
-        print(f"❌ Erro inesperado ao buscar dados de {symbol}: {e}")
+        log.error(f"❌ Erro inesperado ao buscar dados de {symbol}: {e}", extra={"symbol": symbol})
         return None
 
+def ohlc_granularity(days):
+    """Duração dos candles devolvidos pela /ohlc para o período pedido"""
+    return pd.Timedelta(minutes=30) if days <= 2 else pd.Timedelta(hours=4)
+
+def fetch_ohlc_coingecko(symbol, days=OHLC_DAYS):
+    """
+    Candles OHLC do símbolo (timestamp = início do candle, UTC sem fuso)
+
+    Até 2 dias vêm candles de 30 min; até OHLC_MAX_DAYS, de 4 h.
+    """
+    coin_id = SYMBOL_TO_ID.get(symbol)
+    if not coin_id:
+        log.error(f"❌ Moeda não reconhecida no mapeamento: {symbol}", extra={"symbol": symbol})
+        return None
+
+    days = max(1, min(int(days), OHLC_MAX_DAYS))
+    url = f"{COINGECKO_BASE_URL}/coins/{coin_id}/ohlc"
+    params = {
+        "vs_currency": "usd",
+        "days": days
+    }
+
+    try:
+        start = time.perf_counter()
+        with cycle_profiler.span("fetch", symbol):
+            response = requests.get(url, params=params, headers=HEADERS, timeout=10)
+        FETCH_SECONDS.observe(time.perf_counter() - start, symbol=symbol)
+        API_CALLS.inc(api="coingecko_ohlc", status=response.status_code)
+        response.raise_for_status()
+        data = response.json()
+
+        if not data:
+            log.warning(f"⚠️ Candles OHLC indisponíveis para {symbol} na resposta da API.", extra={"symbol": symbol})
+            return None
+
+        df = pd.DataFrame(data, columns=["timestamp", "open", "high", "low", "close"])
+        # A API marca o fechamento; o outcome_engine trabalha com o início do candle
+        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms") - ohlc_granularity(days)
+        df[["open", "high", "low", "close"]] = df[["open", "high", "low", "close"]].apply(pd.to_numeric, errors="coerce")
+        df = df.dropna().drop_duplicates("timestamp", keep="last").sort_values("timestamp", ignore_index=True)
+
+        with _candle_cache_lock:
+            _ohlc_cache[symbol] = (time.time(), days, df)
+        return df
+
+    except requests.exceptions.HTTPError as http_err:
+        log.warning(f"⚠️ Erro HTTP (OHLC) para {symbol}: {http_err.response.status_code} - {http_err.response.text}",
+                    extra={"symbol": symbol})
+        return None
+    except requests.exceptions.RequestException as e:
+        API_CALLS.inc(api="coingecko_ohlc", status="error")
+        log.error(f"❌ Erro de conexão ao buscar OHLC de {symbol}: {e}", extra={"symbol": symbol})
+        return None
+    except Exception as e:
+        log.error(f"❌ Erro inesperado ao buscar OHLC de {symbol}: {e}", extra={"symbol": symbol})
+        return None
+
+def _ohlc_fresh(entry, days, now):
+    """
+    Série em cache ainda atual: nenhum candle fechou desde a busca
+
+    O último candle da série termina em início + granularidade; o seguinte só
+    fecha uma granularidade depois. Até lá a API devolveria os mesmos candles
+    fechados, então a série vale por vários ciclos do scan (o TTL por idade
+    venceria entre dois scans de 15 min).
+    """
+    if entry is None or entry[1] != days or entry[2].empty:
+        return False
+    step = ohlc_granularity(days)
+    next_close = pd.Timestamp(entry[2]["timestamp"].iloc[-1]) + 2 * step
+    return pd.Timestamp(now, unit="s") < next_close
+
+def get_ohlc(symbols, days=OHLC_DAYS):
+    """
+    Candles OHLC dos símbolos (rotulagem), buscados só quando fechou um candle novo
+
+    Com candles de 30 min e scan a cada 15 min, cada símbolo custa no máximo
+    uma requisição a cada 30 min, e nenhuma quando nada fechou.
+    """
+    data = {}
+    fetched = 0
+    for symbol in symbols:
+        with _candle_cache_lock:
+            entry = _ohlc_cache.get(symbol)
+        if _ohlc_fresh(entry, days, time.time()):
+            CACHE_REQUESTS.inc(cache="ohlc", result="hit")
+            data[symbol] = entry[2]
+            continue
+        CACHE_REQUESTS.inc(cache="ohlc", result="miss" if entry is None else "stale")
+        if fetched:
+            time.sleep(1.0)  # Espaça as requisições seguidas (limite da API)
+        fetched += 1
+        df = fetch_ohlc_coingecko(symbol, days)
+        if df is not None and not df.empty:
+            data[symbol] = df
+        elif entry is not None and entry[1] == days:
+            # Falha na API: a série anterior ainda cobre o caminho até a última busca
+            data[symbol] = entry[2]
+        else:
+            log.warning(f"⚠️ Candles OHLC indisponíveis para {symbol}. Pulando...", extra={"symbol": symbol})
+    return data
+
 def fetch_all_data(symbols):
     all_data = {}
     for symbol in symbols:
-        print(f"🔁 Buscando dados de {symbol}...")
+        log.debug("🔁 Buscando dados de %s...", symbol, extra={"symbol": symbol})
         df = fetch_historical_data_coingecko(symbol)
         if df is not None and not df.empty:
             all_data[symbol] = df
-            print(f"✅ Dados de {symbol} recebidos com sucesso.")
+            log.debug("✅ Dados de %s recebidos com sucesso.", symbol, extra={"symbol": symbol})
         else:
-            print(f"⚠️ Dados indisponíveis para {symbol}. Pulando...")
+            log.warning(f"⚠️ Dados indisponíveis para {symbol}. Pulando...", extra={"symbol": symbol})
         time.sleep(1.0)  # Reduzido de 2.5s para 1s para melhor performance 
     return all_data
 
+def cached_candles(symbol, max_age=CANDLE_CACHE_TTL, days=3):
+    """Série em cache do símbolo, se cobre `days` dias e tem menos de `max_age` segundos"""
+    with _candle_cache_lock:
+        entry = _candle_cache.get(symbol)
+    if entry is None:
+        CACHE_REQUESTS.inc(cache="candles", result="miss")
+        return None
+    fetched_at, cached_days, df = entry
+    if time.time() - fetched_at > max_age or cached_days < days:
+        CACHE_REQUESTS.inc(cache="candles", result="stale")
+        return None
+    CACHE_REQUESTS.inc(cache="candles", result="hit")
+    return df
+
+def get_candles(symbols, max_age=CANDLE_CACHE_TTL):
+    """Candles dos símbolos: do cache quando recentes, buscando só os que faltam"""
+    data = {}
+    missing = []
+    for symbol in symbols:
+        df = cached_candles(symbol, max_age)
+        if df is not None:
+            data[symbol] = df
+        else:
+            missing.append(symbol)
+    if missing:
+        data.update(fetch_all_data(missing))
+    return data
 
+def fetch_current_prices(symbols):
+    """Preço atual (USD) de vários símbolos em uma única requisição /simple/price"""
+    ids = {SYMBOL_TO_ID[symbol]: symbol for symbol in symbols if symbol in SYMBOL_TO_ID}
+    coin_ids = list(ids)
+    prices = {}
+    for i in range(0, len(coin_ids), SIMPLE_PRICE_BATCH):
+        params = {"ids": ",".join(coin_ids[i:i + SIMPLE_PRICE_BATCH]), "vs_currencies": "usd"}
+        try:
+            response = requests.get(f"{COINGECKO_BASE_URL}/simple/price", params=params, headers=HEADERS, timeout=10)
+            API_CALLS.inc(api="coingecko_price", status=response.status_code)
+            response.raise_for_status()
+            data = response.json()
+        except requests.exceptions.HTTPError as http_err:
+            log.warning(f"⚠️ Erro HTTP ao buscar preços atuais: {http_err.response.status_code} - {http_err.response.text}")
+            continue
+        except requests.exceptions.RequestException as e:
+            API_CALLS.inc(api="coingecko_price", status="error")
+            log.error(f"❌ Erro de conexão ao buscar preços atuais: {e}")
+            continue
+        except Exception as e:
+            log.error(f"❌ Erro inesperado ao buscar preços atuais: {e}")
+            continue
 
+        for coin_id, quote in data.items():
+            if coin_id in ids and quote.get("usd"):
+                prices[ids[coin_id]] = float(quote["usd"])
+    return prices
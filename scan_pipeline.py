@@ -0,0 +1,166 @@
+"""
+Pipeline assíncrono do scan: busca → indicadores → predição → notificação
+
+Cada etapa é um grupo de workers asyncio ligados por filas limitadas. Um
+símbolo segue para a próxima etapa assim que a anterior termina, então a
+análise começa enquanto o resto do universo ainda está sendo buscado, e o
+primeiro sinal sai antes do fim do ciclo. As funções das etapas são
+bloqueantes (requests, pandas, sklearn) e rodam em threads; a etapa de
+indicadores delega a CPU ao pool de processos (analysis_pool).
+
+Filas cheias bloqueiam a etapa anterior (backpressure), limitando quantos
+DataFrames ficam em memória. A profundidade de cada fila é amostrada a cada
+put/get para ajuste de `queue_size` e da concorrência das etapas.
+"""
+
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional
+from structured_log import get_logger
+
+log = get_logger(__name__)
+
+_DONE = object()
+
+class PipelineStage:
+    """
+    Etapa do pipeline
+
+    func(item) -> novo item, ou None para descartar o símbolo
+    min_interval: espaçamento mínimo entre inícios de chamadas (rate limit de API)
+    """
+
+    def __init__(self, name: str, func: Callable, concurrency: int = 1, min_interval: float = 0.0):
+        self.name = name
+        self.func = func
+        self.concurrency = concurrency
+        self.min_interval = min_interval
+
+class ScanPipeline:
+    """
+    Executa as etapas em sequência com filas limitadas entre elas
+    """
+
+    def __init__(self, stages: List[PipelineStage], queue_size: int = 8):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.last_run: Dict = {}
+        self._live_queues: Dict[str, Dict] = {}
+
+    @staticmethod
+    def _queue_stats() -> Dict:
+        return {"samples": 0, "depth_sum": 0, "max_depth": 0, "depth": 0}
+
+    @staticmethod
+    def _sample(stats: Dict, queue: asyncio.Queue):
+        depth = queue.qsize()
+        stats["depth"] = depth
+        stats["samples"] += 1
+        stats["depth_sum"] += depth
+        stats["max_depth"] = max(stats["max_depth"], depth)
+
+    async def _worker(self, stage: PipelineStage, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue],
+                      stage_stats: Dict, queue_stats: Dict, pacing: Dict):
+        while True:
+            item = await inbox.get()
+            self._sample(queue_stats[stage.name], inbox)
+            if item is _DONE:
+                return
+
+            if stage.min_interval:
+                async with pacing["lock"]:
+                    wait = pacing["next_start"] - time.monotonic()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    pacing["next_start"] = time.monotonic() + stage.min_interval
+
+            start = time.perf_counter()
+            try:
+                result = await asyncio.to_thread(stage.func, item)
+            except Exception as e:
+                stage_stats["errors"] += 1
+                log.error(f"🚨 Erro na etapa {stage.name}: {e}")
+                result = None
+            stage_stats["busy_seconds"] += time.perf_counter() - start
+            stage_stats["processed"] += 1
+            if result is None:
+                stage_stats["dropped"] += 1
+                continue
+            if stage_stats["first_output_at"] is None:
+                stage_stats["first_output_at"] = time.perf_counter()
+            if outbox is not None:
+                await outbox.put(result)
+                self._sample(queue_stats[self._next_name(stage)], outbox)
+
+    def _next_name(self, stage: PipelineStage) -> str:
+        return self.stages[self.stages.index(stage) + 1].name
+
+    async def _run(self, items: List) -> Dict:
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        stage_stats = {
+            s.name: {"processed": 0, "dropped": 0, "errors": 0, "busy_seconds": 0.0, "first_output_at": None}
+            for s in self.stages
+        }
+        queue_stats = {s.name: self._queue_stats() for s in self.stages}
+        self._live_queues = queue_stats
+        started_at = time.perf_counter()
+
+        async def feed():
+            for item in items:
+                await queues[0].put(item)
+                self._sample(queue_stats[self.stages[0].name], queues[0])
+            for _ in range(self.stages[0].concurrency):
+                await queues[0].put(_DONE)
+
+        async def run_stage(index: int):
+            stage = self.stages[index]
+            outbox = queues[index + 1] if index + 1 < len(self.stages) else None
+            pacing = {"lock": asyncio.Lock(), "next_start": 0.0}
+            await asyncio.gather(*[
+                self._worker(stage, queues[index], outbox, stage_stats[stage.name], queue_stats, pacing)
+                for _ in range(stage.concurrency)
+            ])
+            # Etapa encerrada: avisa cada worker da próxima
+            if outbox is not None:
+                for _ in range(self.stages[index + 1].concurrency):
+                    await outbox.put(_DONE)
+
+        await asyncio.gather(feed(), *[run_stage(i) for i in range(len(self.stages))])
+        finished_at = time.perf_counter()
+
+        last_stage = stage_stats[self.stages[-1].name]
+        return {
+            "items": len(items),
+            "total_seconds": round(finished_at - started_at, 3),
+            "time_to_first_output": (
+                round(last_stage["first_output_at"] - started_at, 3)
+                if last_stage["first_output_at"] is not None else None
+            ),
+            "stages": {
+                name: {
+                    "processed": stats["processed"],
+                    "dropped": stats["dropped"],
+                    "errors": stats["errors"],
+                    "busy_seconds": round(stats["busy_seconds"], 3),
+                    "queue_max_depth": queue_stats[name]["max_depth"],
+                    "queue_avg_depth": (
+                        round(queue_stats[name]["depth_sum"] / queue_stats[name]["samples"], 2)
+                        if queue_stats[name]["samples"] else 0.0
+                    )
+                }
+                for name, stats in stage_stats.items()
+            }
+        }
+
+    def run(self, items: List) -> Dict:
+        """Processa os itens (símbolos) e retorna as métricas do ciclo"""
+        try:
+            self.last_run = asyncio.run(self._run(items))
+        finally:
+            self._live_queues = {}
+        return self.last_run
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Profundidade atual da fila de entrada de cada etapa (zero fora de um ciclo)"""
+        live = self._live_queues
+        return {stage.name: live[stage.name]["depth"] if stage.name in live else 0 for stage in self.stages}
@@ -1,16 +1,36 @@
 import os
+import threading
 import time
-import requests
-from textblob import TextBlob
-from price_fetcher import fetch_all_data
-from technical_indicators import calculate_indicators
-from signal_generator_hybrid import generate_hybrid_signal
-from notifier import send_signal_notification
-from state_manager import load_open_trades, save_open_trades, check_and_notify_closed_trades
+from price_fetcher import fetch_all_data, fetch_historical_data_coingecko, get_candles
+from signal_generator_hybrid import (
+    generate_hybrid_signals, hybrid_evaluator, technical_weights, PONTUACAO_MINIMA_PARA_SINAL
+)
+from analysis_pool import analysis_executor
+from notification_dispatcher import notification_dispatcher
+from state_manager import open_trades_state, check_and_notify_closed_trades
 from ai_result_monitor import ai_result_monitor
 from ml_model_loader import ml_model
 from ai_predictor import ai_predictor
 from ai_data_collector import ai_data_collector
+from storage import storage, SQLiteStorage
+from history_archive import archive_completed
+from sentiment_cache import SentimentCache
+from news_sentiment import NewsSentimentFetcher
+from scheduler import CandleScheduler, ScheduledJob
+from scan_pipeline import PipelineStage, ScanPipeline
+from shard_coordinator import shard_coordinator
+from trade_monitor import TradeMonitor, TRADE_MONITOR_INTERVAL
+from status_snapshot import status_snapshots
+from event_bus import event_bus
+from metrics import metrics
+from structured_log import get_logger
+from cycle_profiler import cycle_profiler
+from decision_trace import decision_tracer
+
+log = get_logger(__name__)
+
+SIGNALS = metrics.counter("scanner_signals_total", "Sinais aprovados por resultado do envio", ["outcome"])
+CYCLE_SECONDS = metrics.histogram("scanner_cycle_seconds", "Duração total dos ciclos", ["phase"])
 
 # --- CONFIGURAÇÕES ---
 SYMBOLS = [
@@ -22,11 +42,25 @@ SYMBOLS = [
 ]
 
 USAR_SENTIMENTO = True
+
+# Agendamento (segundos): scans alinhados aos fechamentos de candle
+SCAN_INTERVAL = float(os.getenv("SCAN_INTERVAL", "900"))
+SCAN_SETTLE_DELAY = float(os.getenv("SCAN_SETTLE_DELAY", "30"))
+SCAN_MISSED_POLICY = os.getenv("SCAN_MISSED_POLICY", "skip")  # skip ou catch_up
+MONITOR_INTERVAL = float(os.getenv("MONITOR_INTERVAL", "300"))
+
+# Modo do scan: batch (fase por fase) ou pipeline (etapas assíncronas com filas)
+SCAN_MODE = os.getenv("SCAN_MODE", "batch")
+PIPELINE_FETCH_CONCURRENCY = int(os.getenv("PIPELINE_FETCH_CONCURRENCY", "2"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
 NEWS_API_KEY = os.getenv("NEWS_API_KEY")
-NEWS_API_URL = "https://newsapi.org/v2/everything"
 
-# Cache para evitar chamadas repetidas
-_sentiment_cache = {}
+# Sharding: várias réplicas dividem SYMBOLS por leases em SQLite (shard_coordinator).
+# O estado (trades, monitoramento, treino) precisa estar no banco compartilhado.
+SHARDING = os.getenv("SHARDING", "false").lower() == "true"
+if SHARDING and not isinstance(storage, SQLiteStorage):
+    log.warning("[SHARD] ⚠️ SHARDING exige STORAGE_BACKEND=sqlite; rodando sem shards")
+    SHARDING = False
 
 # Mapeamento de símbolos para nomes legíveis
 symbol_map = {
@@ -41,233 +75,500 @@ symbol_map = {
     "SUIUSDT": "Sui"
 }
 
+# Notícias buscadas em paralelo e pontuadas em lote; cache com TTL persistido em
+# disco (entradas vencidas são atualizadas em segundo plano)
+news_sentiment = NewsSentimentFetcher(NEWS_API_KEY, symbol_map)
+sentiment_cache = SentimentCache(news_sentiment)
+
+def get_sentiment_scores(symbols):
+    """Scores de sentimento de todos os símbolos do ciclo: {symbol: score}"""
+    if not NEWS_API_KEY:
+        return {symbol: 0 for symbol in symbols}
+    return sentiment_cache.get_many(symbols)
+
 def get_sentiment_score(symbol):
     """Obtém score de sentimento para um símbolo"""
-    if symbol in _sentiment_cache:
-        return _sentiment_cache[symbol]
+    return get_sentiment_scores([symbol])[symbol]
 
-    if not NEWS_API_KEY:
-        _sentiment_cache[symbol] = 0
-        return 0
+def shard_symbols():
+    """Símbolos desta réplica (o universo inteiro sem sharding)"""
+    return shard_coordinator.filter(SYMBOLS) if SHARDING else list(SYMBOLS)
 
-    query = symbol_map.get(symbol, symbol)
-    try:
-        params = {
-            "q": query,
-            "language": "en",
-            "sortBy": "publishedAt",
-            "pageSize": 5,
-            "apiKey": NEWS_API_KEY
-        }
-        resp = requests.get(NEWS_API_URL, params=params, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-
-        if not data.get("articles"):
-            _sentiment_cache[symbol] = 0
-            return 0
-
-        sentiment_sum = 0
-        for article in data["articles"]:
-            text = (article.get("title") or "") + " " + (article.get("description") or "")
-            analysis = TextBlob(text)
-            sentiment_sum += analysis.sentiment.polarity
-
-        score = sentiment_sum / len(data["articles"])
-        _sentiment_cache[symbol] = score
-        return score
+# Callbacks de entrega e liberação de partições não se intercalam
+_shard_state_lock = threading.Lock()
 
-    except Exception as e:
-        print(f"⚠️ Erro ao buscar sentimento para {symbol}: {e}")
-        _sentiment_cache[symbol] = 0
-        return 0
+def _forget_symbols(symbols):
+    """Tira da memória o estado dos símbolos liberados (o banco continua com ele)"""
+    open_trades_state.forget(symbols)
+    ai_result_monitor.forget_symbols(symbols)
+    ai_data_collector.forget_symbols(symbols)
+
+def retain_shard():
+    """Partida: mantém na memória (e nos contadores) só o estado dos símbolos do shard"""
+    owned = set(shard_symbols())
+    # O estado carregado na importação já cobre as partições do primeiro heartbeat
+    shard_coordinator.take_acquired(SYMBOLS)
+    open_trades_state.owns = shard_coordinator.owns
+    open_trades_state.forget([s for s in open_trades_state.keys() if s not in owned])
+    ai_result_monitor.retain_symbols(owned)
+    ai_data_collector.retain_symbols(owned)
+
+def sync_shard():
+    """
+    Limite do ciclo: libera as partições acima da cota (o estado delas sai da
+    memória) e recarrega do banco o estado dos símbolos assumidos de outra réplica
+    """
+    if not SHARDING:
+        return
+    # Trades alterados pelo monitor rápido vão para o banco antes de sair do shard
+    open_trades_state.commit()
+    with _shard_state_lock:
+        released = shard_coordinator.release_pending(SYMBOLS, _forget_symbols)
+    if released:
+        log.info(f"[SHARD] 📤 Estado liberado para {len(released)} símbolos")
+    acquired = shard_coordinator.take_acquired(SYMBOLS)
+    if not acquired:
+        return
+    open_trades_state.reload(acquired)
+    ai_result_monitor.reload_symbols(acquired)
+    ai_data_collector.reload_symbols(acquired)
+    log.info(f"[SHARD] 🔄 Estado recarregado para {len(acquired)} símbolos assumidos")
+
+def publish_shard_status(summary=None):
+    """Estado desta réplica para a agregação da API (somado entre os shards)"""
+    if not SHARDING:
+        return
+    owned = set(shard_symbols())
+    status = {
+        "symbols": len(owned),
+        "open_trades": sum(1 for symbol in open_trades_state.keys() if symbol in owned),
+        "pending_notifications": notification_dispatcher.pending_count(),
+        "last_scan": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+    if summary:
+        status.update(
+            signals_found=summary["found"],
+            signals_sent=summary["sent"],
+            cycle_seconds=round(summary["total_seconds"], 3)
+        )
+    shard_coordinator.publish(status)
+
+def _register_delivered(signal):
+    """Monitoramento do resultado e trade aberto de um sinal entregue"""
+    # Adiciona para monitoramento de resultado
+    ai_result_monitor.add_signal_for_monitoring(signal)
+    
+    # Registra trade aberto
+    open_trades_state[signal['symbol']] = {
+        'entry_price': float(signal['entry_price']),
+        'target_price': float(signal['target_price']),
+        'stop_loss': float(signal['stop_loss']),
+        'created_at': signal['created_at'],
+        'signal_id': signal['id']
+    }
+    open_trades_state.commit()
+    status_snapshots.publish(["status", "trades"])
+    log.info(f"✅ Sinal híbrido de {signal['symbol']} entregue e monitorado", extra={"symbol": signal['symbol']})
+
+def on_signal_delivered(signal):
+    """Callback do dispatcher: registra monitoramento e trade aberto após a entrega"""
+    with _shard_state_lock:
+        if SHARDING and not shard_coordinator.owns(signal['symbol']):
+            # Entrega tardia de um símbolo que já mudou de réplica: o estado é do novo dono
+            log.warning(f"[SHARD] ⚠️ Sinal de {signal['symbol']} entregue fora do shard; monitoramento ignorado",
+                        extra={"symbol": signal['symbol']})
+            return
+        _register_delivered(signal)
+
+notification_dispatcher.register_callback("signal_delivered", on_signal_delivered)
+
+# Alvo/stop verificados em cadência curta, fora do ciclo do scan (uma cotação em lote por volta)
+trade_monitor = TradeMonitor(
+    open_trades_state, ai_result_monitor, notification_dispatcher.submit,
+    interval=TRADE_MONITOR_INTERVAL, symbols_func=shard_symbols if SHARDING else None,
+    on_change=lambda: status_snapshots.publish(["status", "trades"])
+)
 
 def print_system_status():
     """Imprime status completo do sistema híbrido"""
-    print("\n" + "="*60)
-    print("🚀 SISTEMA HÍBRIDO ML + IA - STATUS COMPLETO")
-    print("="*60)
+    log.info("="*60)
+    log.info("🚀 SISTEMA HÍBRIDO ML + IA - STATUS COMPLETO")
+    log.info("="*60)
     
     # Status do modelo ML (2 anos de dados)
     ml_info = ml_model.get_model_info()
-    print(f"🤖 MODELO ML (2 ANOS DE DADOS):")
+    log.info(f"🤖 MODELO ML (2 ANOS DE DADOS):")
     if ml_info['is_loaded']:
-        print(f"   ✅ Status: ATIVO")
-        print(f"   📊 Acurácia: {ml_info['accuracy']:.2%}")
-        print(f"   🔧 Tipo: {ml_info['model_type']}")
-        print(f"   📁 Features: {len(ml_info['features'])}")
+        log.info(f"   ✅ Status: ATIVO")
+        log.info(f"   📊 Acurácia: {ml_info['accuracy']:.2%}")
+        log.info(f"   🔧 Tipo: {ml_info['model_type']}")
+        log.info(f"   📁 Features: {len(ml_info['features'])}")
     else:
-        print(f"   ❌ Status: INATIVO")
-        print(f"   📁 Arquivo esperado: {ml_info['model_path']}")
+        log.info(f"   ❌ Status: INATIVO")
+        log.info(f"   📁 Arquivo esperado: {ml_info['model_path']}")
     
     # Status da IA adaptativa
     data_stats = ai_data_collector.get_statistics()
-    print(f"\n🧠 IA ADAPTATIVA:")
-    print(f"   📈 Sinais coletados: {data_stats['total_signals']}")
-    print(f"   ✅ Com resultado: {data_stats['completed_signals']}")
-    print(f"   🎯 Taxa de sucesso: {data_stats['success_rate']}%")
+    log.info(f"🧠 IA ADAPTATIVA:")
+    log.info(f"   📈 Sinais coletados: {data_stats['total_signals']}")
+    log.info(f"   ✅ Com resultado: {data_stats['completed_signals']}")
+    log.info(f"   🎯 Taxa de sucesso: {data_stats['success_rate']}%")
     
     if ai_predictor.is_trained:
-        print(f"   🤖 Status: ATIVO (Acurácia: {ai_predictor.training_accuracy:.2%})")
+        log.info(f"   🤖 Status: ATIVO (Acurácia: {ai_predictor.training_accuracy:.2%})")
     else:
-        print(f"   🤖 Status: COLETANDO DADOS")
+        log.info(f"   🤖 Status: COLETANDO DADOS")
     
     # Status do monitoramento
     monitor_stats = ai_result_monitor.get_monitoring_statistics()
-    print(f"\n👁️ MONITORAMENTO:")
-    print(f"   📊 Total monitorado: {monitor_stats['total_monitored']}")
-    print(f"   🔄 Ativo: {monitor_stats['active_monitoring']}")
+    log.info(f"👁️ MONITORAMENTO:")
+    log.info(f"   📊 Total monitorado: {monitor_stats['total_monitored']}")
+    log.info(f"   🔄 Ativo: {monitor_stats['active_monitoring']}")
     
     # Estratégia híbrida
-    print(f"\n⚙️ ESTRATÉGIA HÍBRIDA:")
+    log.info(f"⚙️ ESTRATÉGIA HÍBRIDA:")
     if ml_info['is_loaded']:
-        print(f"   🥇 Principal: Modelo ML (2 anos)")
-        print(f"   🥈 Secundário: IA Adaptativa")
-        print(f"   🔄 Fallback: Análise Técnica")
+        log.info(f"   🥇 Principal: Modelo ML (2 anos)")
+        log.info(f"   🥈 Secundário: IA Adaptativa")
+        log.info(f"   🔄 Fallback: Análise Técnica")
     else:
-        print(f"   🥇 Principal: IA Adaptativa")
-        print(f"   🔄 Fallback: Análise Técnica")
-        print(f"   ⚠️ Para ativar ML: adicione arquivo crypto_ml_model.pkl")
+        log.info(f"   🥇 Principal: IA Adaptativa")
+        log.info(f"   🔄 Fallback: Análise Técnica")
+        log.info(f"   ⚠️ Para ativar ML: adicione arquivo crypto_ml_model.pkl")
     
-    print("="*60)
+    log.info("="*60)
 
-def run_scanner():
-    print("\n--- SCANNER HÍBRIDO ML + IA INICIADO ---")
-    
-    # Imprime status do sistema
-    print_system_status()
-    
+def run_monitoring():
+    """Fases 0 e 1: resultados de sinais anteriores e trades abertos"""
+    open_trades = open_trades_state
+    # Com sharding cada réplica só verifica (e grava) os símbolos do seu shard
+    owned = set(shard_symbols()) if SHARDING else None
     try:
         # Fase 0: Verificar resultados de sinais anteriores
-        print("\n🔍 Fase 0: Verificando resultados de sinais anteriores...")
-        ai_result_monitor.check_signal_results()
+        log.info("🔍 Fase 0: Verificando resultados de sinais anteriores...")
+        with cycle_profiler.span("signal_results"):
+            ai_result_monitor.check_signal_results(owned)
         
         # Fase 1: Monitoramento de trades abertos
-        print("\n🔍 Fase 1: Monitorando trades abertos...")
-        open_trades = load_open_trades()
-        if open_trades:
-            print(f"📊 Monitorando {len(open_trades)} trades abertos...")
-            market_data_for_monitoring = fetch_all_data(list(open_trades.keys()))
-            check_and_notify_closed_trades(open_trades, market_data_for_monitoring, send_signal_notification)
+        log.info("🔍 Fase 1: Monitorando trades abertos...")
+        trade_symbols = [s for s in open_trades.keys() if owned is None or s in owned]
+        if trade_symbols:
+            log.info(f"📊 Monitorando {len(trade_symbols)} trades abertos...")
+            # Símbolos buscados pelo último scan vêm do cache de candles
+            with cycle_profiler.span("open_trades"):
+                market_data_for_monitoring = get_candles(trade_symbols)
+                check_and_notify_closed_trades(
+                    open_trades, market_data_for_monitoring, notification_dispatcher.submit, symbols=owned
+                )
         else:
-            print("📊 Nenhum trade aberto para monitorar.")
+            log.info("📊 Nenhum trade aberto para monitorar.")
     except Exception as e:
-        print(f"⚠️ Erro nas fases de monitoramento: {e}")
-        open_trades = {}
+        log.warning(f"⚠️ Erro nas fases de monitoramento: {e}")
 
-    print("\n🔍 Fase 2: Buscando novos sinais com sistema híbrido...")
-    all_symbols_to_fetch = list(set(SYMBOLS) - set(open_trades.keys()))
-    if not all_symbols_to_fetch:
-        print("⚪ Não há novas moedas para analisar, todos os trades estão abertos.")
-        return
+def submit_signal(signal):
+    """Formata e enfileira um sinal aprovado; retorna True se foi aceito"""
+    symbol = signal['symbol']
+    log.info(
+        f"🔥 SINAL HÍBRIDO ENCONTRADO PARA {symbol}! "
+        f"🤖 ML: {signal.get('ml_probability', 'N/A')} | {signal.get('ml_recommendation', 'N/A')} | "
+        f"🧠 IA: {signal.get('ai_probability', 'N/A')} | {signal.get('ai_recommendation', 'N/A')} | "
+        f"⚙️ Estratégia: {signal['strategy']}",
+        extra={"symbol": symbol}
+    )
 
-    print("🚚 Buscando dados brutos do mercado (OHLCV)...")
     try:
-        market_data = fetch_all_data(all_symbols_to_fetch)
+        # Formatação da mensagem
+        signal_text = (
+            f"🚀 *SINAL HÍBRIDO ML + IA*\n\n"
+            f"📌 *Par:* {signal['symbol']}\n"
+            f"🎯 *Entrada:* `{signal['entry_price']}`\n"
+            f"🎯 *Alvo:* `{signal['target_price']}`\n"
+            f"🛑 *Stop Loss:* `{signal['stop_loss']}`\n\n"
+            f"📊 *Risco/Retorno:* `{signal['risk_reward']}`\n"
+            f"📈 *Confiança Técnica:* `{signal['confidence_score']}%`\n"
+            f"🤖 *ML (2 anos):* `{signal.get('ml_probability', 'N/A')}`\n"
+            f"🧠 *IA Adaptativa:* `{signal.get('ai_probability', 'N/A')}`\n"
+            f"🎯 *Confiança Híbrida:* `{signal.get('hybrid_confidence', 'N/A')}`\n\n"
+            f"⚙️ Estratégia: `{signal['strategy']}`\n"
+            f"📅 Criado em: `{signal['created_at']}`\n"
+            f"🆔 ID: `{signal['id']}`"
+        )
+
+        # Envio em segundo plano; monitoramento e trade aberto são
+        # registrados pelo callback on_signal_delivered após a entrega
+        if notification_dispatcher.submit(
+            signal_text, callback="signal_delivered", context=signal
+        ):
+            event_bus.publish("signal", signal)
+            SIGNALS.inc(outcome="queued")
+            log.info("📤 Sinal híbrido enfileirado para envio", extra={"symbol": symbol})
+            return True
+        log.warning(f"⚠️ Falha ao enfileirar sinal para {symbol}", extra={"symbol": symbol})
+
     except Exception as e:
-        print(f"🚨 Erro ao buscar dados de mercado: {e}")
-        return
+        log.error(f"🚨 Erro ao enviar notificação para {symbol}: {e}", extra={"symbol": symbol})
+    SIGNALS.inc(outcome="not_queued")
+    return False
+
+def _scan_batch(symbols):
+    """Modo batch: cada fase termina para o universo inteiro antes da próxima"""
+    cycle_start = time.perf_counter()
+    log.info("🚚 Buscando dados brutos do mercado (OHLCV)...")
+    try:
+        # Inclui o espaçamento entre requisições; cada busca tem seu span "fetch"
+        with cycle_profiler.span("market_data"):
+            market_data = fetch_all_data(symbols)
+    except Exception as e:
+        log.error(f"🚨 Erro ao buscar dados de mercado: {e}")
+        return None
 
     signals_found = 0
     signals_sent = 0
+    first_signal_at = None
 
+    # Indicadores + modelo ML em paralelo (pool de processos, memória compartilhada)
+    log.info(f"🔬 Analisando {len(market_data)} símbolos com sistema híbrido "
+             f"({analysis_executor.workers} processos)...")
+    try:
+        with cycle_profiler.span("indicators"):
+            analysis = analysis_executor.analyze(market_data, technical_weights(), PONTUACAO_MINIMA_PARA_SINAL)
+    except Exception as e:
+        log.error(f"🚨 Erro na análise paralela: {e}")
+        analysis = {}
+
+    frames = {}
+    ml_predictions = {}
+    ml_features = {}
     for symbol, df in market_data.items():
-        try:
-            if df is None or df.empty:
-                print(f"⚪ Sem dados para {symbol}, pulando...")
-                continue
-
-            print("-" * 40)
-            print(f"🔬 Analisando {symbol} com sistema híbrido...")
-
-            df_with_indicators = calculate_indicators(df)
-            if df_with_indicators.empty:
-                print(f"⚠️ Não foi possível calcular indicadores para {symbol}. Pulando...")
-                continue
-            print("✅ Indicadores calculados com sucesso.")
-
-            # Análise de sentimento
-            sentiment_score = 0.0
-            if USAR_SENTIMENTO:
-                sentiment_score = get_sentiment_score(symbol)
-                print(f"🧠 Sentimento para {symbol}: {sentiment_score:.2f}")
-                
-                if sentiment_score < -0.3:
-                    print(f"⚪ Sentimento muito negativo ({sentiment_score:.2f}) para {symbol}. Pulando...")
-                    continue
-            
-            # Geração de sinal com sistema híbrido
-            signal = generate_hybrid_signal(df_with_indicators, symbol, sentiment_score)
-            
-            if signal:
-                signals_found += 1
-                print(f"🔥 SINAL HÍBRIDO ENCONTRADO PARA {symbol}!")
-                print(f"   🤖 ML: {signal.get('ml_probability', 'N/A')} | {signal.get('ml_recommendation', 'N/A')}")
-                print(f"   🧠 IA: {signal.get('ai_probability', 'N/A')} | {signal.get('ai_recommendation', 'N/A')}")
-                print(f"   ⚙️ Estratégia: {signal['strategy']}")
-                
-                try:
-                    # Formatação da mensagem
-                    signal_text = (
-                        f"🚀 *SINAL HÍBRIDO ML + IA*\n\n"
-                        f"📌 *Par:* {signal['symbol']}\n"
-                        f"🎯 *Entrada:* `{signal['entry_price']}`\n"
-                        f"🎯 *Alvo:* `{signal['target_price']}`\n"
-                        f"🛑 *Stop Loss:* `{signal['stop_loss']}`\n\n"
-                        f"📊 *Risco/Retorno:* `{signal['risk_reward']}`\n"
-                        f"📈 *Confiança Técnica:* `{signal['confidence_score']}%`\n"
-                        f"🤖 *ML (2 anos):* `{signal.get('ml_probability', 'N/A')}`\n"
-                        f"🧠 *IA Adaptativa:* `{signal.get('ai_probability', 'N/A')}`\n"
-                        f"🎯 *Confiança Híbrida:* `{signal.get('hybrid_confidence', 'N/A')}`\n\n"
-                        f"⚙️ Estratégia: `{signal['strategy']}`\n"
-                        f"📅 Criado em: `{signal['created_at']}`\n"
-                        f"🆔 ID: `{signal['id']}`"
-                    )
-                    
-                    if send_signal_notification(signal_text):
-                        signals_sent += 1
-                        
-                        # Adiciona para monitoramento de resultado
-                        ai_result_monitor.add_signal_for_monitoring(signal)
-                        
-                        # Salva trade aberto
-                        open_trades[symbol] = {
-                            'entry_price': float(signal['entry_price']),
-                            'target_price': float(signal['target_price']),
-                            'stop_loss': float(signal['stop_loss']),
-                            'created_at': signal['created_at'],
-                            'signal_id': signal['id']
-                        }
-                        save_open_trades(open_trades)
-                        
-                        print(f"✅ Sinal híbrido enviado e monitorado")
-                    else:
-                        print(f"⚠️ Falha ao enviar sinal para {symbol}")
-                        
-                except Exception as e:
-                    print(f"🚨 Erro ao enviar notificação para {symbol}: {e}")
-            else:
-                print(f"⚪ Sem sinal para {symbol} após análise híbrida.")
-
-        except Exception as e:
-            print(f"🚨 Erro inesperado ao processar {symbol}: {e}")
-
-    print(f"\n📊 Resumo do ciclo híbrido:")
-    print(f"   🔍 Sinais encontrados: {signals_found}")
-    print(f"   📤 Sinais enviados: {signals_sent}")
-    print(f"   🤖 ML Status: {'ATIVO' if ml_model.is_loaded else 'AGUARDANDO ARQUIVO'}")
-    print(f"   🧠 IA Status: {'ATIVO' if ai_predictor.is_trained else 'COLETANDO DADOS'}")
+        result = analysis.get(symbol)
+        if df is None or df.empty or result is None:
+            log.debug("⚪ Sem dados para %s, pulando...", symbol, extra={"symbol": symbol})
+            continue
+        if result["df"].empty:
+            log.debug("⚠️ Não foi possível calcular indicadores para %s. Pulando...", symbol, extra={"symbol": symbol})
+            continue
+        frames[symbol] = result["df"]
+        if "ml_prediction" in result:
+            ml_predictions[symbol] = result["ml_prediction"]
+        if "ml_features" in result:
+            ml_features[symbol] = result["ml_features"]
+    log.info(f"✅ Indicadores calculados para {len(frames)} símbolos.")
+
+    # Geração de sinais em etapas: técnico -> ML -> sentimento -> IA, no lote
+    # inteiro; sentimento só é buscado para quem ainda pode gerar sinal
+    try:
+        with cycle_profiler.span("decision"):
+            signals = generate_hybrid_signals(
+                frames, get_sentiment_scores if USAR_SENTIMENTO else None, ml_predictions, ml_features
+            )
+    except Exception as e:
+        log.error(f"🚨 Erro na avaliação híbrida: {e}")
+        signals = []
+
+    for signal in signals:
+        signals_found += 1
+        with cycle_profiler.span("notify", signal["symbol"]):
+            sent = submit_signal(signal)
+        if sent:
+            signals_sent += 1
+            if first_signal_at is None:
+                first_signal_at = time.perf_counter() - cycle_start
+
+    return {
+        "found": signals_found,
+        "sent": signals_sent,
+        "time_to_first_signal": first_signal_at,
+        "total_seconds": time.perf_counter() - cycle_start
+    }
+
+# --- Modo pipeline (SCAN_MODE=pipeline): símbolos fluem entre as etapas ---
+
+def _pipeline_fetch(symbol):
+    df = fetch_historical_data_coingecko(symbol)
+    if df is None or df.empty:
+        log.debug("⚠️ Dados indisponíveis para %s. Pulando...", symbol, extra={"symbol": symbol})
+        return None
+    return symbol, df
+
+def _pipeline_analyze(item):
+    symbol, df = item
+    with cycle_profiler.span("indicators", symbol):
+        result = analysis_executor.analyze_one(df, technical_weights(), PONTUACAO_MINIMA_PARA_SINAL)
+    if result["df"].empty:
+        log.debug("⚠️ Não foi possível calcular indicadores para %s. Pulando...", symbol, extra={"symbol": symbol})
+        return None
+    return symbol, result
+
+def _pipeline_predict(item):
+    symbol, result = item
+    ml_predictions = {symbol: result["ml_prediction"]} if "ml_prediction" in result else None
+    ml_features = {symbol: result["ml_features"]} if "ml_features" in result else None
+    with cycle_profiler.span("decision", symbol):
+        signals = generate_hybrid_signals(
+            {symbol: result["df"]}, get_sentiment_scores if USAR_SENTIMENTO else None, ml_predictions, ml_features
+        )
+    return signals[0] if signals else None
+
+def _pipeline_notify(signal):
+    with cycle_profiler.span("notify", signal["symbol"]):
+        return signal if submit_signal(signal) else None
+
+# Predição e notificação com um worker cada: avaliador, coletor de dados da IA
+# e dispatcher são usados por uma thread de cada vez
+scan_pipeline = ScanPipeline([
+    PipelineStage("fetch", _pipeline_fetch, concurrency=PIPELINE_FETCH_CONCURRENCY, min_interval=1.0),
+    PipelineStage("indicators", _pipeline_analyze, concurrency=max(1, analysis_executor.workers)),
+    PipelineStage("predict", _pipeline_predict, concurrency=1),
+    PipelineStage("notify", _pipeline_notify, concurrency=1),
+], queue_size=PIPELINE_QUEUE_SIZE)
+
+def _scan_pipeline(symbols):
+    log.info(f"🚚 Pipeline: busca → indicadores → predição → notificação ({len(symbols)} símbolos)...")
+    metrics = scan_pipeline.run(symbols)
+    notify = metrics["stages"]["notify"]
+    return {
+        "found": notify["processed"],
+        "sent": notify["processed"] - notify["dropped"],
+        "time_to_first_signal": metrics["time_to_first_output"],
+        "total_seconds": metrics["total_seconds"],
+        "stages": metrics["stages"]
+    }
+
+def run_scanner():
+    log.info("--- SCANNER HÍBRIDO ML + IA INICIADO ---")
+    
+    # Imprime status do sistema
+    print_system_status()
+    
+    open_trades = open_trades_state
+    run_monitoring()
+
+    log.info("🔍 Fase 2: Buscando novos sinais com sistema híbrido...")
+    # Sinais enfileirados e ainda não entregues também bloqueiam o símbolo
+    pending_symbols = {s['symbol'] for s in notification_dispatcher.pending_contexts("signal_delivered")}
+    symbols = shard_symbols()
+    if SHARDING:
+        log.info(f"🧩 Shard {shard_coordinator.worker_id}: {len(symbols)}/{len(SYMBOLS)} símbolos")
+    all_symbols_to_fetch = list(set(symbols) - set(open_trades.keys()) - pending_symbols)
+    if not all_symbols_to_fetch:
+        log.info("⚪ Não há novas moedas para analisar, todos os trades estão abertos.")
+        return None
+
+    hybrid_evaluator.begin_cycle()
+    if SCAN_MODE == "pipeline":
+        summary = _scan_pipeline(all_symbols_to_fetch)
+    else:
+        summary = _scan_batch(all_symbols_to_fetch)
+    if summary is None:
+        return None
+
+    log.info(f"📊 Resumo do ciclo híbrido ({SCAN_MODE}):")
+    log.info(f"   🔍 Sinais encontrados: {summary['found']}")
+    log.info(f"   📤 Sinais enfileirados: {summary['sent']}")
+    if summary["time_to_first_signal"] is not None:
+        log.info(f"   ⏱️ Primeiro sinal em {summary['time_to_first_signal']:.1f}s | ciclo em {summary['total_seconds']:.1f}s")
+    else:
+        log.info(f"   ⏱️ Ciclo em {summary['total_seconds']:.1f}s")
+    for stage, stats in summary.get("stages", {}).items():
+        log.info(f"   🚰 Fila {stage}: máx {stats['queue_max_depth']} | média {stats['queue_avg_depth']:.1f} | "
+                 f"ocupado {stats['busy_seconds']:.1f}s")
+    log.info(f"   📬 Pendentes de entrega: {notification_dispatcher.pending_count()}")
+    for stage, stats in hybrid_evaluator.statistics(last_run=True).items():
+        log.info(f"   🧮 Etapa {stage}: {stats['passed']}/{stats['candidates']} aprovados | {stats['total_ms']:.1f}ms")
+    if USAR_SENTIMENTO and NEWS_API_KEY:
+        cache = sentiment_cache.metrics()
+        log.info(f"   🧠 Cache de sentimento: {cache['hits']} hits | {cache['stale_hits']} vencidos | "
+                 f"{cache['misses']} misses | idade média {cache['avg_age'] / 60:.0f} min")
+    log.info(f"   🤖 ML Status: {'ATIVO' if ml_model.is_loaded else 'AGUARDANDO ARQUIVO'}")
+    log.info(f"   🧠 IA Status: {'ATIVO' if ai_predictor.is_trained else 'COLETANDO DADOS'}")
+    return summary
+
+def _run_in_cycle(func):
+    """Executa uma fase com todas as escritas gravadas em uma única transação"""
+    sync_shard()
+    try:
+        with storage.batch():
+            try:
+                return func()
+            finally:
+                with cycle_profiler.span("persist"):
+                    open_trades_state.commit()
+                    # Move sinais concluídos para o arquivo histórico colunar
+                    archive_completed(ai_result_monitor, ai_data_collector)
+    finally:
+        # Fim da fase (já gravada): a API passa a servir o estado novo
+        status_snapshots.publish()
+
+def scan_cycle():
+    with CYCLE_SECONDS.time(phase="scan"), cycle_profiler.cycle("scan"):
+        summary = _run_in_cycle(run_scanner)
+    publish_shard_status(summary)
+    event_bus.publish("cycle_complete", {
+        "phase": "scan",
+        **{key: (summary or {}).get(key) for key in ("found", "sent", "time_to_first_signal", "total_seconds")}
+    })
+    log.info(f"--- Ciclo concluído. Próximo scan em {_next_run_text(scan_job)} ---")
+
+def monitoring_cycle():
+    log.info("--- Monitoramento intermediário ---")
+    with CYCLE_SECONDS.time(phase="monitoring"):
+        _run_in_cycle(run_monitoring)
+    event_bus.publish("cycle_complete", {"phase": "monitoring"})
+
+def _next_run_text(job):
+    return time.strftime("%H:%M:%S", time.localtime(job.next_run))
+
+# Gauges de estado: calculados só quando /metrics é coletado
+metrics.gauge("scanner_open_trades", "Trades abertos").set_function(lambda: len(open_trades_state))
+metrics.gauge("scanner_monitored_signals", "Sinais em monitoramento pela IA").set_function(
+    lambda: ai_result_monitor.store.active
+)
+metrics.gauge("scanner_notification_pending", "Notificações aguardando envio").set_function(
+    notification_dispatcher.pending_count
+)
+metrics.gauge("scanner_pipeline_queue_depth", "Itens na fila de entrada de cada etapa do pipeline",
+              ["stage"]).set_function(scan_pipeline.queue_depths)
+metrics.gauge("scanner_event_subscribers", "Clientes conectados em /events").set_function(
+    lambda: event_bus.statistics()["subscribers"]
+)
+
+# Agenda: scan completo alinhado aos candles + monitoramento leve mais frequente.
+# Ambos rodam na mesma thread, então nunca se sobrepõem. Os limites do scan também
+# são limites do monitoramento: o scan já roda run_monitoring, então o monitoramento
+# desse limite é pulado (covered_by) em vez de rodar de novo logo depois.
+scan_scheduler = CandleScheduler()
+scan_job = scan_scheduler.add_job(ScheduledJob(
+    "scan", scan_cycle, interval=SCAN_INTERVAL, settle_delay=SCAN_SETTLE_DELAY,
+    policy=SCAN_MISSED_POLICY, run_immediately=True
+))
+monitor_job = scan_scheduler.add_job(ScheduledJob(
+    "monitor", monitoring_cycle, interval=MONITOR_INTERVAL, settle_delay=SCAN_SETTLE_DELAY,
+    policy="skip", covered_by=scan_job
+))
 
 def main():
     """Função principal para execução contínua do scanner"""
-    while True:
-        try:
-            run_scanner()
-        except Exception as e:
-            print(f"🚨 ERRO CRÍTICO NO LOOP PRINCIPAL: {e}")
-        print("\n--- Ciclo concluído. Aguardando 15 minutos... ---")
-        time.sleep(900)
+    if scan_scheduler.is_running():
+        log.warning("⚠️ Loop do scanner ainda em execução (parada pendente); novo início ignorado")
+        return
+    notification_dispatcher.start()
+    if SHARDING:
+        shard_coordinator.start()
+        retain_shard()
+        log.info(f"🧩 Sharding ativo: réplica {shard_coordinator.worker_id} com "
+                 f"{len(shard_symbols())}/{len(SYMBOLS)} símbolos")
+    if TRADE_MONITOR_INTERVAL > 0:
+        trade_monitor.start()
+    decision_tracer.start()
+    log.info(f"⏰ Scan a cada {SCAN_INTERVAL:.0f}s (+{SCAN_SETTLE_DELAY:.0f}s após o fechamento do candle) | "
+             f"monitoramento a cada {MONITOR_INTERVAL:.0f}s")
+    try:
+        scan_scheduler.run_forever()
+    finally:
+        trade_monitor.stop()
+        decision_tracer.stop()
+        if SHARDING:
+            shard_coordinator.stop()
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,216 @@
+"""
+Agendador alinhado aos fechamentos de candle
+
+Substitui o `time.sleep(900)` fixo: cada tarefa dispara no limite do intervalo
+(ex.: 00:00, 00:15, 00:30... em UTC) mais um atraso de acomodação, para que a
+exchange/CoinGecko já tenha fechado o candle. O período não acumula a duração
+do ciclo, então não há deriva.
+
+Todas as tarefas rodam na mesma thread, uma de cada vez (nunca se sobrepõem).
+Quando um ciclo longo atravessa um ou mais disparos, a política da tarefa
+decide o que fazer:
+
+- "skip": descarta os disparos perdidos e espera o próximo limite;
+- "catch_up": roda uma vez imediatamente (no máximo `max_catch_up` seguidas)
+  e depois volta ao alinhamento.
+
+Uma tarefa que venceu enquanto outra rodava executa uma única vez ao final
+dela; o atraso fica registrado em `last_lag`/`max_lag`.
+
+Uma tarefa pode declarar `covered_by`: outra tarefa que já faz o trabalho dela
+(ex.: o scan roda o monitoramento). Se a outra começou depois do disparo
+devido, esse disparo não roda, conta em `covered` e não entra no atraso.
+"""
+
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+class ScheduledJob:
+    """Tarefa periódica alinhada a múltiplos de `interval` segundos (época UTC)"""
+
+    def __init__(self, name: str, func: Callable, interval: float, settle_delay: float = 0.0,
+                 policy: str = "skip", max_catch_up: int = 1, run_immediately: bool = False,
+                 covered_by: Optional["ScheduledJob"] = None):
+        if policy not in ("skip", "catch_up"):
+            raise ValueError(f"Política inválida: {policy}")
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.settle_delay = settle_delay
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self.covered_by = covered_by
+        self.next_run = time.time() if run_immediately else self.next_boundary(time.time())
+        self._catch_up_streak = 0
+        self.stats = {
+            "runs": 0, "errors": 0, "skipped": 0, "caught_up": 0, "overruns": 0, "covered": 0,
+            "last_lag": None, "max_lag": 0.0,
+            "last_duration": None, "max_duration": 0.0, "total_duration": 0.0,
+            "last_started_at": None
+        }
+
+    def next_boundary(self, after: float) -> float:
+        """Primeiro limite de candle + atraso estritamente depois de `after`"""
+        base = math.floor((after - self.settle_delay) / self.interval) * self.interval
+        return base + self.interval + self.settle_delay
+
+    def is_covered(self) -> bool:
+        """Se a tarefa que cobre esta começou depois do disparo devido"""
+        if self.covered_by is None:
+            return False
+        started_at = self.covered_by.stats["last_started_at"]
+        return started_at is not None and started_at >= self.next_run
+
+    def reschedule(self, finished_at: float):
+        """Define o próximo disparo após um ciclo, aplicando a política de atraso"""
+        scheduled = self.next_boundary(self.next_run)
+        if scheduled > finished_at:
+            self.next_run = scheduled
+            self._catch_up_streak = 0
+            return
+
+        missed = int((finished_at - scheduled) // self.interval) + 1
+        self.stats["overruns"] += 1
+        if self.policy == "catch_up" and self._catch_up_streak < self.max_catch_up:
+            # Roda de novo já, mas só uma vez: os demais disparos perdidos são descartados
+            self._catch_up_streak += 1
+            self.stats["caught_up"] += 1
+            self.stats["skipped"] += missed - 1
+            self.next_run = finished_at
+        else:
+            self._catch_up_streak = 0
+            self.stats["skipped"] += missed
+            self.next_run = self.next_boundary(finished_at)
+
+class CandleScheduler:
+    """
+    Executa as tarefas registradas em uma única thread, em ordem de disparo
+    """
+
+    def __init__(self):
+        self.jobs: List[ScheduledJob] = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        # Uma única thread de loop por agendador: sem ela, dois loops rodariam as mesmas tarefas
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.current_job: Optional[str] = None
+
+    def add_job(self, job: ScheduledJob) -> ScheduledJob:
+        with self._lock:
+            self.jobs.append(job)
+        return job
+
+    def start(self) -> bool:
+        """Inicia o loop em thread própria; False se o loop anterior ainda não terminou"""
+        with self._start_lock:
+            if self.is_running():
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="candle-scheduler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        """Pede a parada; a tarefa em execução termina antes de o loop sair (ver join)"""
+        self._stop.set()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Espera o loop sair; True se ele já terminou"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return not self.is_running()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def is_stopping(self) -> bool:
+        """Parada pedida, mas o loop ainda está terminando a tarefa atual"""
+        return self._stop.is_set() and self.is_running()
+
+    def _run_job(self, job: ScheduledJob):
+        if job.is_covered():
+            # Trabalho já feito pela outra tarefa: vai para o próximo limite sem rodar
+            with self._lock:
+                job.stats["covered"] += 1
+                job.next_run = job.next_boundary(time.time())
+            return
+        started_at = time.time()
+        lag = started_at - job.next_run
+        self.current_job = job.name
+        try:
+            job.func()
+        except Exception as e:
+            job.stats["errors"] += 1
+            print(f"[SCHEDULER] 🚨 Erro na tarefa '{job.name}': {e}")
+        finally:
+            self.current_job = None
+        finished_at = time.time()
+        duration = finished_at - started_at
+
+        with self._lock:
+            stats = job.stats
+            stats["runs"] += 1
+            stats["last_lag"] = lag
+            stats["max_lag"] = max(stats["max_lag"], lag)
+            stats["last_duration"] = duration
+            stats["max_duration"] = max(stats["max_duration"], duration)
+            stats["total_duration"] += duration
+            stats["last_started_at"] = started_at
+            job.reschedule(finished_at)
+
+    def run_forever(self) -> bool:
+        """
+        Inicia o loop e bloqueia até ele sair (stop)
+
+        Returns:
+            bool: False se outro loop deste agendador ainda está rodando
+        """
+        if not self.start():
+            return False
+        while not self.join(timeout=1.0):
+            pass
+        return True
+
+    def _loop(self):
+        """Loop principal: dorme até o próximo disparo e executa a tarefa devida"""
+        while not self._stop.is_set():
+            with self._lock:
+                if not self.jobs:
+                    return
+                # Empate no mesmo instante: a tarefa registrada primeiro vence
+                job = min(self.jobs, key=lambda j: j.next_run)
+            wait = job.next_run - time.time()
+            if wait > 0:
+                self._stop.wait(wait)
+                continue
+            self._run_job(job)
+
+    def statistics(self) -> Dict[str, Dict]:
+        """Atraso de disparo (lag) e duração por tarefa, em segundos"""
+        with self._lock:
+            result = {}
+            for job in self.jobs:
+                stats = job.stats
+                result[job.name] = {
+                    "interval": job.interval,
+                    "settle_delay": job.settle_delay,
+                    "policy": job.policy,
+                    "running": self.current_job == job.name,
+                    "next_run": job.next_run,
+                    "runs": stats["runs"],
+                    "errors": stats["errors"],
+                    "skipped": stats["skipped"],
+                    "caught_up": stats["caught_up"],
+                    "overruns": stats["overruns"],
+                    "covered": stats["covered"],
+                    "last_lag": round(stats["last_lag"], 3) if stats["last_lag"] is not None else None,
+                    "max_lag": round(stats["max_lag"], 3),
+                    "last_duration": round(stats["last_duration"], 3) if stats["last_duration"] is not None else None,
+                    "avg_duration": round(stats["total_duration"] / stats["runs"], 3) if stats["runs"] else None,
+                    "max_duration": round(stats["max_duration"], 3)
+                }
+            return result
@@ -0,0 +1,158 @@
+"""
+Cache de sentimento com TTL, persistência em disco e stale-while-revalidate
+
+- Entrada dentro do TTL: devolvida direto (hit).
+- Entrada vencida: o valor antigo é devolvido na hora e uma thread em segundo
+  plano busca o novo (stale), então o scanner não espera a NewsAPI.
+- Sem entrada: busca síncrona (miss) — só acontece na primeira vez de cada
+  símbolo, já que o cache sobrevive a reinícios.
+
+Falhas na busca mantêm o último valor; sem valor anterior, grava 0 com um TTL
+curto para não repetir a chamada a cada ciclo.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+from metrics import metrics
+
+SENTIMENT_CACHE_FILE = os.getenv("SENTIMENT_CACHE_FILE", "sentiment_cache.json")
+SENTIMENT_TTL = float(os.getenv("SENTIMENT_TTL", "3600"))
+
+CACHE_REQUESTS = metrics.counter("scanner_cache_requests_total", "Consultas aos caches (hit, stale, miss)", ["cache", "result"])
+
+class SentimentCache:
+    """
+    Scores por símbolo: {"score": float, "fetched_at": epoch, "ttl": segundos}
+
+    fetch_func recebe uma lista de símbolos e devolve {symbol: score}.
+    """
+
+    def __init__(self, fetch_func: Callable[[List[str]], Dict[str, float]], cache_file: str = SENTIMENT_CACHE_FILE,
+                 ttl: float = SENTIMENT_TTL, error_ttl: float = 300.0, workers: int = 2):
+        self.fetch_func = fetch_func
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sentiment")
+        self.entries: Dict[str, Dict] = self._load()
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "errors": 0}
+        self._served_ages = []
+
+    # --- Persistência ---
+    def _load(self) -> Dict[str, Dict]:
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"[SENTIMENT] ⚠️ Cache ilegível, ignorado: {e}")
+        return {}
+
+    def _save(self):
+        """Escrita atômica (chamar com o lock adquirido)"""
+        tmp_path = f"{self.cache_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f, separators=(',', ':'))
+        os.replace(tmp_path, self.cache_file)
+
+    # --- Busca ---
+    def _fetch(self, symbols: List[str]) -> Dict[str, float]:
+        """Busca em lote; símbolos ausentes do resultado contam como falha"""
+        try:
+            return {symbol: float(score) for symbol, score in self.fetch_func(symbols).items()}
+        except Exception as e:
+            print(f"⚠️ Erro ao buscar sentimento para {symbols}: {e}")
+            return {}
+
+    def _store(self, symbols: List[str], scores: Dict[str, float]):
+        now = time.time()
+        with self._lock:
+            for symbol in symbols:
+                score = scores.get(symbol)
+                if score is not None:
+                    self.entries[symbol] = {"score": score, "fetched_at": now, "ttl": self.ttl}
+                    continue
+                self.stats["errors"] += 1
+                previous = self.entries.get(symbol)
+                if previous is None:
+                    self.entries[symbol] = {"score": 0.0, "fetched_at": now, "ttl": self.error_ttl}
+                else:
+                    # Mantém o último valor e tenta de novo após o TTL de erro
+                    previous["fetched_at"] = now - previous["ttl"] + self.error_ttl
+            self._save()
+
+    def _refresh(self, symbols: List[str]):
+        try:
+            self._store(symbols, self._fetch(symbols))
+            with self._lock:
+                self.stats["refreshes"] += len(symbols)
+        finally:
+            with self._lock:
+                self._refreshing.difference_update(symbols)
+
+    def get_many(self, symbols: List[str]) -> Dict[str, float]:
+        """
+        Scores de vários símbolos de uma vez
+
+        Vencidos são servidos com o valor antigo e atualizados juntos em segundo
+        plano; os que nunca foram buscados são buscados agora, em um único lote.
+        """
+        now = time.time()
+        scores = {}
+        stale, missing = [], []
+        served = {"hit": 0, "stale": 0, "miss": 0}
+        with self._lock:
+            for symbol in symbols:
+                entry = self.entries.get(symbol)
+                if entry is None:
+                    self.stats["misses"] += 1
+                    served["miss"] += 1
+                    missing.append(symbol)
+                    continue
+                age = now - entry["fetched_at"]
+                self._served_ages.append(age)
+                if age <= entry["ttl"]:
+                    self.stats["hits"] += 1
+                    served["hit"] += 1
+                else:
+                    self.stats["stale_hits"] += 1
+                    served["stale"] += 1
+                    if symbol not in self._refreshing:
+                        self._refreshing.add(symbol)
+                        stale.append(symbol)
+                scores[symbol] = entry["score"]
+        for result, count in served.items():
+            if count:
+                CACHE_REQUESTS.inc(count, cache="sentiment", result=result)
+        if stale:
+            self._executor.submit(self._refresh, stale)
+
+        if missing:
+            self._store(missing, self._fetch(missing))
+            with self._lock:
+                scores.update({symbol: self.entries[symbol]["score"] for symbol in missing})
+        return scores
+
+    def get(self, symbol: str) -> float:
+        """Score de um símbolo (ver get_many)"""
+        return self.get_many([symbol])[symbol]
+
+    def metrics(self, reset_ages: bool = True) -> Dict:
+        """Contadores + idade média/máxima (s) dos valores servidos desde a última leitura"""
+        with self._lock:
+            ages = self._served_ages
+            if reset_ages:
+                self._served_ages = []
+            return dict(
+                self.stats,
+                entries=len(self.entries),
+                refreshing=len(self._refreshing),
+                avg_age=round(sum(ages) / len(ages), 1) if ages else 0.0,
+                max_age=round(max(ages), 1) if ages else 0.0
+            )
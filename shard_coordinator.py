@@ -0,0 +1,296 @@
+"""
+Coordenação de shards entre várias réplicas do scanner
+
+O universo de símbolos é dividido em SHARD_PARTITIONS partições fixas (hash
+estável do símbolo). Cada réplica registra um heartbeat em um banco SQLite
+compartilhado e mantém leases das partições que processa:
+
+- a cada heartbeat o worker renova seus leases e calcula sua cota justa
+  (partições / workers vivos, arredondado para cima);
+- acima da cota, marca as partições excedentes para liberação; elas continuam
+  renovadas até o limite do ciclo (release_pending), quando o estado dos
+  símbolos sai da memória e o lease é apagado (um worker novo as assume no
+  heartbeat seguinte), para nunca mudar de dono no meio de um ciclo;
+- abaixo da cota, assume partições livres ou com lease vencido;
+- um worker sem heartbeat por mais de SHARD_LEASE_TTL é removido e suas
+  partições voltam a ficar livres.
+
+Se o próprio worker não consegue renovar dentro do TTL (banco travado, processo
+pausado), ele para de se considerar dono de qualquer partição, para nunca haver
+dois donos do mesmo símbolo. O estado publicado por cada worker fica na tabela
+de workers e é agregado pela API (cluster_status).
+"""
+
+import json
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+SHARD_DB_PATH = os.getenv("SHARD_DB_PATH", "shards.db")
+SHARD_PARTITIONS = int(os.getenv("SHARD_PARTITIONS", "16"))
+SHARD_HEARTBEAT = float(os.getenv("SHARD_HEARTBEAT", "10"))
+SHARD_LEASE_TTL = float(os.getenv("SHARD_LEASE_TTL", "30"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shard_workers (
+    worker_id TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL,
+    status TEXT
+);
+
+CREATE TABLE IF NOT EXISTS shard_leases (
+    partition_id INTEGER PRIMARY KEY,
+    worker_id TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_shard_leases_worker ON shard_leases (worker_id);
+"""
+
+def partition_of(symbol: str, partitions: int = SHARD_PARTITIONS) -> int:
+    """Partição do símbolo (crc32: estável entre processos, ao contrário de hash())"""
+    return zlib.crc32(symbol.encode()) % partitions
+
+class ShardCoordinator:
+    """
+    Leases de partições de símbolos com heartbeat em SQLite
+    """
+
+    def __init__(self, db_path: str = SHARD_DB_PATH, partitions: int = SHARD_PARTITIONS,
+                 worker_id: Optional[str] = None, heartbeat_interval: float = SHARD_HEARTBEAT,
+                 lease_ttl: float = SHARD_LEASE_TTL):
+        self.db_path = db_path
+        self.partitions = partitions
+        self.worker_id = worker_id or os.getenv("SHARD_WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+        self.heartbeat_interval = heartbeat_interval
+        self.lease_ttl = lease_ttl
+        self.started_at = time.time()
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._owned: Set[int] = set()
+        self._acquired: Set[int] = set()
+        self._releasing: Set[int] = set()
+        # Heartbeat e liberação não se intercalam (a liberação apaga leases que
+        # o heartbeat leria de volta como próprios)
+        self._membership = threading.Lock()
+        self._valid_until = 0.0
+        self._status: Dict = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"heartbeats": 0, "errors": 0, "acquired": 0, "released": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def heartbeat(self, now: Optional[float] = None) -> Set[int]:
+        """Renova o worker e seus leases, rebalanceia e retorna as partições próprias"""
+        with self._membership:
+            return self._heartbeat(now or time.time())
+
+    def _heartbeat(self, now: float) -> Set[int]:
+        conn = self._connection()
+        with self._lock:
+            status = json.dumps(self._status, default=str)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO shard_workers (worker_id, started_at, heartbeat_at, status) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(worker_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at, status = excluded.status",
+                (self.worker_id, self.started_at, now, status)
+            )
+            # Workers mortos saem; leases vencidos voltam a ficar livres
+            conn.execute("DELETE FROM shard_workers WHERE heartbeat_at < ?", (now - self.lease_ttl,))
+            conn.execute("DELETE FROM shard_leases WHERE expires_at < ?", (now,))
+
+            live = conn.execute("SELECT COUNT(*) FROM shard_workers").fetchone()[0]
+            fair_share = math.ceil(self.partitions / max(1, live))
+
+            conn.execute("UPDATE shard_leases SET expires_at = ? WHERE worker_id = ?",
+                         (now + self.lease_ttl, self.worker_id))
+            owned = [row[0] for row in conn.execute(
+                "SELECT partition_id FROM shard_leases WHERE worker_id = ? ORDER BY partition_id", (self.worker_id,)
+            )]
+
+            # Excedentes continuam renovados até release_pending (limite do ciclo)
+            releasing = owned[fair_share:]
+            claimed = []
+            if len(owned) < fair_share:
+                taken = {row[0] for row in conn.execute("SELECT partition_id FROM shard_leases")}
+                claimed = [p for p in range(self.partitions) if p not in taken][:fair_share - len(owned)]
+                conn.executemany("INSERT INTO shard_leases (partition_id, worker_id, expires_at) VALUES (?, ?, ?)",
+                                 [(p, self.worker_id, now + self.lease_ttl) for p in claimed])
+                owned += claimed
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        with self._lock:
+            gained = set(owned) - self._owned
+            self._acquired |= gained
+            self._owned = set(owned)
+            self._releasing = set(releasing)
+            self._valid_until = now + self.lease_ttl
+            self.stats["heartbeats"] += 1
+            self.stats["acquired"] += len(gained)
+        if claimed:
+            print(f"[SHARD] 🧩 {self.worker_id}: {len(owned)}/{self.partitions} partições "
+                  f"(+{len(claimed)}, {live} workers)")
+        return set(owned)
+
+    def release_pending(self, symbols: Iterable[str], forget: Callable[[List[str]], None]) -> List[str]:
+        """
+        Libera as partições acima da cota; chamar no limite do ciclo
+
+        As partições deixam de ser próprias (owns/filter) antes de `forget`
+        receber os símbolos delas para tirar o estado da memória; só depois o
+        lease é apagado e outra réplica pode assumi-las.
+
+        Returns:
+            List[str]: símbolos liberados
+        """
+        with self._membership:
+            with self._lock:
+                releasing = self._releasing & self._owned
+                if not releasing:
+                    return []
+                self._owned -= releasing
+                self._acquired -= releasing
+                self._releasing = set()
+            released = [s for s in symbols if partition_of(s, self.partitions) in releasing]
+            forget(released)
+
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("DELETE FROM shard_leases WHERE partition_id = ? AND worker_id = ?",
+                                 [(p, self.worker_id) for p in sorted(releasing)])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            with self._lock:
+                self.stats["released"] += len(releasing)
+                owned = len(self._owned)
+        print(f"[SHARD] 🧩 {self.worker_id}: {owned}/{self.partitions} partições (-{len(releasing)})")
+        return released
+
+    def _loop(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"[SHARD] ⚠️ Falha no heartbeat de {self.worker_id}: {e}")
+
+    def start(self):
+        """Primeiro heartbeat síncrono (o ciclo inicial já tem partições) e thread de renovação"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.heartbeat()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="shard-heartbeat", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Encerra o heartbeat e libera os leases para os outros workers"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.heartbeat_interval)
+            self._thread = None
+        with self._lock:
+            self._owned = set()
+            self._valid_until = 0.0
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM shard_leases WHERE worker_id = ?", (self.worker_id,))
+            conn.execute("DELETE FROM shard_workers WHERE worker_id = ?", (self.worker_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def owned_partitions(self) -> Set[int]:
+        """Partições próprias; vazio se o lease não foi renovado dentro do TTL"""
+        with self._lock:
+            if time.time() > self._valid_until:
+                return set()
+            return set(self._owned)
+
+    def owns(self, symbol: str) -> bool:
+        return partition_of(symbol, self.partitions) in self.owned_partitions()
+
+    def filter(self, symbols: Iterable[str]) -> List[str]:
+        """Símbolos do universo que pertencem a este worker"""
+        owned = self.owned_partitions()
+        return [s for s in symbols if partition_of(s, self.partitions) in owned]
+
+    def take_acquired(self, symbols: Iterable[str]) -> List[str]:
+        """Símbolos das partições assumidas desde a última chamada (estado a recarregar)"""
+        with self._lock:
+            acquired, self._acquired = self._acquired & self._owned, set()
+        return [s for s in symbols if partition_of(s, self.partitions) in acquired]
+
+    def publish(self, status: Dict):
+        """Estado do worker exibido pela API; gravado no próximo heartbeat"""
+        with self._lock:
+            self._status = dict(status)
+
+    def cluster_status(self, now: Optional[float] = None) -> Dict:
+        """Workers vivos, partições de cada um e a soma dos campos numéricos publicados"""
+        now = now or time.time()
+        conn = self._connection()
+        leases: Dict[str, List[int]] = {}
+        for row in conn.execute("SELECT partition_id, worker_id FROM shard_leases WHERE expires_at >= ? "
+                                "ORDER BY partition_id", (now,)):
+            leases.setdefault(row["worker_id"], []).append(row["partition_id"])
+
+        workers, totals = [], {}
+        for row in conn.execute("SELECT * FROM shard_workers ORDER BY worker_id"):
+            status = json.loads(row["status"]) if row["status"] else {}
+            alive = now - row["heartbeat_at"] <= self.lease_ttl
+            workers.append({
+                "worker_id": row["worker_id"],
+                "alive": alive,
+                "heartbeat_age": round(now - row["heartbeat_at"], 1),
+                "uptime": round(now - row["started_at"]),
+                "partitions": leases.get(row["worker_id"], []),
+                "status": status
+            })
+            if alive:
+                for key, value in status.items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        totals[key] = totals.get(key, 0) + value
+
+        assigned = sum(len(p) for p in leases.values())
+        return {
+            "worker_id": self.worker_id,
+            "partitions": self.partitions,
+            "assigned": assigned,
+            "unassigned": self.partitions - assigned,
+            "workers": workers,
+            "totals": totals
+        }
+
+    def statistics(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, owned=sorted(self._owned), releasing=sorted(self._releasing),
+                        worker_id=self.worker_id)
+
+
+# Instância global
+shard_coordinator = ShardCoordinator()
@@ -4,6 +4,10 @@ import uuid
 from ml_model_loader import ml_model
 from ai_predictor import ai_predictor
 from ai_data_collector import ai_data_collector
+from staged_evaluator import Stage, StagedEvaluator
+from decision_trace import decision_tracer, NULL_TRACE
+from metrics import metrics
+from structured_log import get_logger
 
 PONTUACAO_MINIMA_PARA_SINAL = 70
 
@@ -12,67 +16,140 @@ PESO_VOLUME = 30
 PESO_MACD = 25
 PESO_RSI = 10
 
-def generate_hybrid_signal(df_with_indicators, symbol, sentiment_score=0.0):
-    """
-    Gera sinal usando sistema híbrido:
-    1. Análise técnica tradicional
-    2. Modelo ML treinado com 2 anos de dados (PRINCIPAL)
-    3. Sistema de IA adaptativo (SECUNDÁRIO)
-    """
-    if df_with_indicators.empty:
-        return None
+SENTIMENTO_MINIMO = -0.3
+
+# Alvo e stop sobre o preço de entrada
+ALVO_PERCENTUAL = 0.04
+STOP_PERCENTUAL = 0.02
+
+ML_APROVA = ["STRONG_BUY", "BUY", "WEAK_BUY"]
+
+# Colunas do último candle gravadas no rastro da decisão
+INDICADORES_RASTRO = ["close", "sma_50", "volume", "volume_sma_20", "macd_diff", "rsi"]
+
+PREDICTION_SECONDS = metrics.histogram("scanner_prediction_seconds", "Tempo de predição por símbolo", ["model"])
+SENTIMENT_SECONDS = metrics.histogram("scanner_sentiment_seconds", "Tempo da etapa de sentimento (lote de candidatos)")
+
+log = get_logger(__name__)
+
+def technical_weights():
+    """Pesos atuais da pontuação técnica (para technical_indicators.technical_score)"""
+    return {"sma": PESO_SMA, "volume": PESO_VOLUME, "macd": PESO_MACD, "rsi": PESO_RSI}
+
+# --- Etapas da decisão híbrida (ordenadas por custo pelo StagedEvaluator) ---
+
+def _stage_technical(candidates, context):
+    """ETAPA 1: Análise técnica tradicional (filtro inicial), vetorizada no lote"""
+    latest = pd.DataFrame([c["df"].iloc[-1] for c in candidates])
+    scores = (
+        (latest["close"] > latest["sma_50"]).to_numpy() * PESO_SMA
+        + (latest["volume"] > latest["volume_sma_20"]).to_numpy() * PESO_VOLUME
+        + (latest["macd_diff"] > 0).to_numpy() * PESO_MACD
+        + (latest["rsi"] < 70).to_numpy() * PESO_RSI
+    )
+
+    survivors = []
+    indicators = None
+    for i, candidate in enumerate(candidates):
+        candidate["latest"] = latest.iloc[i]
+        candidate["confidence_score"] = int(scores[i])
+        trace = candidate.get("trace", NULL_TRACE)
+        if trace:
+            if indicators is None:
+                indicators = latest[INDICADORES_RASTRO].to_numpy(dtype=float)
+            trace.annotate(score=int(scores[i]), indicators=dict(zip(INDICADORES_RASTRO, indicators[i].tolist())))
+        # Verifica se passa no filtro técnico básico
+        if scores[i] >= PONTUACAO_MINIMA_PARA_SINAL:
+            survivors.append(candidate)
+    return survivors
+
+def _stage_ml(candidate, context):
+    """ETAPA 2: Modelo ML com 2 anos de dados (PRINCIPAL)"""
+    # Predição já feita pelo pool de análise (analysis_pool), quando disponível
+    prediction = candidate.get("ml_prediction")
+    features = candidate.get("ml_features")
+    source = "pool"
+    if prediction is None:
+        with PREDICTION_SECONDS.time(model="ml"):
+            probability, recommendation, details = ml_model.predict_signal_quality(candidate["df"])
+        prediction, features, source = (probability, recommendation), details.get("features"), "local"
+    ml_probability, ml_recommendation = prediction
+    candidate["ml_probability"] = ml_probability
+    candidate["ml_recommendation"] = ml_recommendation
+    trace = candidate.get("trace", NULL_TRACE)
+    if trace:
+        trace.annotate(probability=float(ml_probability), recommendation=ml_recommendation,
+                       model_loaded=ml_model.is_loaded, source=source, features=features)
+    # Com o ML carregado, qualquer recomendação fora de ML_APROVA termina em SKIP,
+    # independentemente da IA
+    return not ml_model.is_loaded or ml_recommendation in ML_APROVA
+
+def _stage_sentiment(candidates, context):
+    """Sentimento (rede/cache) em lote, só para quem passou nos filtros anteriores"""
+    sentiment_func = context.get("sentiment_func")
+    if sentiment_func is None:
+        for candidate in candidates:
+            candidate["sentiment_score"] = context.get("sentiment_score", 0.0)
+        return candidates
+
+    with SENTIMENT_SECONDS.time():
+        scores = sentiment_func([c["symbol"] for c in candidates])
+    survivors = []
+    for candidate in candidates:
+        symbol = candidate["symbol"]
+        candidate["sentiment_score"] = sentiment_score = scores.get(symbol, 0.0)
+        candidate.get("trace", NULL_TRACE).annotate(score=float(sentiment_score))
+        log.debug("🧠 Sentimento para %s: %.2f", symbol, sentiment_score, extra={"symbol": symbol})
+        if sentiment_score < SENTIMENTO_MINIMO:
+            log.debug("⚪ Sentimento muito negativo (%.2f) para %s. Pulando...", sentiment_score, symbol,
+                      extra={"symbol": symbol})
+            continue
+        survivors.append(candidate)
+    return survivors
+
+def _stage_ai(candidate, context):
+    """ETAPA 3 + 4: Sistema de IA adaptativo (SECUNDÁRIO) e decisão híbrida"""
+    symbol = candidate["symbol"]
+    df_with_indicators = candidate["df"]
+    latest = candidate["latest"]
+    confidence_score = candidate["confidence_score"]
+    sentiment_score = candidate["sentiment_score"]
+    ml_probability = candidate["ml_probability"]
+    ml_recommendation = candidate["ml_recommendation"]
 
-    latest = df_with_indicators.iloc[-1]
-    
-    # ETAPA 1: Análise técnica tradicional (filtro inicial)
-    confidence_score = 0
-    
-    if latest["close"] > latest["sma_50"]:
-        confidence_score += PESO_SMA
-        
-    if latest["volume"] > latest["volume_sma_20"]:
-        confidence_score += PESO_VOLUME
-        
-    if latest["macd_diff"] > 0:
-        confidence_score += PESO_MACD
-        
-    if latest["rsi"] < 70:
-        confidence_score += PESO_RSI
-
-    # Verifica se passa no filtro técnico básico
-    if confidence_score < PONTUACAO_MINIMA_PARA_SINAL:
-        return None
-    
-    # ETAPA 2: Modelo ML com 2 anos de dados (PRINCIPAL)
-    ml_probability, ml_recommendation, ml_details = ml_model.predict_signal_quality(df_with_indicators)
-    
-    # ETAPA 3: Sistema de IA adaptativo (SECUNDÁRIO)
     signal_dict = {
         "id": str(uuid.uuid4()),
         "signal_type": "BUY",
         "symbol": symbol,
         "entry_price": f"{latest['close']:.4f}",
-        "target_price": f"{latest['close'] * 1.04:.4f}",
-        "stop_loss": f"{latest['close'] * 0.98:.4f}",
-        "risk_reward": "1:2.0",
+        "target_price": f"{latest['close'] * (1 + ALVO_PERCENTUAL):.4f}",
+        "stop_loss": f"{latest['close'] * (1 - STOP_PERCENTUAL):.4f}",
+        "risk_reward": f"1:{ALVO_PERCENTUAL / STOP_PERCENTUAL:.1f}",
         "confidence_score": f"{confidence_score}",
         "strategy": "Hybrid ML + IA",
         "created_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     }
     
-    ai_probability, ai_recommendation = ai_predictor.predict_signal_quality(
-        df_with_indicators, signal_dict, sentiment_score
-    )
+    trace = candidate.get("trace", NULL_TRACE)
+    with PREDICTION_SECONDS.time(model="ia"), trace.span("ia_model", trained=ai_predictor.is_trained) as span:
+        ai_probability, ai_recommendation = ai_predictor.predict_signal_quality(
+            df_with_indicators, signal_dict, sentiment_score
+        )
+        if trace:
+            span.attrs.update(probability=float(ai_probability), recommendation=ai_recommendation,
+                              sentiment=float(sentiment_score), confidence_score=confidence_score)
     
     # ETAPA 4: Decisão híbrida
-    print(f"[HYBRID] {symbol} - Análise completa:")
-    print(f"   📊 Técnico: {confidence_score}%")
-    print(f"   🤖 ML (2 anos): {ml_probability:.2%} | {ml_recommendation}")
-    print(f"   🧠 IA Adaptativa: {ai_probability:.2%} | {ai_recommendation}")
+    log.debug(
+        "[HYBRID] %s - Análise completa: 📊 Técnico: %s%% | 🤖 ML (2 anos): %.2f%% %s | 🧠 IA Adaptativa: %.2f%% %s",
+        symbol, confidence_score, ml_probability * 100, ml_recommendation, ai_probability * 100, ai_recommendation,
+        extra={"symbol": symbol}
+    )
     
     # Lógica de decisão híbrida
     final_decision = "SKIP"
     strategy_used = "Hybrid ML + IA"
+    branch = "skip"
     
     if ml_model.is_loaded:
         # Se modelo ML está carregado, ele tem prioridade
@@ -80,24 +157,29 @@ def generate_hybrid_signal(df_with_indicators, symbol, sentiment_score=0.0):
             if ai_recommendation != "SKIP":
                 final_decision = "SEND"
                 strategy_used = f"ML Primary ({ml_recommendation}) + IA ({ai_recommendation})"
+                branch = "ml_primary"
             elif ml_recommendation == "STRONG_BUY":
                 # ML muito confiante, envia mesmo se IA diz skip
                 final_decision = "SEND"
                 strategy_used = f"ML Override ({ml_recommendation})"
+                branch = "ml_override"
         elif ml_recommendation == "WEAK_BUY":
             # ML incerto, deixa IA decidir
             if ai_recommendation in ["SEND", "SEND_WITH_CAUTION"]:
                 final_decision = "SEND"
                 strategy_used = f"IA Decision ({ai_recommendation})"
+                branch = "ia_decision"
     else:
         # Fallback para IA se ML não está disponível
         if ai_recommendation in ["SEND", "SEND_WITH_CAUTION"]:
             final_decision = "SEND"
             strategy_used = f"IA Fallback ({ai_recommendation})"
+            branch = "ia_fallback"
+    trace.annotate(decision=final_decision, branch=branch, strategy=strategy_used)
     
     if final_decision == "SKIP":
-        print(f"[HYBRID] ❌ Sinal de {symbol} rejeitado pelo sistema híbrido")
-        return None
+        log.debug("[HYBRID] ❌ Sinal de %s rejeitado pelo sistema híbrido", symbol, extra={"symbol": symbol})
+        return False
     
     # Atualiza informações do sinal
     signal_dict.update({
@@ -121,12 +203,51 @@ def generate_hybrid_signal(df_with_indicators, symbol, sentiment_score=0.0):
     
     ai_data_collector.add_signal_data(signal_dict, market_features, sentiment_score)
     
-    print(f"[HYBRID] ✅ Sinal aprovado para {symbol} - Estratégia: {strategy_used}")
+    log.info(f"[HYBRID] ✅ Sinal aprovado para {symbol} - Estratégia: {strategy_used}", extra={"symbol": symbol})
     
-    return signal_dict
+    candidate["signal"] = signal_dict
+    return True
+
+# Instância global (custos relativos: CPU local < modelos < rede)
+hybrid_evaluator = StagedEvaluator([
+    Stage("technical", cost=1, func=_stage_technical),
+    Stage("ml", cost=10, func=_stage_ml, per_candidate=True),
+    Stage("ai", cost=20, func=_stage_ai, requires=("sentiment",), per_candidate=True),
+    Stage("sentiment", cost=100, func=_stage_sentiment),
+], tracer=decision_tracer)
+
+def generate_hybrid_signals(frames, sentiment_func=None, ml_predictions=None, ml_features=None):
+    """
+    Gera sinais para um lote de símbolos usando sistema híbrido em etapas:
+    1. Análise técnica tradicional
+    2. Modelo ML treinado com 2 anos de dados (PRINCIPAL)
+    3. Sentimento das notícias (só para quem ainda pode gerar sinal)
+    4. Sistema de IA adaptativo (SECUNDÁRIO) + decisão híbrida
+
+    Args:
+        frames: {symbol: DataFrame com indicadores}
+        sentiment_func: função em lote symbols -> {symbol: score} (None = sem sentimento)
+        ml_predictions: {symbol: (probabilidade, recomendação)} já calculadas
+        ml_features: {symbol: {feature: valor}} usadas nessas predições (rastro da decisão)
+    """
+    ml_predictions = ml_predictions or {}
+    ml_features = ml_features or {}
+    candidates = [
+        {"symbol": symbol, "df": df, "ml_prediction": ml_predictions.get(symbol),
+         "ml_features": ml_features.get(symbol)}
+        for symbol, df in frames.items()
+        if df is not None and not df.empty
+    ]
+    approved = hybrid_evaluator.run(candidates, {"sentiment_func": sentiment_func})
+    return [candidate["signal"] for candidate in approved]
+
+def generate_hybrid_signal(df_with_indicators, symbol, sentiment_score=0.0):
+    """Gera sinal para um único símbolo (sentimento já conhecido)"""
+    candidates = [{"symbol": symbol, "df": df_with_indicators}] if not df_with_indicators.empty else []
+    approved = hybrid_evaluator.run(candidates, {"sentiment_score": sentiment_score})
+    return approved[0]["signal"] if approved else None
 
 # Função de compatibilidade
 def generate_signal(df_with_indicators, symbol):
     """Função de compatibilidade - usa sistema híbrido"""
     return generate_hybrid_signal(df_with_indicators, symbol, sentiment_score=0.0)
-
@@ -0,0 +1,422 @@
+"""
+Consulta paginada do histórico de sinais (armazenamento quente + arquivo)
+
+Os sinais vêm de duas fontes: as entradas do AIResultMonitor ainda no
+armazenamento quente (em monitoramento ou concluídas e não arquivadas) e as
+partições mensais de outcomes do history_archive. Nenhuma consulta varre o
+histórico inteiro:
+
+- listagem: ordem decrescente por (created_at, signal_id) com cursor opaco; os
+  meses são percorridos do mais novo para o mais antigo e a leitura para
+  assim que a página enche (o intervalo de datas poda meses pelo manifest);
+- partições lidas ficam em um LRU pequeno (SIGNALS_INDEX_CACHE), já ordenadas;
+- estatísticas: contagens por (símbolo, estratégia, resultado) calculadas uma
+  vez por partição e reaproveitadas até o arquivo mudar;
+- busca por ID: um índice global com o hash de 8 bytes de cada signal_id
+  arquivado e o mês da partição dele (arrays ordenados pelo hash), então só a
+  partição certa é aberta. O índice é montado lendo apenas a coluna signal_id
+  de cada partição e, depois, só as partições regravadas são relidas.
+
+A memória fica limitada ao LRU de partições mais ~12 bytes por sinal arquivado.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from history_archive import history_archive, HistoryArchive
+from storage import OUTCOME_COLUMNS, SIGNAL_COLUMNS
+
+SIGNALS_PAGE_SIZE = int(os.getenv("SIGNALS_PAGE_SIZE", "50"))
+SIGNALS_MAX_PAGE_SIZE = 500
+SIGNALS_INDEX_CACHE = int(os.getenv("SIGNALS_INDEX_CACHE", "6"))
+
+RESULTS = ("success", "failure", "open")
+
+def _id_hash(signal_ids) -> np.ndarray:
+    """Hash estável de 8 bytes de cada signal_id (índice de busca por ID)"""
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(str(s).encode(), digest_size=8).digest(), "little") for s in signal_ids],
+        dtype=np.uint64
+    )
+
+def encode_cursor(created_at: str, signal_id: str) -> str:
+    raw = json.dumps([created_at, signal_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """(created_at, signal_id) do cursor; ValueError se inválido"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, signal_id = json.loads(raw)
+        return str(created_at), str(signal_id)
+    except Exception:
+        raise ValueError("cursor inválido")
+
+def _until_bound(until: Optional[str]) -> Optional[str]:
+    """Data sem hora inclui o dia inteiro"""
+    if until and len(until) == 10:
+        return f"{until} 23:59:59"
+    return until
+
+def _result_key(df: pd.DataFrame) -> pd.Series:
+    """success, failure ou open (sem resultado ainda)"""
+    return df["result"].where(df["result"].isin(["success", "failure"]), "open")
+
+def _to_record(row: Dict) -> Dict:
+    """Linha do DataFrame (texto vazio/NaN do arquivo) para o formato das entradas"""
+    record = {}
+    for key, value in row.items():
+        if value == "" or (isinstance(value, float) and np.isnan(value)):
+            value = None
+        elif isinstance(value, np.generic):
+            value = value.item()
+        record[key] = value
+    if record.get("days_to_result") is not None:
+        record["days_to_result"] = int(record["days_to_result"])
+    return record
+
+def _win_rate(counts: Dict) -> Optional[float]:
+    decided = counts["success"] + counts["failure"]
+    return round(counts["success"] / decided * 100, 2) if decided else None
+
+class SignalHistory:
+    """
+    Índices sobre os sinais do armazenamento quente e das partições do arquivo
+    """
+
+    def __init__(self, hot_source: Optional[Callable[[], List[Dict]]] = None,
+                 archive: Optional[HistoryArchive] = None, cache_size: int = SIGNALS_INDEX_CACHE,
+                 feature_source: Optional[Callable[[str], Optional[Dict]]] = None):
+        self.hot_source = hot_source or (lambda: [])
+        self.feature_source = feature_source or (lambda signal_id: None)
+        self.archive = archive or history_archive
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._partitions: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._aggregates: Dict[str, tuple] = {}
+        # Índice global de IDs: versões das partições, hashes ordenados e mês (código) de cada hash
+        self._id_index = {"versions": {}, "hashes": np.empty(0, dtype=np.uint64),
+                          "months": np.empty(0, dtype=np.int32)}
+        self.stats = {"queries": 0, "lookups": 0, "partition_loads": 0, "cache_hits": 0}
+
+    # ---- Partições ----
+
+    def _version(self, dataset: str, month: str):
+        """Identifica o conteúdo atual da partição (muda quando ela é regravada)"""
+        try:
+            st = os.stat(self.archive._partition_path(dataset, month))
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _partition(self, dataset: str, month: str) -> Optional[pd.DataFrame]:
+        """Partição inteira, ordenada por (created_at, signal_id) decrescente (LRU)"""
+        version = self._version(dataset, month)
+        if version is None:
+            return None
+        key = (dataset, month)
+        with self._lock:
+            cached = self._partitions.get(key)
+            if cached is not None and cached[0] == version:
+                self._partitions.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                return cached[1]
+
+        columns = OUTCOME_COLUMNS if dataset == "outcomes" else SIGNAL_COLUMNS
+        with np.load(self.archive._partition_path(dataset, month)) as npz:
+            df = pd.DataFrame(self.archive._read_columns(npz, columns))
+        df = df.sort_values(["created_at", "signal_id"], ascending=False, ignore_index=True)
+
+        with self._lock:
+            self._partitions[key] = (version, df)
+            self._partitions.move_to_end(key)
+            while len(self._partitions) > self.cache_size:
+                self._partitions.popitem(last=False)
+            self.stats["partition_loads"] += 1
+        return df
+
+    def _hot_frame(self) -> pd.DataFrame:
+        entries = self.hot_source()
+        df = pd.DataFrame(entries, columns=OUTCOME_COLUMNS)
+        if df.empty:
+            return df
+        for column in ("strategy", "result", "completion_date"):
+            df[column] = df[column].fillna("")
+        return df
+
+    @staticmethod
+    def _filter(df: pd.DataFrame, symbol=None, since=None, until=None, result=None,
+                strategy=None, cursor=None) -> pd.DataFrame:
+        mask = np.ones(len(df), dtype=bool)
+        if symbol:
+            mask &= (df["symbol"] == symbol).to_numpy()
+        if since:
+            mask &= (df["created_at"] >= since).to_numpy()
+        if until:
+            mask &= (df["created_at"] <= until).to_numpy()
+        if result:
+            mask &= (_result_key(df) == result).to_numpy()
+        if strategy:
+            mask &= df["strategy"].astype(str).str.startswith(strategy).to_numpy()
+        if cursor:
+            created_at, signal_id = cursor
+            mask &= ((df["created_at"] < created_at) |
+                     ((df["created_at"] == created_at) & (df["signal_id"] < signal_id))).to_numpy()
+        return df[mask]
+
+    # ---- Consultas ----
+
+    def query(self, symbol: Optional[str] = None, since: Optional[str] = None,
+              until: Optional[str] = None, result: Optional[str] = None,
+              strategy: Optional[str] = None, cursor: Optional[str] = None,
+              limit: int = SIGNALS_PAGE_SIZE) -> Dict:
+        """
+        Página de sinais, do mais novo para o mais antigo
+
+        Returns:
+            {"signals": [...], "count": n, "next_cursor": str ou None}
+        """
+        if result is not None and result not in RESULTS:
+            raise ValueError(f"result deve ser um de {', '.join(RESULTS)}")
+        limit = max(1, min(int(limit), SIGNALS_MAX_PAGE_SIZE))
+        after = decode_cursor(cursor) if cursor else None
+        until = _until_bound(until)
+        filters = dict(symbol=symbol, since=since, until=until, result=result, strategy=strategy, cursor=after)
+
+        hot = self._hot_frame()
+        if not hot.empty:
+            hot = self._filter(hot, **filters)
+        hot_months = hot.groupby(hot["created_at"].str[:7]) if not hot.empty else None
+        months = set(self.archive.months("outcomes", since, until))
+        if hot_months is not None:
+            months |= set(hot_months.groups)
+        if after:
+            months = {m for m in months if m <= after[0][:7]}
+
+        pages = []
+        found = 0
+        for month in sorted(months, reverse=True):
+            frames = []
+            hot_month = hot_months.get_group(month) if hot_months is not None and month in hot_months.groups else None
+            archived = self._partition("outcomes", month) if month in self.archive.manifest.get("outcomes", {}) else None
+            if archived is not None:
+                archived = self._filter(archived, **filters)
+                if hot_month is not None:
+                    # Entre o arquivamento e a remoção do quente o sinal existe nos dois lados
+                    archived = archived[~archived["signal_id"].isin(hot_month["signal_id"])]
+                frames.append(archived)
+            if hot_month is not None:
+                frames.append(hot_month)
+            frames = [f for f in frames if not f.empty]
+            if not frames:
+                continue
+            month_df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+            month_df = month_df.sort_values(["created_at", "signal_id"], ascending=False)
+            pages.append(month_df.head(limit + 1 - found))
+            found += len(pages[-1])
+            if found > limit:
+                break
+
+        page = pd.concat(pages, ignore_index=True) if pages else pd.DataFrame(columns=OUTCOME_COLUMNS)
+        has_more = len(page) > limit
+        page = page.head(limit)
+        signals = [_to_record(row) for row in page[OUTCOME_COLUMNS].to_dict("records")]
+        with self._lock:
+            self.stats["queries"] += 1
+        next_cursor = None
+        if has_more and signals:
+            next_cursor = encode_cursor(signals[-1]["created_at"], signals[-1]["signal_id"])
+        return {"signals": signals, "count": len(signals), "next_cursor": next_cursor}
+
+    @staticmethod
+    def _month_code(month: str) -> int:
+        return int(month[:4]) * 12 + int(month[5:7]) - 1
+
+    @staticmethod
+    def _month_name(code: int) -> str:
+        return f"{code // 12:04d}-{code % 12 + 1:02d}"
+
+    def _id_lookup(self):
+        """
+        Índice global (hashes ordenados, código do mês de cada um)
+
+        Só as partições novas ou regravadas desde a última chamada são lidas
+        (apenas a coluna signal_id); as que sumiram saem do índice.
+        """
+        versions = {month: self._version("outcomes", month)
+                    for month in self.archive.manifest.get("outcomes", {})}
+        versions = {month: version for month, version in versions.items() if version is not None}
+        with self._lock:
+            index = self._id_index
+            if index["versions"] == versions:
+                return index["hashes"], index["months"]
+            known = index["versions"]
+            stale = [m for m in set(known) | set(versions) if known.get(m) != versions.get(m)]
+            hashes, months = index["hashes"], index["months"]
+
+        keep = ~np.isin(months, [self._month_code(m) for m in stale])
+        new_hashes, new_months = [hashes[keep]], [months[keep]]
+        for month in stale:
+            if month not in versions:
+                continue
+            with np.load(self.archive._partition_path("outcomes", month)) as npz:
+                month_hashes = _id_hash(npz["signal_id"].tolist())
+            new_hashes.append(month_hashes)
+            new_months.append(np.full(len(month_hashes), self._month_code(month), dtype=np.int32))
+        hashes = np.concatenate(new_hashes)
+        months = np.concatenate(new_months)
+        order = np.argsort(hashes, kind="stable")
+        hashes, months = hashes[order], months[order]
+        with self._lock:
+            self._id_index = {"versions": versions, "hashes": hashes, "months": months}
+        return hashes, months
+
+    def _archived_months(self, signal_id: str) -> List[str]:
+        """Meses das partições que têm o ID (normalmente um; vazio se não arquivado)"""
+        hashes, months = self._id_lookup()
+        wanted = _id_hash([signal_id])[0]
+        lo, hi = np.searchsorted(hashes, wanted, side="left"), np.searchsorted(hashes, wanted, side="right")
+        return sorted({self._month_name(int(code)) for code in months[lo:hi]}, reverse=True)
+
+    def _archived_mask(self, signal_ids, created_ats) -> np.ndarray:
+        """Para cada sinal, se o ID está na partição do mês de created_at"""
+        hashes, months = self._id_lookup()
+        wanted = _id_hash(signal_ids)
+        codes = np.array([self._month_code(c) if isinstance(c, str) and len(c) >= 7 else -1 for c in created_ats],
+                         dtype=np.int32)
+        lo = np.searchsorted(hashes, wanted, side="left")
+        hi = np.searchsorted(hashes, wanted, side="right")
+        return np.array([bool((months[a:b] == code).any()) for a, b, code in zip(lo, hi, codes)], dtype=bool)
+
+    def get(self, signal_id: str) -> Optional[Dict]:
+        """Sinal pelo ID (com as features de treino, se houver); None se não existe"""
+        with self._lock:
+            self.stats["lookups"] += 1
+        for entry in self.hot_source():
+            if entry['signal_id'] == signal_id:
+                record = dict(entry)
+                record["features"] = self._features(signal_id, record.get('created_at'))
+                return record
+
+        for month in self._archived_months(signal_id):
+            df = self._partition("outcomes", month)
+            if df is None:
+                continue
+            match = df[df["signal_id"] == signal_id]
+            if not match.empty:
+                record = _to_record(match.iloc[0].to_dict())
+                record["features"] = self._features(signal_id, record.get('created_at'))
+                return record
+        return None
+
+    def _features(self, signal_id: str, created_at: Optional[str]) -> Optional[Dict]:
+        """Registro de treino do sinal: quente ou na partição de signals do mesmo mês"""
+        record = self.feature_source(signal_id)
+        if record is not None or not created_at:
+            return record
+        if created_at[:7] not in self.archive.manifest.get("signals", {}):
+            return None
+        df = self._partition("signals", created_at[:7])
+        if df is None:
+            return None
+        match = df[df["signal_id"] == signal_id]
+        return _to_record(match.iloc[0].to_dict()) if not match.empty else None
+
+    def _month_aggregate(self, month: str) -> Optional[pd.Series]:
+        """Contagens por (símbolo, estratégia, resultado) de uma partição inteira"""
+        version = self._version("outcomes", month)
+        if version is None:
+            return None
+        with self._lock:
+            cached = self._aggregates.get(month)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+        aggregate = self._count(self._partition("outcomes", month))
+        with self._lock:
+            self._aggregates[month] = (version, aggregate)
+        return aggregate
+
+    @staticmethod
+    def _count(df: pd.DataFrame) -> pd.Series:
+        if df.empty:
+            return pd.Series(dtype=np.int64, index=pd.MultiIndex.from_tuples(
+                [], names=["symbol", "strategy", "result"]))
+        keys = pd.DataFrame({"symbol": df["symbol"], "strategy": df["strategy"].fillna(""),
+                             "result": _result_key(df)})
+        return keys.groupby(["symbol", "strategy", "result"]).size()
+
+    def statistics(self, symbol: Optional[str] = None, since: Optional[str] = None,
+                   until: Optional[str] = None, strategy: Optional[str] = None) -> Dict:
+        """
+        Totais e taxa de acerto (sucessos / decididos) geral, por símbolo e por estratégia
+        """
+        until = _until_bound(until)
+        filters = dict(symbol=symbol, since=since, until=until, strategy=strategy)
+        parts = [self._count(pd.DataFrame(columns=OUTCOME_COLUMNS))]
+        for month in self.archive.months("outcomes", since, until):
+            # Meses inteiros dentro do intervalo usam as contagens prontas da partição
+            inside = (not since or since <= f"{month}-01") and (not until or until >= f"{month}-31 23:59:59")
+            if inside:
+                aggregate = self._month_aggregate(month)
+                if aggregate is not None:
+                    parts.append(aggregate)
+                continue
+            df = self._partition("outcomes", month)
+            if df is not None:
+                parts.append(self._count(self._filter(df, since=since, until=until)))
+        hot = self._hot_frame()
+        if not hot.empty:
+            hot = self._filter(hot, since=since, until=until)
+            # Concluídos já arquivados (ainda não removidos do quente) não contam duas vezes
+            archived = self._archived_mask(hot["signal_id"].tolist(), hot["created_at"].tolist())
+            parts.append(self._count(hot[~archived]))
+
+        counts = pd.concat(parts).groupby(level=[0, 1, 2]).sum()
+        if not counts.empty:
+            index = counts.index.to_frame(index=False)
+            mask = np.ones(len(index), dtype=bool)
+            if symbol:
+                mask &= (index["symbol"] == symbol).to_numpy()
+            if strategy:
+                mask &= index["strategy"].str.startswith(strategy).to_numpy()
+            counts = counts[mask]
+
+        def summarize(level: Optional[str]) -> Dict:
+            grouped = counts.groupby(level=[level, "result"]).sum() if level else counts.groupby(level="result").sum()
+            if level is None:
+                totals = {result: int(grouped.get(result, 0)) for result in RESULTS}
+                return dict(totals, total=sum(totals.values()), win_rate=_win_rate(totals))
+            summary = {}
+            for (key, result), value in grouped.items():
+                summary.setdefault(key or "—", {r: 0 for r in RESULTS})[result] += int(value)
+            for totals in summary.values():
+                totals["total"] = sum(totals[r] for r in RESULTS)
+                totals["win_rate"] = _win_rate(totals)
+            return summary
+
+        return dict(summarize(None), by_symbol=summarize("symbol"), by_strategy=summarize("strategy"),
+                    filters={k: v for k, v in filters.items() if v})
+
+    def index_statistics(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, cached_partitions=len(self._partitions),
+                        id_index_entries=int(len(self._id_index["hashes"])))
+
+
+def _hot_entries() -> List[Dict]:
+    from ai_result_monitor import ai_result_monitor
+    return ai_result_monitor.entries_snapshot()
+
+def _hot_features(signal_id: str) -> Optional[Dict]:
+    from ai_data_collector import ai_data_collector
+    return ai_data_collector.get_signal(signal_id)
+
+
+# Instância global
+signal_history = SignalHistory(_hot_entries, feature_source=_hot_features)
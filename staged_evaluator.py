@@ -0,0 +1,157 @@
+"""
+Avaliação em etapas ordenadas por custo
+
+Cada etapa declara seu custo relativo e de quais etapas depende. O avaliador
+roda as etapas da mais barata para a mais cara (respeitando dependências) sobre
+o lote inteiro de candidatos, descartando cada candidato assim que o resultado
+dele estiver decidido — etapas caras só veem quem ainda pode gerar sinal.
+
+Etapas em lote recebem a lista de candidatos e devolvem os que seguem; etapas
+por candidato (per_candidate=True) devolvem True/False para cada um, e um erro
+em um candidato descarta apenas ele.
+
+Com um DecisionTracer, cada candidato recebe candidate["trace"]: cada etapa
+abre um span nele (as funções das etapas anotam valores intermediários) e o
+rastro é concluído quando o candidato é descartado ou aprovado.
+"""
+
+import time
+from typing import Callable, Dict, List, Optional
+from metrics import metrics
+from structured_log import get_logger
+from decision_trace import NULL_TRACE
+
+CANDIDATES_SKIPPED = metrics.counter(
+    "scanner_candidates_skipped_total", "Candidatos descartados por etapa da decisão", ["stage"]
+)
+
+log = get_logger(__name__)
+
+class Stage:
+    """Etapa declarativa: nome, custo relativo, função e dependências"""
+
+    def __init__(self, name: str, cost: float, func: Callable, requires: tuple = (),
+                 per_candidate: bool = False):
+        self.name = name
+        self.cost = cost
+        self.func = func
+        self.requires = tuple(requires)
+        self.per_candidate = per_candidate
+
+class StagedEvaluator:
+    """
+    Executa as etapas em ordem de custo e registra taxa de aprovação e tempo
+    """
+
+    def __init__(self, stages: List[Stage], tracer=None):
+        self.stages = self._order(stages)
+        self.tracer = tracer
+        self.stats = {stage.name: self._empty_stats() for stage in self.stages}
+        self.last_run: Dict[str, Dict] = {}
+
+    @staticmethod
+    def _empty_stats() -> Dict:
+        return {"runs": 0, "candidates": 0, "passed": 0, "errors": 0, "seconds": 0.0}
+
+    @staticmethod
+    def _order(stages: List[Stage]) -> List[Stage]:
+        """Mais barata primeiro, entre as etapas com dependências já satisfeitas"""
+        names = {stage.name for stage in stages}
+        for stage in stages:
+            missing = set(stage.requires) - names
+            if missing:
+                raise ValueError(f"Etapa '{stage.name}' depende de etapas inexistentes: {missing}")
+
+        ordered, done, remaining = [], set(), list(stages)
+        while remaining:
+            ready = [s for s in remaining if set(s.requires) <= done]
+            if not ready:
+                raise ValueError(f"Dependência circular entre etapas: {[s.name for s in remaining]}")
+            stage = min(ready, key=lambda s: s.cost)
+            ordered.append(stage)
+            done.add(stage.name)
+            remaining.remove(stage)
+        return ordered
+
+    def _run_stage(self, stage: Stage, candidates: List[Dict], context: Dict, run_stats: Dict) -> List[Dict]:
+        if not stage.per_candidate:
+            # Etapa em lote: o span de cada candidato cobre o lote inteiro
+            spans = [c.get("trace", NULL_TRACE).span(stage.name, batch=len(candidates)) for c in candidates]
+            for span in spans:
+                span.__enter__()
+            try:
+                return stage.func(candidates, context)
+            finally:
+                for span in spans:
+                    span.__exit__(None, None, None)
+
+        survivors = []
+        for candidate in candidates:
+            try:
+                with candidate.get("trace", NULL_TRACE).span(stage.name):
+                    passed = stage.func(candidate, context)
+                if passed:
+                    survivors.append(candidate)
+            except Exception as e:
+                run_stats["errors"] += 1
+                candidate["trace_outcome"] = f"error:{stage.name}"
+                log.error(f"🚨 Erro inesperado ao processar {candidate.get('symbol')} (etapa {stage.name}): {e}",
+                          extra={"symbol": candidate.get("symbol")})
+        return survivors
+
+    def begin_cycle(self):
+        """Zera as estatísticas do ciclo (last_run acumula todas as chamadas a run até aqui)"""
+        self.last_run = {}
+        if self.tracer is not None:
+            self.tracer.begin_cycle()
+
+    def run(self, candidates: List[Dict], context: Optional[Dict] = None) -> List[Dict]:
+        """Passa o lote por todas as etapas; retorna os candidatos aprovados"""
+        context = context or {}
+        tracer = self.tracer
+        if tracer is not None:
+            for candidate in candidates:
+                candidate.setdefault("trace", tracer.start_trace(candidate.get("symbol")))
+        for stage in self.stages:
+            if not candidates:
+                break
+            run_stats = self._empty_stats()
+            start = time.perf_counter()
+            survivors = self._run_stage(stage, candidates, context, run_stats)
+            run_stats.update(
+                runs=1,
+                candidates=len(candidates),
+                passed=len(survivors),
+                seconds=time.perf_counter() - start
+            )
+            CANDIDATES_SKIPPED.inc(len(candidates) - len(survivors), stage=stage.name)
+            cycle_stats = self.last_run.setdefault(stage.name, self._empty_stats())
+            for key, value in run_stats.items():
+                self.stats[stage.name][key] += value
+                cycle_stats[key] += value
+            if tracer is not None and len(survivors) < len(candidates):
+                passed = {id(c) for c in survivors}
+                for candidate in candidates:
+                    if id(candidate) not in passed:
+                        tracer.record(candidate["trace"], candidate.get("trace_outcome", f"rejected:{stage.name}"))
+            candidates = survivors
+        if tracer is not None:
+            for candidate in candidates:
+                tracer.record(candidate["trace"], "approved")
+        return candidates
+
+    @staticmethod
+    def _summary(stats: Dict) -> Dict:
+        return {
+            "candidates": stats["candidates"],
+            "passed": stats["passed"],
+            "errors": stats["errors"],
+            "pass_rate": round(stats["passed"] / stats["candidates"], 3) if stats["candidates"] else None,
+            "total_ms": round(stats["seconds"] * 1000, 2),
+            "ms_per_candidate": round(stats["seconds"] * 1000 / stats["candidates"], 3) if stats["candidates"] else None
+        }
+
+    def statistics(self, last_run: bool = False) -> Dict[str, Dict]:
+        """Por etapa (na ordem de execução): aprovados, taxa e tempos; acumulado ou do ciclo atual"""
+        source = self.last_run if last_run else self.stats
+        return {stage.name: self._summary(source[stage.name]) for stage in self.stages if stage.name in source}
@@ -1,56 +1,198 @@
-import json
-import os
+import contextlib
+import threading
+import numpy as np
+from storage import storage
+from event_bus import event_bus
 
-TRADES_FILE = "open_trades.json"
+class OpenTradesState:
+    """
+    Estado dos trades abertos mantido em memória.
+
+    Alterações marcam o símbolo como sujo e só são gravadas no backend em
+    commit() (uma vez por ciclo do scanner). Leituras da API usam snapshot()
+    e nunca tocam o disco.
+
+    Com sharding, `owns` (símbolo -> bool) cerca as gravações: commit() só
+    grava símbolos do shard, e os liberados saem da memória com forget().
+    """
+
+    def __init__(self, storage_backend=None):
+        self.storage = storage_backend or storage
+        self._lock = threading.RLock()
+        self._trades = self.storage.load_open_trades()
+        self._dirty = set()
+        self.owns = None
+
+    def __getitem__(self, symbol):
+        with self._lock:
+            return self._trades[symbol]
+
+    def __setitem__(self, symbol, trade_info):
+        with self._lock:
+            self._trades[symbol] = trade_info
+            self._dirty.add(symbol)
+
+    def __delitem__(self, symbol):
+        with self._lock:
+            del self._trades[symbol]
+            self._dirty.add(symbol)
+
+    def __contains__(self, symbol):
+        return symbol in self._trades
+
+    def __len__(self):
+        return len(self._trades)
+
+    def __bool__(self):
+        return bool(self._trades)
+
+    def keys(self):
+        with self._lock:
+            return list(self._trades.keys())
+
+    def items(self):
+        with self._lock:
+            return list(self._trades.items())
+
+    def snapshot(self):
+        """Cópia dos trades abertos para leitura em outras threads"""
+        with self._lock:
+            return {symbol: dict(info) for symbol, info in self._trades.items()}
+
+    def reload(self, symbols):
+        """Relê do backend os trades dos símbolos (ex.: shard assumido de outra réplica)"""
+        stored = self.storage.load_open_trades()
+        with self._lock:
+            for symbol in symbols:
+                self._dirty.discard(symbol)
+                if symbol in stored:
+                    self._trades[symbol] = stored[symbol]
+                else:
+                    self._trades.pop(symbol, None)
+
+    def forget(self, symbols):
+        """Tira da memória os trades dos símbolos (shard liberado), sem gravar nada"""
+        with self._lock:
+            for symbol in symbols:
+                self._trades.pop(symbol, None)
+                self._dirty.discard(symbol)
+
+    @property
+    def is_dirty(self):
+        return bool(self._dirty)
+
+    def commit(self):
+        """Grava no backend apenas os trades alterados desde o último commit"""
+        with self._lock:
+            # Símbolos fora do shard (lease não renovado) esperam o próximo commit
+            dirty = {s for s in self._dirty if self.owns is None or self.owns(s)}
+            if not dirty:
+                return False
+            upserts = {s: self._trades[s] for s in dirty if s in self._trades}
+            deletes = [s for s in dirty if s not in self._trades]
+            self.storage.apply_open_trade_changes(upserts, deletes)
+            self._dirty -= dirty
+            return True
 
 def load_open_trades():
-    """Carrega os trades abertos de um arquivo JSON."""
-    if os.path.exists(TRADES_FILE):
-        with open(TRADES_FILE, "r") as f:
-            return json.load(f)
-    return {}
+    """Retorna uma cópia dos trades abertos em memória."""
+    return open_trades_state.snapshot()
 
 def save_open_trades(trades):
-    """Salva os trades abertos em um arquivo JSON."""
-    with open(TRADES_FILE, "w") as f:
-        json.dump(trades, f, indent=4)
-
-def check_and_notify_closed_trades(open_trades, current_market_data, send_notification_func):
-    """Verifica se trades abertos atingiram alvo ou stop loss e notifica."""
-    closed_trades = []
-    for symbol, trade_info in list(open_trades.items()): # Usar list() para permitir modificação durante iteração
+    """Substitui os trades abertos e grava imediatamente."""
+    with open_trades_state._lock:
+        for symbol in open_trades_state.keys():
+            if symbol not in trades:
+                del open_trades_state[symbol]
+        for symbol, trade_info in trades.items():
+            if open_trades_state._trades.get(symbol) != trade_info:
+                open_trades_state[symbol] = trade_info
+        open_trades_state.commit()
+
+def evaluate_trade_levels(trades, prices):
+    """
+    Compara os preços atuais com alvo e stop de todos os trades de uma vez
+
+    Returns:
+        {symbol: "target" | "stop"} dos trades que atingiram um dos níveis
+    """
+    symbols = [symbol for symbol in trades if symbol in prices]
+    if not symbols:
+        return {}
+    price = np.array([prices[s] for s in symbols], dtype=np.float64)
+    target = np.array([float(trades[s]["target_price"]) for s in symbols])
+    stop = np.array([float(trades[s]["stop_loss"]) for s in symbols])
+    hit_target = price >= target
+    hit_stop = ~hit_target & (price <= stop)
+    return {
+        symbol: "target" if reached_target else "stop"
+        for symbol, reached_target, reached_stop in zip(symbols, hit_target, hit_stop)
+        if reached_target or reached_stop
+    }
+
+def closed_trade_message(symbol, trade_info, current_price, level):
+    """Mensagem de fechamento (alvo ou stop) de um trade"""
+    entry_price = float(trade_info["entry_price"])
+    if level == "target":
+        profit_percent = ((current_price - entry_price) / entry_price) * 100
+        return (
+            f"✅ ALVO ATINGIDO para {symbol}!\n"
+            f"💰 Entrada: {entry_price:.4f} | Alvo: {float(trade_info['target_price']):.4f} | Preço Atual: {current_price:.4f}\n"
+            f"📈 Lucro: {profit_percent:.2f}%"
+        )
+    loss_percent = ((entry_price - current_price) / entry_price) * 100
+    return (
+        f"❌ STOP LOSS ATINGIDO para {symbol}!\n"
+        f"📉 Entrada: {entry_price:.4f} | Stop: {float(trade_info['stop_loss']):.4f} | Preço Atual: {current_price:.4f}\n"
+        f"💔 Prejuízo: {loss_percent:.2f}%"
+    )
+
+def close_trades_at_prices(open_trades, prices, send_notification_func):
+    """
+    Fecha e notifica os trades cujo preço atual atingiu alvo ou stop
+
+    Usado pelo scanner (último candle) e pelo TradeMonitor (cotação atual); com
+    OpenTradesState a avaliação e a remoção acontecem sob o mesmo lock, então um
+    trade nunca é notificado duas vezes. Notificações e eventos saem depois de
+    soltar o lock, para o scanner não esperar pelo envio.
+    """
+    lock = open_trades._lock if isinstance(open_trades, OpenTradesState) else contextlib.nullcontext()
+    with lock:
+        trades = {symbol: open_trades[symbol] for symbol in prices if symbol in open_trades}
+        hits = evaluate_trade_levels(trades, prices)
+        closed = [(symbol, trades[symbol], prices[symbol], level) for symbol, level in hits.items()]
+        for symbol, _, _, _ in closed:
+            del open_trades[symbol] # Remove o trade fechado
+
+    for symbol, trade_info, price, level in closed:
+        message = closed_trade_message(symbol, trade_info, price, level)
+        print(f"[STATE_MANAGER] {message}")
+        send_notification_func(message) # Envia a notificação
+        event_bus.publish("trade_closed", dict(trade_info, symbol=symbol, level=level, price=float(price)))
+
+    closed_trades = list(hits)
+    # OpenTradesState é gravado no commit do ciclo; dicts simples só quando algo fechou
+    if closed_trades and not isinstance(open_trades, OpenTradesState):
+        save_open_trades(open_trades)
+
+    return closed_trades
+
+def check_and_notify_closed_trades(open_trades, current_market_data, send_notification_func, symbols=None):
+    """Verifica se trades abertos atingiram alvo ou stop loss e notifica.
+
+    symbols: restringe a verificação a esses símbolos (shard da réplica)
+    """
+    prices = {}
+    for symbol in list(open_trades.keys()):
+        if symbols is not None and symbol not in symbols:
+            continue
         if symbol not in current_market_data or current_market_data[symbol].empty:
             print(f"⚠️ Dados atuais indisponíveis para {symbol} para monitoramento.")
             continue
+        prices[symbol] = current_market_data[symbol]["close"].iloc[-1]
+
+    return close_trades_at_prices(open_trades, prices, send_notification_func)
 
-        current_price = current_market_data[symbol]["close"].iloc[-1]
-        entry_price = float(trade_info["entry_price"])
-        target_price = float(trade_info["target_price"])
-        stop_loss = float(trade_info["stop_loss"])
-
-        message = None
-        if current_price >= target_price: # Atingiu o alvo
-            profit_percent = ((current_price - entry_price) / entry_price) * 100
-            message = (
-                f"✅ ALVO ATINGIDO para {symbol}!\n"
-                f"💰 Entrada: {entry_price:.4f} | Alvo: {target_price:.4f} | Preço Atual: {current_price:.4f}\n"
-                f"📈 Lucro: {profit_percent:.2f}%"
-            )
-            closed_trades.append(symbol)
-        elif current_price <= stop_loss: # Atingiu o stop loss
-            loss_percent = ((entry_price - current_price) / entry_price) * 100
-            message = (
-                f"❌ STOP LOSS ATINGIDO para {symbol}!\n"
-                f"📉 Entrada: {entry_price:.4f} | Stop: {stop_loss:.4f} | Preço Atual: {current_price:.4f}\n"
-                f"💔 Prejuízo: {loss_percent:.2f}%"
-            )
-            closed_trades.append(symbol)
-        
-        if message:
-            print(f"[STATE_MANAGER] {message}")
-            send_notification_func(message) # Envia a notificação
-
-    for symbol in closed_trades:
-        del open_trades[symbol] # Remove o trade fechado
-    save_open_trades(open_trades) # Salva o estado atualizado
+# Instância global
+open_trades_state = OpenTradesState()
 
@@ -0,0 +1,131 @@
+"""
+Snapshots JSON dos endpoints de status, servidos da memória
+
+Cada endpoint registra um builder. O corpo JSON e o ETag são calculados uma
+vez e reaproveitados por todas as requisições até:
+
+- o scanner publicar um snapshot novo no fim de cada fase (publish), ou
+- o TTL curto vencer (para campos que mudam fora das fases, como a agenda).
+
+Requisições simultâneas com o snapshot vencido são agrupadas: uma thread
+reconstrói e as demais esperam o mesmo resultado, em vez de todas disputarem
+o GIL com o scanner. Com o ETag, clientes que enviam If-None-Match recebem 304
+sem corpo.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+STATUS_CACHE_TTL = float(os.getenv("STATUS_CACHE_TTL", "2"))
+STATUS_CACHE_ENABLED = os.getenv("STATUS_CACHE", "true").lower() == "true"
+
+class Snapshot:
+    """Corpo JSON pronto para envio, com ETag e horário de construção"""
+
+    def __init__(self, data):
+        self.body = json.dumps(data, default=str, sort_keys=True).encode()
+        self.etag = hashlib.sha1(self.body).hexdigest()
+        self.built_at = time.monotonic()
+
+class StatusSnapshots:
+    """
+    Cache de snapshots por chave com TTL, publicação explícita e coalescência
+    """
+
+    def __init__(self, ttl: float = STATUS_CACHE_TTL, enabled: bool = STATUS_CACHE_ENABLED):
+        self.ttl = ttl
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._builders: Dict[str, tuple] = {}
+        self._snapshots: Dict[str, Snapshot] = {}
+        self._inflight: Dict[str, threading.Event] = {}
+        self.stats = {"hits": 0, "builds": 0, "coalesced": 0, "not_modified": 0, "publishes": 0, "errors": 0}
+
+    def register(self, key: str, builder: Callable[[], Dict], ttl: Optional[float] = None):
+        with self._lock:
+            self._builders[key] = (builder, self.ttl if ttl is None else ttl)
+            self._snapshots.pop(key, None)
+
+    def _build(self, key: str) -> Snapshot:
+        builder, _ = self._builders[key]
+        snapshot = Snapshot(builder())
+        with self._lock:
+            self._snapshots[key] = snapshot
+            self.stats["builds"] += 1
+        return snapshot
+
+    def get(self, key: str) -> Snapshot:
+        """Snapshot atual da chave; reconstrói (uma thread só) se vencido"""
+        if not self.enabled:
+            builder, _ = self._builders[key]
+            return Snapshot(builder())
+
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            _, ttl = self._builders[key]
+            if snapshot is not None and time.monotonic() - snapshot.built_at < ttl:
+                self.stats["hits"] += 1
+                return snapshot
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            event.wait()
+            with self._lock:
+                snapshot = self._snapshots.get(key)
+            # Quem construía falhou: tenta de novo nesta requisição
+            return snapshot if snapshot is not None else self._build(key)
+
+        try:
+            return self._build(key)
+        except Exception:
+            with self._lock:
+                self.stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def publish(self, keys: Optional[Iterable[str]] = None):
+        """Reconstrói os snapshots agora (chamado pelo scanner no fim de cada fase)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            keys = list(self._builders) if keys is None else [k for k in keys if k in self._builders]
+            self.stats["publishes"] += 1
+        for key in keys:
+            try:
+                self._build(key)
+            except Exception as e:
+                with self._lock:
+                    self.stats["errors"] += 1
+                print(f"[STATUS] ⚠️ Falha ao publicar snapshot '{key}': {e}")
+
+    def ttl_of(self, key: str) -> float:
+        return self._builders[key][1]
+
+    def record_not_modified(self):
+        with self._lock:
+            self.stats["not_modified"] += 1
+
+    def statistics(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["snapshots"] = {
+                key: round(time.monotonic() - snapshot.built_at, 1) for key, snapshot in self._snapshots.items()
+            }
+        stats["enabled"] = self.enabled
+        return stats
+
+
+# Instância global
+status_snapshots = StatusSnapshots()
@@ -0,0 +1,558 @@
+"""
+Camada de armazenamento plugável para trades abertos, monitoramento e dados de treinamento
+
+Backends disponíveis:
+- json: arquivos open_trades.json, ai_monitoring.json e ai_training_data.json (padrão antigo)
+- sqlite: banco SQLite em modo WAL com tabelas indexadas (signals, outcomes, open_trades)
+
+O backend é escolhido pela variável de ambiente STORAGE_BACKEND.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+TRADES_FILE = "open_trades.json"
+MONITORING_FILE = "ai_monitoring.json"
+TRAINING_FILE = "ai_training_data.json"
+DB_FILE = "crypto_signals.db"
+
+# Colunas persistidas de cada registro (na ordem das tabelas SQLite)
+TRADE_COLUMNS = ["entry_price", "target_price", "stop_loss", "created_at", "signal_id"]
+
+OUTCOME_COLUMNS = [
+    "signal_id", "symbol", "entry_price", "target_price", "stop_loss", "created_at",
+    "status", "result", "completion_date", "days_to_result",
+    "max_price_reached", "min_price_reached", "strategy"
+]
+
+SIGNAL_COLUMNS = [
+    "signal_id", "symbol", "entry_price", "target_price", "stop_loss", "confidence_score",
+    "created_at", "rsi", "macd_diff", "sma_ratio", "volume_ratio", "volatility", "momentum",
+    "sentiment_score", "hour_of_day", "day_of_week", "result", "result_updated_at", "days_to_result"
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS open_trades (
+    symbol TEXT PRIMARY KEY,
+    entry_price REAL NOT NULL,
+    target_price REAL NOT NULL,
+    stop_loss REAL NOT NULL,
+    created_at TEXT,
+    signal_id TEXT
+);
+
+CREATE TABLE IF NOT EXISTS outcomes (
+    signal_id TEXT PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    entry_price REAL,
+    target_price REAL,
+    stop_loss REAL,
+    created_at TEXT,
+    status TEXT NOT NULL DEFAULT 'monitoring',
+    result TEXT,
+    completion_date TEXT,
+    days_to_result INTEGER,
+    max_price_reached REAL,
+    min_price_reached REAL,
+    strategy TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outcomes_status_symbol ON outcomes (status, symbol);
+CREATE INDEX IF NOT EXISTS idx_outcomes_status_completion ON outcomes (status, completion_date);
+
+CREATE TABLE IF NOT EXISTS signals (
+    signal_id TEXT PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    entry_price REAL,
+    target_price REAL,
+    stop_loss REAL,
+    confidence_score REAL,
+    created_at TEXT,
+    rsi REAL,
+    macd_diff REAL,
+    sma_ratio REAL,
+    volume_ratio REAL,
+    volatility REAL,
+    momentum REAL,
+    sentiment_score REAL,
+    hour_of_day INTEGER,
+    day_of_week INTEGER,
+    result TEXT,
+    result_updated_at TEXT,
+    days_to_result INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_signals_symbol_created ON signals (symbol, created_at);
+CREATE INDEX IF NOT EXISTS idx_signals_result ON signals (result);
+"""
+
+# Colunas adicionadas depois da criação das tabelas (bancos antigos recebem ALTER TABLE)
+ADDED_COLUMNS = {
+    "outcomes": {"strategy": "TEXT"}
+}
+
+
+class StorageBackend:
+    """
+    Interface comum dos backends de armazenamento
+    """
+
+    # --- Trades abertos ---
+    def load_open_trades(self) -> Dict[str, Dict]:
+        raise NotImplementedError
+
+    def save_open_trades(self, trades: Dict[str, Dict]):
+        raise NotImplementedError
+
+    def apply_open_trade_changes(self, upserts: Dict[str, Dict], deletes: Iterable[str]):
+        """Grava apenas os trades alterados/removidos desde o último flush"""
+        raise NotImplementedError
+
+    # --- Monitoramento de resultados (outcomes) ---
+    def load_monitoring(self) -> List[Dict]:
+        raise NotImplementedError
+
+    def upsert_monitoring(self, entries: Iterable[Dict]):
+        raise NotImplementedError
+
+    def active_signals(self, symbol: Optional[str] = None) -> List[Dict]:
+        raise NotImplementedError
+
+    def completed_signals_since(self, since: str) -> List[Dict]:
+        raise NotImplementedError
+
+    def delete_monitoring(self, signal_ids: Iterable[str]):
+        raise NotImplementedError
+
+    # --- Dados de treinamento (signals) ---
+    def load_training(self) -> List[Dict]:
+        raise NotImplementedError
+
+    def upsert_training(self, records: Iterable[Dict]):
+        raise NotImplementedError
+
+    def delete_training(self, signal_ids: Iterable[str]):
+        raise NotImplementedError
+
+    @contextmanager
+    def batch(self):
+        """Agrupa as escritas feitas dentro do bloco em uma única transação"""
+        yield self
+
+    def close(self):
+        pass
+
+
+class JSONStorage(StorageBackend):
+    """
+    Backend compatível com os arquivos JSON originais.
+
+    Dentro de batch() as escritas só marcam o arquivo como sujo; o dump
+    acontece uma vez, na saída do bloco mais externo. Profundidade do lote e
+    arquivos sujos são por thread (como no SQLite): uma escrita do monitor de
+    trades fora de lote grava na hora, mesmo com o scanner no meio de um batch().
+    """
+
+    def __init__(self, trades_file=TRADES_FILE, monitoring_file=MONITORING_FILE,
+                 training_file=TRAINING_FILE):
+        self.trades_file = trades_file
+        self.monitoring_file = monitoring_file
+        self.training_file = training_file
+        self._lock = threading.RLock()
+        self._monitoring = None
+        self._monitoring_index = None
+        self._training = None
+        self._training_index = None
+        self._trades = None
+        self._local = threading.local()
+
+    def _read(self, path, default):
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    return json.load(f)
+            except Exception:
+                return default
+        return default
+
+    def _write(self, path, data):
+        # Escrita atômica: grava em arquivo temporário e renomeia por cima do original
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _batch_state(self):
+        state = self._local
+        if not hasattr(state, "depth"):
+            state.depth = 0
+            state.dirty = set()
+        return state
+
+    def _flush(self, dirty):
+        # Grava o estado em memória atual, incluindo mudanças pendentes de outras threads
+        if "trades" in dirty:
+            self._write(self.trades_file, self._trades)
+        if "monitoring" in dirty:
+            self._write(self.monitoring_file, self._monitoring)
+        if "training" in dirty:
+            self._write(self.training_file, self._training)
+        dirty.clear()
+
+    def _mark_dirty(self, name):
+        state = self._batch_state()
+        state.dirty.add(name)
+        if state.depth == 0:
+            self._flush(state.dirty)
+
+    def _ensure_monitoring(self):
+        if self._monitoring is None:
+            self._monitoring = self._read(self.monitoring_file, [])
+            self._monitoring_index = {e['signal_id']: i for i, e in enumerate(self._monitoring)}
+
+    def _ensure_training(self):
+        if self._training is None:
+            self._training = self._read(self.training_file, [])
+            self._training_index = {r['signal_id']: i for i, r in enumerate(self._training)}
+
+    def load_open_trades(self) -> Dict[str, Dict]:
+        with self._lock:
+            if self._trades is None:
+                self._trades = self._read(self.trades_file, {})
+            return dict(self._trades)
+
+    def save_open_trades(self, trades: Dict[str, Dict]):
+        with self._lock:
+            self._trades = dict(trades)
+            self._mark_dirty("trades")
+
+    def apply_open_trade_changes(self, upserts: Dict[str, Dict], deletes: Iterable[str]):
+        with self._lock:
+            if self._trades is None:
+                self._trades = self._read(self.trades_file, {})
+            for symbol in deletes:
+                self._trades.pop(symbol, None)
+            self._trades.update(upserts)
+            self._mark_dirty("trades")
+
+    def load_monitoring(self) -> List[Dict]:
+        with self._lock:
+            self._ensure_monitoring()
+            return list(self._monitoring)
+
+    def upsert_monitoring(self, entries: Iterable[Dict]):
+        with self._lock:
+            self._ensure_monitoring()
+            for entry in entries:
+                position = self._monitoring_index.get(entry['signal_id'])
+                if position is None:
+                    self._monitoring_index[entry['signal_id']] = len(self._monitoring)
+                    self._monitoring.append(entry)
+                else:
+                    self._monitoring[position] = entry
+            self._mark_dirty("monitoring")
+
+    def active_signals(self, symbol: Optional[str] = None) -> List[Dict]:
+        with self._lock:
+            self._ensure_monitoring()
+            return [
+                e for e in self._monitoring
+                if e['status'] == 'monitoring' and (symbol is None or e['symbol'] == symbol)
+            ]
+
+    def completed_signals_since(self, since: str) -> List[Dict]:
+        with self._lock:
+            self._ensure_monitoring()
+            return [
+                e for e in self._monitoring
+                if e['status'] == 'completed' and (e.get('completion_date') or '') >= since
+            ]
+
+    def delete_monitoring(self, signal_ids: Iterable[str]):
+        with self._lock:
+            self._ensure_monitoring()
+            removed = set(signal_ids)
+            self._monitoring = [e for e in self._monitoring if e['signal_id'] not in removed]
+            self._monitoring_index = {e['signal_id']: i for i, e in enumerate(self._monitoring)}
+            self._mark_dirty("monitoring")
+
+    def load_training(self) -> List[Dict]:
+        with self._lock:
+            self._ensure_training()
+            return list(self._training)
+
+    def upsert_training(self, records: Iterable[Dict]):
+        with self._lock:
+            self._ensure_training()
+            for record in records:
+                position = self._training_index.get(record['signal_id'])
+                if position is None:
+                    self._training_index[record['signal_id']] = len(self._training)
+                    self._training.append(record)
+                else:
+                    self._training[position] = record
+            self._mark_dirty("training")
+
+    def delete_training(self, signal_ids: Iterable[str]):
+        with self._lock:
+            self._ensure_training()
+            removed = set(signal_ids)
+            self._training = [r for r in self._training if r['signal_id'] not in removed]
+            self._training_index = {r['signal_id']: i for i, r in enumerate(self._training)}
+            self._mark_dirty("training")
+
+    @contextmanager
+    def batch(self):
+        state = self._batch_state()
+        state.depth += 1
+        try:
+            yield self
+        finally:
+            state.depth -= 1
+            if state.depth == 0 and state.dirty:
+                with self._lock:
+                    self._flush(state.dirty)
+
+
+class _DeferredWrites:
+    """Registra comandos de escrita para aplicá-los depois em uma transação"""
+
+    def __init__(self):
+        self.ops = []
+
+    def execute(self, sql, params=()):
+        self.ops.append((False, sql, params))
+
+    def executemany(self, sql, rows):
+        self.ops.append((True, sql, list(rows)))
+
+    def apply(self, conn: sqlite3.Connection):
+        for many, sql, params in self.ops:
+            if many:
+                conn.executemany(sql, params)
+            else:
+                conn.execute(sql, params)
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Backend SQLite em modo WAL.
+
+    Cada thread usa sua própria conexão (Flask e scanner leem em paralelo sem
+    bloquear o escritor). Fora de batch() cada escrita é uma transação; dentro
+    de batch() as escritas da thread são acumuladas e gravadas juntas, em uma
+    transação curta, na saída do bloco (leituras no meio do lote não as veem).
+    """
+
+    def __init__(self, db_path=DB_FILE):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+            for table, columns in ADDED_COLUMNS.items():
+                existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+                for column, sql_type in columns.items():
+                    if column not in existing:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {sql_type}")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.batch_depth = 0
+        return conn
+
+    @contextmanager
+    def _write_txn(self):
+        conn = self._connection()
+        if self._local.batch_depth > 0:
+            # Dentro do lote as escritas só são registradas; o banco não fica travado
+            yield self._local.pending
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @contextmanager
+    def batch(self):
+        conn = self._connection()
+        if self._local.batch_depth == 0:
+            self._local.pending = _DeferredWrites()
+        self._local.batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._local.batch_depth -= 1
+            if self._local.batch_depth == 0:
+                pending, self._local.pending = self._local.pending, None
+                # Uma única transação curta com todas as escritas do ciclo
+                if pending.ops:
+                    conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        pending.apply(conn)
+                        conn.execute("COMMIT")
+                    except Exception:
+                        conn.execute("ROLLBACK")
+                        raise
+
+    def _query(self, sql, params=()) -> List[Dict]:
+        return [dict(row) for row in self._connection().execute(sql, params)]
+
+    def _upsert(self, table, columns, rows):
+        placeholders = ", ".join("?" for _ in columns)
+        sql = f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+        values = [tuple(row.get(col) for col in columns) for row in rows]
+        if not values:
+            return
+        with self._write_txn() as conn:
+            conn.executemany(sql, values)
+
+    def load_open_trades(self) -> Dict[str, Dict]:
+        rows = self._query("SELECT * FROM open_trades")
+        return {row.pop('symbol'): row for row in rows}
+
+    def save_open_trades(self, trades: Dict[str, Dict]):
+        columns = ["symbol"] + TRADE_COLUMNS
+        rows = [dict(info, symbol=symbol) for symbol, info in trades.items()]
+        with self._write_txn() as conn:
+            conn.execute("DELETE FROM open_trades")
+            if rows:
+                conn.executemany(
+                    f"INSERT INTO open_trades ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                    [tuple(row.get(col) for col in columns) for row in rows]
+                )
+
+    def apply_open_trade_changes(self, upserts: Dict[str, Dict], deletes: Iterable[str]):
+        columns = ["symbol"] + TRADE_COLUMNS
+        deletes = [(symbol,) for symbol in deletes]
+        rows = [tuple(dict(info, symbol=symbol).get(col) for col in columns)
+                for symbol, info in upserts.items()]
+        with self._write_txn() as conn:
+            if deletes:
+                conn.executemany("DELETE FROM open_trades WHERE symbol = ?", deletes)
+            if rows:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO open_trades ({', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' for _ in columns)})", rows
+                )
+
+    def load_monitoring(self) -> List[Dict]:
+        return self._query("SELECT * FROM outcomes ORDER BY rowid")
+
+    def upsert_monitoring(self, entries: Iterable[Dict]):
+        self._upsert("outcomes", OUTCOME_COLUMNS, list(entries))
+
+    def active_signals(self, symbol: Optional[str] = None) -> List[Dict]:
+        if symbol is None:
+            return self._query("SELECT * FROM outcomes WHERE status = 'monitoring'")
+        return self._query(
+            "SELECT * FROM outcomes WHERE status = 'monitoring' AND symbol = ?", (symbol,)
+        )
+
+    def completed_signals_since(self, since: str) -> List[Dict]:
+        return self._query(
+            "SELECT * FROM outcomes WHERE status = 'completed' AND completion_date >= ? "
+            "ORDER BY completion_date", (since,)
+        )
+
+    def _delete(self, table, signal_ids):
+        rows = [(signal_id,) for signal_id in signal_ids]
+        if not rows:
+            return
+        with self._write_txn() as conn:
+            conn.executemany(f"DELETE FROM {table} WHERE signal_id = ?", rows)
+
+    def delete_monitoring(self, signal_ids: Iterable[str]):
+        self._delete("outcomes", signal_ids)
+
+    def load_training(self) -> List[Dict]:
+        return self._query("SELECT * FROM signals ORDER BY rowid")
+
+    def upsert_training(self, records: Iterable[Dict]):
+        self._upsert("signals", SIGNAL_COLUMNS, list(records))
+
+    def delete_training(self, signal_ids: Iterable[str]):
+        self._delete("signals", signal_ids)
+
+    def is_empty(self) -> bool:
+        conn = self._connection()
+        for table in ("open_trades", "outcomes", "signals"):
+            if conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+                return False
+        return True
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def migrate_json_to_sqlite(target: SQLiteStorage, source: Optional[JSONStorage] = None) -> Dict:
+    """
+    Copia o conteúdo dos arquivos JSON para o banco SQLite em uma única transação
+
+    Returns:
+        Dict: quantidade de registros migrados por tabela
+    """
+    source = source or JSONStorage()
+    trades = source.load_open_trades()
+    monitoring = source.load_monitoring()
+    training = source.load_training()
+
+    with target.batch():
+        target.save_open_trades(trades)
+        target.upsert_monitoring(monitoring)
+        target.upsert_training(training)
+
+    counts = {
+        "open_trades": len(trades),
+        "outcomes": len(monitoring),
+        "signals": len(training)
+    }
+    print(f"[STORAGE] Migração JSON -> SQLite concluída: {counts}")
+    return counts
+
+
+def create_storage(backend: Optional[str] = None) -> StorageBackend:
+    """Cria o backend configurado em STORAGE_BACKEND (json ou sqlite)"""
+    backend = (backend or os.getenv("STORAGE_BACKEND", "json")).lower()
+
+    if backend == "sqlite":
+        sqlite_storage = SQLiteStorage(os.getenv("STORAGE_DB_PATH", DB_FILE))
+        # Primeira execução com SQLite: importa o histórico dos arquivos JSON
+        if sqlite_storage.is_empty() and any(
+            os.path.exists(path) for path in (TRADES_FILE, MONITORING_FILE, TRAINING_FILE)
+        ):
+            migrate_json_to_sqlite(sqlite_storage)
+        return sqlite_storage
+
+    if backend != "json":
+        print(f"[STORAGE] ⚠️ Backend desconhecido '{backend}', usando json")
+    return JSONStorage()
+
+
+# Instância global
+storage = create_storage()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate":
+        db_path = sys.argv[2] if len(sys.argv) > 2 else DB_FILE
+        migrate_json_to_sqlite(SQLiteStorage(db_path))
+    else:
+        print("Uso: python storage.py migrate [caminho_do_banco]")
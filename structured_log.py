@@ -0,0 +1,154 @@
+"""
+Logging estruturado e assíncrono do scanner, com os últimos registros em memória
+
+Os módulos do scanner usam get_logger(__name__) no lugar de print. O registro
+vai para uma fila (QueueHandler) e uma thread (QueueListener) escreve no stdout
+e guarda uma cópia estruturada em um buffer circular de LOG_BUFFER_SIZE
+registros, servido por GET /logs com filtros de nível e símbolo.
+
+Mensagens por símbolo do laço do scan são DEBUG: com LOG_LEVEL=INFO (padrão)
+elas custam só a checagem de nível; LOG_LEVEL=DEBUG liga o modo detalhado.
+O nível é lido na importação: vale a variável de ambiente ou o .env, que o
+main.py carrega antes de importar os módulos do scanner.
+Para filtrar por símbolo, passe extra={"symbol": symbol}.
+"""
+
+import atexit
+import itertools
+import logging
+import os
+import queue
+import sys
+import threading
+from collections import deque
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_BUFFER_SIZE = int(os.getenv("LOG_BUFFER_SIZE", "5000"))
+# false: escreve na thread de quem loga (útil para depurar a ordem das mensagens)
+LOG_ASYNC = os.getenv("LOG_ASYNC", "true").lower() == "true"
+
+ROOT_LOGGER = "scanner"
+
+class RingBufferHandler(logging.Handler):
+    """Guarda os últimos `capacity` registros como dicionários numerados"""
+
+    def __init__(self, capacity: int = LOG_BUFFER_SIZE):
+        super().__init__()
+        self.capacity = capacity
+        self._records: deque = deque(maxlen=capacity)
+        self._ids = itertools.count(1)
+        self._buffer_lock = threading.Lock()
+        self.total = 0
+
+    def emit(self, record: logging.LogRecord):
+        entry = {
+            "id": next(self._ids),
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "symbol": getattr(record, "symbol", None),
+            "message": record.getMessage(),
+        }
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        with self._buffer_lock:
+            self._records.append(entry)
+            self.total += 1
+
+    def query(self, level: Optional[str] = None, symbol: Optional[str] = None,
+              since_id: Optional[int] = None, limit: int = 200) -> List[Dict]:
+        """
+        Registros mais recentes que passam nos filtros, em ordem cronológica
+
+        Args:
+            level: nível mínimo (DEBUG, INFO, WARNING, ERROR)
+            symbol: só registros deste símbolo
+            since_id: só registros com id maior (acompanhar o log)
+            limit: máximo de registros devolvidos
+        """
+        min_level = logging.getLevelName(level.upper()) if level else logging.NOTSET
+        if not isinstance(min_level, int):
+            raise ValueError(f"Nível de log inválido: {level}")
+        symbol = symbol.upper() if symbol else None
+        with self._buffer_lock:
+            records = list(self._records)
+
+        selected = []
+        for entry in reversed(records):
+            if since_id is not None and entry["id"] <= since_id:
+                break
+            if logging.getLevelName(entry["level"]) < min_level:
+                continue
+            if symbol and entry["symbol"] != symbol:
+                continue
+            selected.append(entry)
+            if len(selected) >= limit:
+                break
+        selected.reverse()
+        return selected
+
+    def statistics(self) -> Dict:
+        with self._buffer_lock:
+            return {
+                "buffered": len(self._records),
+                "capacity": self.capacity,
+                "total": self.total,
+                "last_id": self._records[-1]["id"] if self._records else 0,
+            }
+
+class _StdoutHandler(logging.StreamHandler):
+    """Escreve no sys.stdout do momento da escrita, como print (não fixa o stream na criação)"""
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+class _AsyncHandler(QueueHandler):
+    """Só resolve a mensagem na thread de quem loga; formatação e escrita ficam com o listener"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def _setup() -> RingBufferHandler:
+    ring = RingBufferHandler(LOG_BUFFER_SIZE)
+    console = _StdoutHandler()
+    console.setFormatter(logging.Formatter("%(message)s"))
+
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(LOG_LEVEL)
+    # Sem propagar: o logging.basicConfig do main.py não duplica as mensagens
+    logger.propagate = False
+    if LOG_ASYNC:
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        listener = QueueListener(log_queue, console, ring)
+        listener.start()
+        # Esvazia a fila antes de sair
+        atexit.register(listener.stop)
+        logger.addHandler(_AsyncHandler(log_queue))
+    else:
+        logger.addHandler(console)
+        logger.addHandler(ring)
+    return ring
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger do módulo sob o logger do scanner (ex.: scanner.scanner_hybrid)"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+# Instância global
+log_buffer = _setup()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Varredura paralela dos parâmetros da estratégia híbrida sobre o histórico
+
+Explora PESO_* (sma, volume, macd, rsi), PONTUACAO_MINIMA_PARA_SINAL
+(min_score), os cortes do ML que mudam a decisão no backtest (strong_buy e
+weak_buy; o de BUY não muda, ver backtest_hybrid.default_params) e alvo/stop
+(target, stop), em grade completa ou amostra aleatória de SEARCH_SPACE (ou de
+um JSON com o mesmo formato).
+
+O que é caro é feito uma vez no processo principal com o HybridBacktest:
+indicadores, probabilidades do ML e a primeira passagem de cada nível de alvo
+e de stop do espaço. Esses arrays vão para um único bloco de memória
+compartilhada (uma linha por array, como no analysis_pool) e cada worker do
+pool só reavalia a camada de decisão (pontuação, cortes, seleção de trades) e
+as métricas. As combinações são ordenadas por alvo/stop para que cada worker
+reaproveite os desfechos do par anterior.
+
+Cada resultado é gravado em um JSONL (--cache) assim que chega, com a
+impressão digital dos dados: rodar de novo retoma de onde parou e só avalia
+combinações novas. No fim, imprime e salva (--out) o ranking.
+
+Uso:
+
+    python sweep_hybrid.py [--csv BTCUSDT=historical_data_BTC_USDT_1h.csv ...]
+                           [--random 2000 | --grid] [--seed 7] [--space espaco.json]
+                           [--workers N] [--cache sweep_results.jsonl] [--out sweep_ranking.csv]
+                           [--sort compounded_pct] [--min-trades 30] [--top 20]
+"""
+
+import contextlib
+import hashlib
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+# Também roda em cada worker (spawn): mensagens de carregamento dos modelos ficam fora da saída
+with contextlib.redirect_stdout(io.StringIO()):
+    import backtest_hybrid
+from backtest_hybrid import HybridBacktest, load_candles, passage_key
+
+SEARCH_SPACE = {
+    "sma": [20, 25, 30, 35, 40],
+    "volume": [20, 25, 30, 35],
+    "macd": [15, 20, 25, 30],
+    "rsi": [5, 10, 15],
+    "min_score": [50, 60, 70, 80],
+    "strong_buy": [0.7, 0.75, 0.8, 0.85],
+    "weak_buy": [0.45, 0.5, 0.55, 0.6],
+    "target": [0.02, 0.03, 0.04, 0.05, 0.06],
+    "stop": [0.01, 0.015, 0.02, 0.03],
+}
+
+# Arrays do backtest que os workers leem (além das primeiras passagens)
+SHARED_ARRAYS = ("sma", "volume", "macd", "rsi", "ml_probability", "path_max",
+                 "expiry_return", "full_horizon", "horizon", "timestamp")
+BOOLEAN_ARRAYS = ("sma", "volume", "macd", "rsi", "full_horizon")
+
+RANKING_COLUMNS = ["trades", "hit_rate", "pnl_pct", "compounded_pct", "profit_factor",
+                   "max_drawdown_pct", "signals"]
+
+# Estado de cada worker: bloco compartilhado aberto e o backtest sobre ele
+_worker_state = {}
+
+def _valid(params: Dict) -> bool:
+    """Cortes do ML em ordem (STRONG_BUY >= WEAK_BUY)"""
+    return params["strong_buy"] >= params["weak_buy"]
+
+def grid(space: Dict[str, List]) -> List[Dict]:
+    """Todas as combinações válidas do espaço"""
+    names = list(space)
+    combos = (dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names)))
+    return [params for params in combos if _valid(params)]
+
+def random_sample(space: Dict[str, List], count: int, seed: int = 7) -> List[Dict]:
+    """Até `count` combinações válidas distintas, sorteadas do espaço"""
+    rng = random.Random(seed)
+    names = list(space)
+    total = int(np.prod([len(space[n]) for n in names]))
+    seen, sample = set(), []
+    attempts = 0
+    while len(sample) < count and attempts < max(count * 20, 1000) and len(seen) < total:
+        attempts += 1
+        params = {n: rng.choice(space[n]) for n in names}
+        key = config_key(params)
+        if key in seen:
+            continue
+        seen.add(key)
+        if _valid(params):
+            sample.append(params)
+    return sample
+
+def config_key(params: Dict) -> str:
+    return json.dumps(params, sort_keys=True)
+
+def data_fingerprint(backtest: HybridBacktest) -> str:
+    """Identifica dados, modelo e regras: resultados em cache só valem com a mesma impressão digital"""
+    digest = hashlib.sha1()
+    digest.update(json.dumps([backtest.symbols, backtest.bounds, backtest.expiry_days, backtest.ml_loaded,
+                              backtest_hybrid.IA_HEURISTICA_LIMIAR, backtest_hybrid.PARTIAL_TARGET_RATIO]).encode())
+    for name in ("close", "high", "low", "ml_probability"):
+        digest.update(np.ascontiguousarray(backtest.arrays[name]).tobytes())
+    return digest.hexdigest()[:16]
+
+def _levels(configs: List[Dict]) -> Tuple[List[float], List[float]]:
+    return sorted({c["target"] for c in configs}), sorted({c["stop"] for c in configs})
+
+def _rows(targets: List[float], stops: List[float]) -> List[Tuple]:
+    """Ordem das linhas no bloco compartilhado: arrays, depois passagens de alvo e de stop"""
+    return ([("array", name) for name in SHARED_ARRAYS]
+            + [("passage", passage_key(level, True)) for level in targets]
+            + [("passage", passage_key(level, False)) for level in stops])
+
+def _init_worker(shm_name: str, shape: Tuple[int, int], rows: List[Tuple], symbols: List[str],
+                 bounds: List[int], ml_loaded: bool):
+    """Abre o bloco compartilhado uma vez por processo e monta o backtest sobre ele"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    arrays, passages = {}, {}
+    for i, (kind, key) in enumerate(rows):
+        if kind == "array":
+            # Máscaras viram bool (cópia pequena); o resto é lido direto do bloco
+            arrays[key] = block[i].astype(bool) if key in BOOLEAN_ARRAYS else block[i]
+        else:
+            passages[tuple(key)] = block[i]
+    _worker_state["shm"] = shm
+    _worker_state["backtest"] = HybridBacktest.from_arrays(arrays, symbols, bounds, ml_loaded, passages)
+
+def _evaluate_chunk(configs: List[Dict]) -> List[Tuple[Dict, Dict]]:
+    """Worker: métricas de cada combinação do lote"""
+    backtest = _worker_state["backtest"]
+    return [(params, backtest.evaluate(params)) for params in configs]
+
+def load_cache(path: str, fingerprint: str) -> Dict[str, Dict]:
+    """Resultados já avaliados com os mesmos dados ({config_key: linha})"""
+    cached = {}
+    if not os.path.exists(path):
+        return cached
+    with open(path) as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue  # linha incompleta de uma execução interrompida
+            if row.get("data") == fingerprint:
+                cached[config_key(row["params"])] = row
+    return cached
+
+class ParameterSweep:
+    """
+    Avalia combinações de parâmetros em um pool de processos sobre memória compartilhada
+    """
+
+    def __init__(self, backtest: HybridBacktest, workers: int = os.cpu_count() or 1,
+                 cache_path: str = "sweep_results.jsonl", chunk_size: int = 64):
+        self.backtest = backtest
+        self.workers = workers
+        self.cache_path = cache_path
+        self.chunk_size = chunk_size
+        self.fingerprint = data_fingerprint(backtest)
+        self.stats = {"cached": 0, "evaluated": 0, "seconds": 0.0}
+
+    def run(self, configs: List[Dict]) -> List[Dict]:
+        """Avalia o que não está em cache e devolve todas as linhas (params + summary)"""
+        cached = load_cache(self.cache_path, self.fingerprint)
+        pending = [c for c in configs if config_key(c) not in cached]
+        # Alvo/stop juntos: cada lote reaproveita os desfechos do par anterior
+        pending.sort(key=lambda c: (c["target"], c["stop"]))
+        self.stats["cached"] = len(configs) - len(pending)
+
+        start = time.perf_counter()
+        if pending:
+            with open(self.cache_path, "a") as cache:
+                for params, summary in self._evaluate(pending):
+                    row = {"data": self.fingerprint, "params": params, "summary": summary}
+                    cached[config_key(params)] = row
+                    cache.write(json.dumps(row) + "\n")
+                    self.stats["evaluated"] += 1
+                    if self.stats["evaluated"] % self.chunk_size == 0:
+                        cache.flush()
+        self.stats["seconds"] = time.perf_counter() - start
+        return [cached[config_key(c)] for c in configs]
+
+    def _evaluate(self, configs: List[Dict]):
+        targets, stops = _levels(configs)
+        for level in targets:
+            self.backtest.passage(level, upward=True)
+        for level in stops:
+            self.backtest.passage(level, upward=False)
+        chunks = [configs[i:i + self.chunk_size] for i in range(0, len(configs), self.chunk_size)]
+
+        if self.workers <= 1:
+            for chunk in chunks:
+                for params in chunk:
+                    yield params, self.backtest.evaluate(params)
+            return
+
+        rows = _rows(targets, stops)
+        shape = (len(rows), self.backtest.bars)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, shape[0] * shape[1] * 8))
+        block = None
+        try:
+            block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+            for i, (kind, key) in enumerate(rows):
+                if kind == "array":
+                    values = self.backtest.arrays[key]
+                    if key == "timestamp":
+                        values = values.astype("datetime64[ns]").astype("int64") / 1e9
+                    block[i] = values
+                else:
+                    block[i] = self.backtest.passage(*key)
+
+            # spawn: o processo principal tem a thread do logging assíncrono
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(shm.name, shape, rows, self.backtest.symbols, self.backtest.bounds,
+                          self.backtest.ml_loaded)
+            ) as pool:
+                futures = [pool.submit(_evaluate_chunk, chunk) for chunk in chunks]
+                for future in as_completed(futures):
+                    yield from future.result()
+        finally:
+            block = None  # libera o buffer antes de fechar o bloco
+            shm.close()
+            shm.unlink()
+
+def rank(rows: List[Dict], sort: str = "compounded_pct", min_trades: int = 30) -> pd.DataFrame:
+    """Tabela ordenada por `sort` (decrescente), só com combinações com `min_trades` trades"""
+    records = [dict(row["params"], **{c: row["summary"][c] for c in RANKING_COLUMNS}) for row in rows]
+    table = pd.DataFrame(records)
+    if table.empty:
+        return table
+    table = table[table["trades"] >= min_trades]
+    table = table.sort_values([sort, "trades"], ascending=False).reset_index(drop=True)
+    table.index += 1
+    table.index.name = "rank"
+    return table
+
+def _arg(argv: List[str], name: str, default: Optional[str] = None) -> Optional[str]:
+    return argv[argv.index(name) + 1] if name in argv and argv.index(name) + 1 < len(argv) else default
+
+def _main(argv: List[str]):
+    csv_files = dict(arg.split("=", 1) for arg in argv if "=" in arg and not arg.startswith("--"))
+    csv_files = csv_files or {"BTCUSDT": "historical_data_BTC_USDT_1h.csv"}
+    space = SEARCH_SPACE
+    if _arg(argv, "--space"):
+        with open(_arg(argv, "--space")) as f:
+            space = dict(SEARCH_SPACE, **json.load(f))
+        space.pop("buy", None)  # sem efeito no backtest
+    workers = int(_arg(argv, "--workers", str(os.cpu_count() or 1)))
+    sort = _arg(argv, "--sort", "compounded_pct")
+    min_trades = int(_arg(argv, "--min-trades", "30"))
+    top = int(_arg(argv, "--top", "20"))
+    out = _arg(argv, "--out", "sweep_ranking.csv")
+    if sort not in RANKING_COLUMNS:
+        print(f"[SWEEP] ❌ --sort deve ser um de {RANKING_COLUMNS}")
+        return
+
+    start = time.perf_counter()
+    backtest = HybridBacktest(load_candles(csv_files))
+    configs = grid(space) if "--grid" in argv else random_sample(
+        space, int(_arg(argv, "--random", "2000")), int(_arg(argv, "--seed", "7")))
+    print(f"[SWEEP] 📈 {len(backtest.symbols)} símbolos | {backtest.bars} velas | "
+          f"ML {'carregado' if backtest.ml_loaded else 'ausente'} | preparação {time.perf_counter() - start:.1f}s | "
+          f"{len(configs)} combinações | {workers} workers")
+
+    sweep = ParameterSweep(backtest, workers=workers, cache_path=_arg(argv, "--cache", "sweep_results.jsonl"))
+    rows = sweep.run(configs)
+    s = sweep.stats
+    rate = s["evaluated"] / s["seconds"] if s["seconds"] else 0
+    print(f"[SWEEP] ⏱️ {s['evaluated']} avaliadas em {s['seconds']:.1f}s ({rate:,.0f}/s) | {s['cached']} do cache")
+
+    table = rank(rows, sort, min_trades)
+    if table.empty:
+        print(f"[SWEEP] ⚠️ Nenhuma combinação com pelo menos {min_trades} trades")
+        return
+    table.to_csv(out)
+    print(f"[SWEEP] 🏆 Top {min(top, len(table))} de {len(table)} por {sort} (mínimo {min_trades} trades):")
+    print(table.head(top).to_string())
+    print(f"[SWEEP] 💾 Ranking salvo em {out}")
+
+
+if __name__ == "__main__":
+    _main(sys.argv[1:])
@@ -25,3 +25,16 @@ def calculate_indicators(df):
         print(f"❌ Erro ao calcular indicadores: {e}")
         return pd.DataFrame()
 
+
+def technical_score(latest, weights):
+    """Pontuação técnica da última vela: soma dos pesos das condições atendidas"""
+    score = 0
+    if latest["close"] > latest["sma_50"]:
+        score += weights["sma"]
+    if latest["volume"] > latest["volume_sma_20"]:
+        score += weights["volume"]
+    if latest["macd_diff"] > 0:
+        score += weights["macd"]
+    if latest["rsi"] < 70:
+        score += weights["rsi"]
+    return score
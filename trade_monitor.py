@@ -0,0 +1,125 @@
+"""
+Monitor rápido de alvo/stop, independente do scan
+
+O scan completo roda a cada 15 minutos; entre um ciclo e outro um stop pode ser
+atingido sem que ninguém seja avisado. Este loop roda em thread própria, em
+cadência curta (TRADE_MONITOR_INTERVAL), e a cada volta:
+
+1. junta os símbolos com trade aberto ou sinal em monitoramento;
+2. busca o preço atual de todos em uma única requisição (/simple/price);
+3. compara alvo e stop de todos os trades e sinais de uma vez (numpy);
+4. fecha e notifica quem atingiu um nível.
+
+A carga na API é de uma requisição por volta, não por símbolo, e nenhuma
+requisição é feita quando não há nada aberto. Expiração de sinais e retreino
+da IA continuam no ciclo do scanner.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+from price_fetcher import fetch_current_prices
+from state_manager import close_trades_at_prices
+
+TRADE_MONITOR_INTERVAL = float(os.getenv("TRADE_MONITOR_INTERVAL", "15"))
+
+class TradeMonitor:
+    """
+    Verifica trades abertos e sinais monitorados contra a cotação atual
+    """
+
+    def __init__(self, open_trades, result_monitor, notify_func: Callable,
+                 price_func: Callable[[List[str]], Dict[str, float]] = fetch_current_prices,
+                 interval: float = TRADE_MONITOR_INTERVAL,
+                 symbols_func: Optional[Callable[[], Iterable[str]]] = None,
+                 on_change: Optional[Callable[[], None]] = None):
+        self.open_trades = open_trades
+        self.result_monitor = result_monitor
+        self.notify_func = notify_func
+        self.price_func = price_func
+        self.interval = interval
+        # Símbolos sob responsabilidade desta réplica (None = todos)
+        self.symbols_func = symbols_func
+        # Chamado quando algum trade fecha ou sinal é concluído (ex.: republicar status)
+        self.on_change = on_change
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.stats = {
+            "checks": 0, "errors": 0, "closed_trades": 0, "completed_signals": 0,
+            "last_symbols": 0, "last_quotes": 0, "last_check_at": None,
+            "last_seconds": None, "max_seconds": 0.0
+        }
+
+    def watched_symbols(self) -> List[str]:
+        symbols = set(self.open_trades.keys()) | set(self.result_monitor.active_symbols())
+        if self.symbols_func is not None:
+            symbols &= set(self.symbols_func())
+        return sorted(symbols)
+
+    def check_once(self) -> Dict:
+        """Uma volta do loop: cotação em lote e fechamento de quem atingiu alvo/stop"""
+        symbols = self.watched_symbols()
+        if not symbols:
+            return {"symbols": 0, "closed_trades": [], "completed_signals": []}
+
+        start = time.perf_counter()
+        prices = self.price_func(symbols)
+        closed = close_trades_at_prices(self.open_trades, prices, self.notify_func)
+        if closed:
+            self.open_trades.commit()
+        completed = self.result_monitor.check_prices(prices)
+        elapsed = time.perf_counter() - start
+        if (closed or completed) and self.on_change is not None:
+            self.on_change()
+
+        with self._lock:
+            stats = self.stats
+            stats["checks"] += 1
+            stats["closed_trades"] += len(closed)
+            stats["completed_signals"] += len(completed)
+            stats["last_symbols"] = len(symbols)
+            stats["last_quotes"] = len(prices)
+            stats["last_check_at"] = time.time()
+            stats["last_seconds"] = elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+        return {
+            "symbols": len(symbols),
+            "closed_trades": closed,
+            "completed_signals": [entry['signal_id'] for entry in completed]
+        }
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check_once()
+            except Exception as e:
+                with self._lock:
+                    self.stats["errors"] += 1
+                print(f"[TRADE_MONITOR] 🚨 Erro na verificação de alvo/stop: {e}")
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="trade-monitor", daemon=True)
+        self._thread.start()
+        print(f"[TRADE_MONITOR] 👁️ Alvo/stop verificados a cada {self.interval:.0f}s")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+            self._thread = None
+
+    def statistics(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["interval"] = self.interval
+        stats["running"] = self._thread is not None and self._thread.is_alive()
+        for key in ("last_seconds", "max_seconds"):
+            if stats[key] is not None:
+                stats[key] = round(stats[key], 3)
+        return stats